@@ -0,0 +1,250 @@
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+from game_core import (
+    ROWS, COLS, Action, Difficulty, FlowField, FreeCellIndex, GameSession, Monster, Spike, SpikeField,
+    default_spike_count, generate_maze, generate_random_spikes,
+)
+from snapshot import Snapshot
+
+# 基准测试 - 固定种子、多种迷宫尺寸，测量启动、生成、寻路、刷地刺、地刺更新、存档快照和一帧绘制的耗时，
+# 结果写成JSON；--compare 与保存的基线比较，超过阈值的项目算作性能回退
+#
+#   python benchmark.py --output baseline.json
+#   python benchmark.py --compare baseline.json --threshold 0.1
+
+DEFAULT_SIZES = [(COLS, ROWS), (101, 101), (301, 301), (501, 501)]
+SPIKE_UPDATE_COUNT = 10000
+
+def measure(function, repeat=7, number=1):
+    """运行 repeat 轮，每轮调用 number 次，返回每次调用的耗时（秒）列表"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        samples.append((time.perf_counter() - start) / number)
+    return samples
+
+def calibrate(function, target=0.05):
+    """估计一轮跑 target 秒左右需要调用多少次"""
+    start = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - start
+    return max(1, int(target / elapsed)) if elapsed > 0 else 1000
+
+def farthest_cell(maze, x, y):
+    """离 (x, y) 最远的可达格子，用作寻路的最坏情况目标"""
+    field = FlowField()
+    field.update(maze, x, y)
+    index = max(range(len(field.distances)), key=field.distances.__getitem__)
+    return maze.position(index)
+
+def bench_generate_maze(width, height, seed):
+    return lambda: generate_maze(random.Random(seed), width, height)
+
+def bench_find_path(width, height, seed):
+    maze = generate_maze(random.Random(seed), width, height)
+    target_x, target_y = farthest_cell(maze, 1, 1)
+    monster = Monster(1, 1)
+
+    def run():
+        # 每次换一个新流场，测的是完整的BFS而不是缓存命中
+        monster.flow_field = FlowField()
+        monster.find_path_to_player(target_x, target_y, maze)
+    return run
+
+def bench_generate_spikes(width, height, seed):
+    maze = generate_maze(random.Random(seed), width, height)
+    count = default_spike_count(width, height)
+    rng = random.Random(seed)
+    return lambda: generate_random_spikes(maze, 1, 1, count, rng)
+
+def bench_spike_update(width, height, seed):
+    spikes = [Spike(i % width, i // width % height) for i in range(SPIKE_UPDATE_COUNT)]
+
+    def run():
+        for spike in spikes:
+            spike.update(1 / 60)
+    return run
+
+def bench_spike_field_update(width, height, seed):
+    maze = generate_maze(random.Random(seed), width, height)
+    free_cells = FreeCellIndex(maze)
+    positions = free_cells.sample(1, 1, SPIKE_UPDATE_COUNT, random.Random(seed))
+    field = SpikeField(width, height, positions)
+    return lambda: field.update(1 / 60)
+
+# 一帧 = draw_maze + draw_player，画在 dummy 视频驱动的离屏窗口上；
+# 摄像机对准迷宫中央，大迷宫只画视口内的部分
+def bench_frame(width, height, seed, cold=False):
+    import puzzle
+    puzzle.init_display()
+
+    maze = generate_maze(random.Random(seed), width, height)
+    count = default_spike_count(width, height)
+    spikes = SpikeField(width, height, FreeCellIndex(maze).sample(1, 1, count, random.Random(seed)))
+    spikes.update(0.5)
+    center_x, center_y = width // 2, height // 2
+
+    def run():
+        if cold:
+            # 丢掉缓存的迷宫图层，测换关后的第一帧
+            puzzle._maze_layer = None
+        puzzle.camera.follow(center_x, center_y, maze)
+        puzzle.draw_maze(maze, spikes)
+        puzzle.draw_player(center_x, center_y)
+    return run
+
+def bench_snapshot(width, height, seed, operation):
+    # Hard模式走几秒，怪物已经激活；相邻两个tick的快照共用迷宫和地刺位置
+    session = GameSession(default_spike_count(width, height), width=width, height=height)
+    session.reset(seed, Difficulty.HARD)
+    for tick in range(300):
+        session.step(Action.RIGHT if tick % 60 < 30 else Action.DOWN)
+    previous = Snapshot.capture(session)
+    session.step(Action.NONE)
+    current = Snapshot.capture(session, previous)
+
+    if operation == "capture":
+        return lambda: Snapshot.capture(session, previous)
+    if operation == "delta":
+        return lambda: current.encode(previous)
+    data = current.encode()
+    # 读档：解码完整快照并恢复到同一局上
+    return lambda: Snapshot.decode(data).restore(session)
+
+BENCHMARKS = [
+    ("generate_maze", bench_generate_maze),
+    ("find_path_to_player", bench_find_path),
+    ("generate_random_spikes", bench_generate_spikes),
+    ("spike_update", bench_spike_update),
+    ("spike_field_update", bench_spike_field_update),
+    ("snapshot_capture", lambda width, height, seed: bench_snapshot(width, height, seed, "capture")),
+    ("snapshot_encode_delta", lambda width, height, seed: bench_snapshot(width, height, seed, "delta")),
+    ("snapshot_load", lambda width, height, seed: bench_snapshot(width, height, seed, "load")),
+    ("frame", bench_frame),
+    ("frame_cold", lambda width, height, seed: bench_frame(width, height, seed, cold=True)),
+]
+
+# 启动耗时：每次在新的子进程里计时，模块缓存不会影响结果；解释器本身的启动时间不算在内
+STARTUP_BENCHMARKS = [
+    ("startup_import_game_core", "import game_core"),
+    ("startup_import_puzzle", "import puzzle"),
+    ("startup_display", "import puzzle; puzzle.init_display()"),
+]
+
+def measure_startup(statement, repeat=7):
+    """在 repeat 个新进程里执行 statement，返回每次的耗时（秒）列表"""
+    script = f"import time; start = time.perf_counter(); {statement}; print(time.perf_counter() - start)"
+    env = dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT="1")
+    samples = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", script], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                env=env, capture_output=True, text=True, check=True).stdout
+        samples.append(float(output.split()[-1]))
+    return samples
+
+def run_startup_benchmarks(repeat=7, only=None, log=print):
+    results = {}
+    for name, statement in STARTUP_BENCHMARKS:
+        if only and not any(pattern in name for pattern in only):
+            continue
+        samples = measure_startup(statement, repeat)
+        results[name] = {
+            "median": statistics.median(samples),
+            "min": min(samples),
+            "repeat": repeat,
+            "number": 1,
+        }
+        log(f"{name:40s} {results[name]['median'] * 1e3:10.3f} ms")
+    return results
+
+def run_benchmarks(sizes, seed=0, repeat=7, only=None, log=print):
+    results = {}
+    for width, height in sizes:
+        for name, factory in BENCHMARKS:
+            if only and not any(pattern in name for pattern in only):
+                continue
+            key = f"{name}[{width}x{height}]"
+            function = factory(width, height, seed)
+            number = calibrate(function)
+            samples = measure(function, repeat, number)
+            results[key] = {
+                "median": statistics.median(samples),
+                "min": min(samples),
+                "repeat": repeat,
+                "number": number,
+            }
+            log(f"{key:40s} {results[key]['median'] * 1e3:10.3f} ms")
+    return results
+
+def environment():
+    import pygame
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "pygame": pygame.version.ver,
+        "sdl_videodriver": os.environ.get("SDL_VIDEODRIVER"),
+    }
+
+def compare(results, baseline, threshold):
+    """返回 (项目, 基线, 当前, 变化比例) 列表，只包含变慢超过 threshold 的项目"""
+    regressions = []
+    for key, result in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        change = result["median"] / previous["median"] - 1
+        if change > threshold:
+            regressions.append((key, previous["median"], result["median"], change))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Maze Adventure hot paths")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare", metavar="BASELINE", help="flag regressions against a saved result file")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="relative slowdown counted as a regression (default 0.10 = 10%%)")
+    parser.add_argument("--sizes", nargs="+", metavar="WxH", help=f"grid sizes (default {COLS}x{ROWS} 101x101 301x301 501x501)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--only", nargs="+", metavar="NAME", help="run only benchmarks whose name contains NAME")
+    args = parser.parse_args(argv)
+
+    sizes = DEFAULT_SIZES
+    if args.sizes:
+        sizes = [tuple(int(n) for n in size.lower().split("x")) for size in args.sizes]
+
+    # 绘制测试不需要真正的窗口
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+    results = run_startup_benchmarks(args.repeat, args.only)
+    results.update(run_benchmarks(sizes, args.seed, args.repeat, args.only))
+    report = {"environment": environment(), "seed": args.seed, "results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for key, before, after, change in regressions:
+            print(f"REGRESSION {key}: {before * 1e3:.3f} ms -> {after * 1e3:.3f} ms (+{change:.0%})")
+        if regressions:
+            return 1
+        print(f"no regressions beyond {args.threshold:.0%}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
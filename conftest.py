@@ -0,0 +1 @@
+# pytest 会把这个文件所在的目录加入 sys.path，tests/ 里可以直接 import game_core 等顶层模块
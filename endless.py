@@ -0,0 +1,216 @@
+import hashlib
+import random
+import struct
+from collections import OrderedDict
+
+import maze_generation
+from game_core import (
+    ROWS, COLS, TICK_RATE, PLAYER_MOVE_INTERVAL, ACTION_DELTAS, Action, GameState, SpikeField, lerp_position,
+)
+from maze_generation import PATH
+from maze_grid import MazeGrid
+
+# 无尽模式 - 世界按 CHUNK_SIZE 见方切成区块，主角走近时才用 (世界种子, 区块坐标) 生成，
+# 远处的区块按LRU淘汰，回来时重新生成得到完全相同的内容，内存占用与走了多远无关
+#
+# 区块布局（CHUNK_SIZE 为偶数，局部坐标 0..CHUNK_SIZE-1）：
+#   第0列是西墙、第0行是北墙，归本区块所有；东墙和南墙是东边、南边区块的西墙和北墙
+#   其余部分是一个连通的迷宫，奇数坐标是房间
+#   西墙和北墙上至少各开一个门（奇数位置），每个区块都和西边、北边的区块连通，所以整个世界连通
+#
+# 地刺不单独保存状态：全世界共用一个时钟，第 k 批地刺的位置由 (世界种子, 区块坐标, k) 决定，
+# 所以淘汰后重新生成的区块在同一时刻的地刺也完全相同
+
+CHUNK_SIZE = 16
+MAX_CHUNKS = 64
+# 与默认尺寸的迷宫保持相同的地刺密度
+CHUNK_SPIKES = max(1, 30 * CHUNK_SIZE * CHUNK_SIZE // (COLS * ROWS))
+
+# 世界时钟的阶段划分直接用默认参数的 SpikeField.phase，与关卡模式的地刺完全相同
+SPIKE_CLOCK = SpikeField(0, 0)
+
+def chunk_seed(world_seed, cx, cy, salt=0):
+    """(世界种子, 区块坐标, salt) 的64位哈希，区块坐标可以是负数"""
+    digest = hashlib.blake2b(struct.pack("<Qqqq", world_seed, cx, cy, salt), digest_size=8)
+    return int.from_bytes(digest.digest(), "little")
+
+# 一个区块：迷宫格子和当前批次的地刺
+class Chunk:
+    __slots__ = ("world_seed", "cx", "cy", "maze", "free_cells", "spike_batch", "spike_cells")
+
+    def __init__(self, world_seed, cx, cy, size=CHUNK_SIZE, algorithm="backtracker", extra_doors=0.5):
+        self.world_seed = world_seed
+        self.cx = cx
+        self.cy = cy
+        rng = random.Random(chunk_seed(world_seed, cx, cy))
+
+        # 在 (size+1) 见方的网格上生成，再去掉最后一行和最后一列（属于东边、南边的区块）
+        full = size + 1
+        cells = maze_generation.generate(full, full, algorithm=algorithm, rng=rng)
+        grid = bytearray()
+        for y in range(size):
+            grid += cells[y * full:y * full + size]
+
+        # 西墙和北墙上的门：第一个必开，之后每个有 extra_doors 的概率再开一个，制造跨区块的回路
+        rooms = range(1, size, 2)
+        for wall in ("west", "north"):
+            doors = [rng.choice(rooms)]
+            while rng.random() < extra_doors and len(doors) < len(rooms):
+                doors.append(rng.choice(rooms))
+            for door in doors:
+                grid[door * size if wall == "west" else door] = PATH
+
+        self.maze = MazeGrid(size, size, grid)
+        self.free_cells = [i for i in range(len(grid)) if grid[i] == PATH]
+        self.spike_batch = None
+        self.spike_cells = frozenset()
+
+    def spikes(self, batch, count):
+        """第 batch 批地刺所在格子的局部下标集合"""
+        if batch != self.spike_batch:
+            rng = random.Random(chunk_seed(self.world_seed, self.cx, self.cy, batch + 1))
+            self.spike_cells = frozenset(rng.sample(self.free_cells, min(count, len(self.free_cells))))
+            self.spike_batch = batch
+        return self.spike_cells
+
+# 分块的无限世界 - 按需生成区块，最多缓存 max_chunks 个
+class ChunkedWorld:
+    def __init__(self, seed=0, chunk_size=CHUNK_SIZE, max_chunks=MAX_CHUNKS, spikes_per_chunk=CHUNK_SPIKES,
+                 algorithm="backtracker"):
+        if chunk_size < 4 or chunk_size % 2:
+            raise ValueError("chunk size must be an even number of at least 4")
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.max_chunks = max_chunks
+        self.spikes_per_chunk = spikes_per_chunk
+        self.algorithm = algorithm
+        self.chunks = OrderedDict()
+        self.generated = 0
+        self.evicted = 0
+
+    def chunk(self, cx, cy):
+        key = (cx, cy)
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            chunk = Chunk(self.seed, cx, cy, self.chunk_size, self.algorithm)
+            self.chunks[key] = chunk
+            self.generated += 1
+            if len(self.chunks) > self.max_chunks:
+                self.chunks.popitem(last=False)
+                self.evicted += 1
+        else:
+            self.chunks.move_to_end(key)
+        return chunk
+
+    def locate(self, x, y):
+        """世界坐标 -> (区块, 局部一维下标)；负坐标按向下取整划分区块"""
+        size = self.chunk_size
+        return self.chunk(x // size, y // size), (y % size) * size + x % size
+
+    def is_open(self, x, y):
+        chunk, index = self.locate(x, y)
+        return chunk.maze.cells[index] == PATH
+
+    def is_spike(self, x, y, batch):
+        chunk, index = self.locate(x, y)
+        return index in chunk.spikes(batch, self.spikes_per_chunk)
+
+    def preload(self, x, y, radius=1):
+        """生成 (x, y) 所在区块周围 radius 圈的区块"""
+        size = self.chunk_size
+        cx, cy = x // size, y // size
+        for dy in range(-radius, radius + 1):
+            for dx in range(-radius, radius + 1):
+                self.chunk(cx + dx, cy + dy)
+
+    def spike_positions(self, batch, x0, y0, x1, y1):
+        """矩形 [x0, x1) x [y0, y1) 内第 batch 批地刺的世界坐标"""
+        size = self.chunk_size
+        positions = []
+        for cy in range(y0 // size, (y1 - 1) // size + 1):
+            for cx in range(x0 // size, (x1 - 1) // size + 1):
+                chunk = self.chunk(cx, cy)
+                left, top = cx * size, cy * size
+                for index in chunk.spikes(batch, self.spikes_per_chunk):
+                    y, x = divmod(index, size)
+                    if x0 <= left + x < x1 and y0 <= top + y < y1:
+                        positions.append((left + x, top + y))
+        return positions
+
+# 无尽模式的一局：没有终点和怪物，走得越远分数越高，踩到活跃地刺结束
+class EndlessSession:
+    def __init__(self, tick_rate=TICK_RATE, chunk_size=CHUNK_SIZE, max_chunks=MAX_CHUNKS):
+        self.tick_rate = tick_rate
+        self.tick_dt = 1.0 / tick_rate
+        self.move_interval = max(1, round(PLAYER_MOVE_INTERVAL * tick_rate))
+        self.chunk_size = chunk_size
+        self.max_chunks = max_chunks
+
+        self.state = GameState.MENU
+        self.seed = None
+        self.world = None
+        self.player_x, self.player_y = 1, 1
+        self.previous_player = None
+        self.player_move_count = 0
+        self.move_delay = 0
+        self.farthest = 0
+        self.tick = 0
+
+    def reset(self, seed=None):
+        if seed is None:
+            seed = random.getrandbits(63)
+        self.seed = seed
+        self.world = ChunkedWorld(seed, self.chunk_size, self.max_chunks)
+        self.state = GameState.PLAYING
+        self.player_x, self.player_y = 1, 1
+        self.previous_player = None
+        self.player_move_count = 0
+        self.move_delay = 0
+        self.farthest = 0
+        self.tick = 0
+        self.world.preload(1, 1)
+        return self
+
+    @property
+    def time(self):
+        return self.tick * self.tick_dt
+
+    def spike_phase(self):
+        """世界时钟当前的 (批次, 是否活跃, 动画进度)"""
+        return SPIKE_CLOCK.phase(self.time)
+
+    def step(self, action=Action.NONE):
+        if self.state != GameState.PLAYING:
+            return self.state
+        self.previous_player = (self.player_x, self.player_y)
+        self.tick += 1
+        self.move_player(action)
+        return self.state
+
+    def move_player(self, action):
+        self.move_delay += 1
+        if self.move_delay < self.move_interval:
+            return
+
+        dx, dy = ACTION_DELTAS[action]
+        if dx == dy == 0:
+            return
+        new_x, new_y = self.player_x + dx, self.player_y + dy
+        world = self.world
+        if not world.is_open(new_x, new_y):
+            return
+
+        self.player_x, self.player_y = new_x, new_y
+        self.move_delay = 0
+        self.player_move_count += 1
+        self.farthest = max(self.farthest, abs(new_x - 1) + abs(new_y - 1))
+        # 提前生成周围的区块，跨过区块边界时不用等待
+        world.preload(new_x, new_y)
+
+        # 检查是否碰到活跃的地刺
+        batch, active, _ = self.spike_phase()
+        if active and world.is_spike(new_x, new_y, batch):
+            self.state = GameState.GAME_OVER
+
+    def player_position(self, alpha=1.0):
+        return lerp_position(self.previous_player, (self.player_x, self.player_y), alpha)
@@ -0,0 +1,157 @@
+import json
+import os
+import threading
+from collections import deque
+from time import perf_counter
+
+# 帧分析器 - 给主循环的每个阶段计时，保存最近若干帧的数据用于屏幕叠加层，
+# 也可以把每个阶段写成 Chrome trace / Perfetto 能打开的JSON事件流
+#
+#   profiler = FrameProfiler(trace_path="trace.json")
+#   profiler.begin_frame()
+#   with profiler.phase("spike update"):
+#       ...
+#   profiler.end_frame()
+#
+# 不需要分析时用 NULL_PROFILER，phase() 返回同一个什么都不做的上下文管理器
+
+class _Phase:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.record(self.name, self.start, perf_counter())
+        return False
+
+class FrameProfiler:
+    enabled = True
+
+    def __init__(self, window=120, trace_path=None):
+        self.window = window
+        # 阶段名 -> 最近 window 帧里每帧的累计耗时（秒），按第一次出现的顺序排列
+        self.samples = {}
+        self.current = {}
+        self.frame_times = deque(maxlen=window)
+        self.frame_start = None
+        self.frame_count = 0
+
+        self.origin = perf_counter()
+        self.trace = None
+        self.pid = os.getpid()
+        if trace_path is not None:
+            self.trace = open(trace_path, "w")
+            self.trace.write("[\n")
+            self.trace_event({"name": "process_name", "ph": "M", "pid": self.pid, "tid": 0,
+                              "args": {"name": "Maze Adventure"}})
+
+    def phase(self, name):
+        return _Phase(self, name)
+
+    def begin_frame(self):
+        self.frame_start = perf_counter()
+        self.current = {}
+
+    def end_frame(self):
+        if self.frame_start is None:
+            return
+        end = perf_counter()
+        self.frame_times.append(end - self.frame_start)
+        self.frame_count += 1
+
+        current = self.current
+        for name in current:
+            if name not in self.samples:
+                self.samples[name] = deque(maxlen=self.window)
+        for name, samples in self.samples.items():
+            samples.append(current.get(name, 0.0))
+
+        if self.trace is not None:
+            self.write_span(f"frame {self.frame_count}", self.frame_start, end, "frame")
+        self.frame_start = None
+
+    def record(self, name, start, end):
+        self.current[name] = self.current.get(name, 0.0) + (end - start)
+        if self.trace is not None:
+            self.write_span(name, start, end, "phase")
+
+    def write_span(self, name, start, end, category):
+        # 完整事件（ph = X），时间单位为微秒
+        self.trace_event({"name": name, "cat": category, "ph": "X", "pid": self.pid,
+                          "tid": threading.get_ident(),
+                          "ts": round((start - self.origin) * 1e6, 3),
+                          "dur": round((end - start) * 1e6, 3)})
+
+    def trace_event(self, event):
+        self.trace.write(json.dumps(event))
+        self.trace.write(",\n")
+
+    def percentiles(self, points=(50, 95, 99)):
+        """最近 window 帧的帧耗时百分位数（秒），最近邻取值"""
+        if not self.frame_times:
+            return {point: 0.0 for point in points}
+        ordered = sorted(self.frame_times)
+        last = len(ordered) - 1
+        return {point: ordered[min(last, round(point / 100 * last))] for point in points}
+
+    def averages(self):
+        """各阶段在最近 window 帧里的平均每帧耗时（秒）"""
+        return {name: sum(samples) / len(samples) for name, samples in self.samples.items() if samples}
+
+    def summary_rows(self):
+        """叠加层显示的 (标签, 数值) 行：帧耗时百分位数和各阶段平均耗时"""
+        p = self.percentiles()
+        rows = [("frame p50/p95/p99", f"{p[50] * 1e3:.2f} / {p[95] * 1e3:.2f} / {p[99] * 1e3:.2f} ms")]
+        for name, average in self.averages().items():
+            rows.append((name, f"{average * 1e3:.3f} ms"))
+        return rows
+
+    def close(self):
+        if self.trace is not None:
+            # 末尾写一个元数据事件，数组不用处理最后一个逗号
+            self.trace.write(json.dumps({"name": "thread_name", "ph": "M", "pid": self.pid,
+                                         "tid": threading.get_ident(), "args": {"name": "main"}}))
+            self.trace.write("\n]\n")
+            self.trace.close()
+            self.trace = None
+
+class _NullPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NULL_PHASE = _NullPhase()
+
+# 关闭分析时使用的空实现，所有调用都立即返回
+class NullProfiler:
+    enabled = False
+
+    def phase(self, name):
+        return _NULL_PHASE
+
+    def begin_frame(self):
+        pass
+
+    def end_frame(self):
+        pass
+
+    def record(self, name, start, end):
+        pass
+
+    def summary_rows(self):
+        return []
+
+    def close(self):
+        pass
+
+NULL_PROFILER = NullProfiler()
@@ -0,0 +1,904 @@
+import hashlib
+import math
+import random
+import struct
+import sys
+from array import array
+from collections import deque, namedtuple
+
+import maze_generation
+from maze_grid import MazeGrid
+
+# 纯逻辑的游戏核心，不依赖pygame，可以无窗口、不限帧率地运行
+
+# 默认迷宫尺寸（正好铺满 1000x800 的窗口和 30 像素的格子）；更大的迷宫由摄像机滚动显示
+ROWS, COLS = 800 // 30, 1000 // 30
+
+# 游戏状态
+class GameState:
+    MENU = "menu"
+    PLAYING = "playing"
+    GAME_OVER = "game_over"
+    VICTORY = "victory"
+
+# 难度模式
+class Difficulty:
+    NORMAL = "normal"
+    HARD = "hard"
+    CROWD = "crowd"
+
+# 寻路方向（与原BFS的扩展顺序一致）
+DIRECTIONS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+
+# 怪物和地刺的时间参数（秒），批量环境等按同样规则模拟时也从这里取
+MONSTER_MOVE_INTERVAL = 0.4  # 怪物每走一格的间隔
+MONSTER_ACTIVATION_MOVES = 5  # 主角走了这么多步后怪物激活
+SPIKE_RISE_DURATION = 0.8
+SPIKE_FALL_DURATION = 0.8
+SPIKE_HIDDEN_DURATION = 1.0
+
+# 流场寻路 - 从玩家位置做一次反向BFS，得到全图距离表，所有怪物共享；
+# BFS可以分段进行：只需要某一格的下一步时扩展到该格为止，队列留着，之后需要更远的格子时接着扩展
+class FlowField:
+    def __init__(self):
+        self.maze = None
+        self.target = None
+        self.width = 0
+        self.height = 0
+        self.distances = []
+        self.queue = deque()
+    
+    def update(self, maze, target_x, target_y, until=None):
+        """只有玩家换格或迷宫变化时才重新开始计算距离表；
+        until 为 (x, y) 时只扩展到该格的距离确定为止（足够 next_step 查询这一格），否则算完全图"""
+        if self.maze is not maze or self.target != (target_x, target_y):
+            self.maze = maze
+            self.target = (target_x, target_y)
+            self.width = width = maze.width
+            self.height = height = maze.height
+            
+            # -1 表示不可达（或者还没扩展到）
+            self.distances = array("i", [-1]) * (width * height)
+            self.queue = deque()
+            if maze.in_bounds(target_x, target_y):
+                start = target_y * width + target_x
+                self.distances[start] = 0
+                self.queue.append(start)
+        
+        if until is None:
+            self.expand(-1)
+        elif 0 <= until[0] < self.width and 0 <= until[1] < self.height:
+            self.expand(until[1] * self.width + until[0])
+    
+    def expand(self, stop):
+        """继续BFS，直到下标为 stop 的格子有了距离；stop 为 -1 时扩展完整个迷宫。
+        BFS按距离逐层确定，某格有距离时比它近1的邻格一定都已经有距离，所以 next_step 的结果与算完全图时相同"""
+        distances = self.distances
+        queue = self.queue
+        cells = self.maze.cells
+        width = self.width
+        size = width * self.height
+        
+        # 在一维下标上做BFS；左右移动需要判断是否跨行
+        while queue and (stop < 0 or distances[stop] < 0):
+            index = queue.popleft()
+            next_distance = distances[index] + 1
+            x = index % width
+            
+            if x > 0 and cells[index - 1] == 0 and distances[index - 1] < 0:
+                distances[index - 1] = next_distance
+                queue.append(index - 1)
+            if x < width - 1 and cells[index + 1] == 0 and distances[index + 1] < 0:
+                distances[index + 1] = next_distance
+                queue.append(index + 1)
+            up = index - width
+            if up >= 0 and cells[up] == 0 and distances[up] < 0:
+                distances[up] = next_distance
+                queue.append(up)
+            down = index + width
+            if down < size and cells[down] == 0 and distances[down] < 0:
+                distances[down] = next_distance
+                queue.append(down)
+    
+    def distance(self, x, y):
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self.distances[y * self.width + x]
+        return -1
+    
+    def next_step(self, x, y):
+        """O(1)查询：返回朝目标走一步的方向 (dx, dy)，不可达或已到达时返回None"""
+        current = self.distance(x, y)
+        if current <= 0:
+            return None
+        
+        for dx, dy in DIRECTIONS:
+            if self.distance(x + dx, y + dy) == current - 1:
+                return (dx, dy)
+        return None
+
+# 小怪物类 - 使用共享流场寻路
+class Monster:
+    def __init__(self, x, y, flow_field=None, rng=None):
+        self.x = x
+        self.y = y
+        self.target_x = x
+        self.target_y = y
+        self.move_timer = 0
+        self.move_interval = MONSTER_MOVE_INTERVAL  # 移动间隔（秒）- 加快速度
+        self.active = False
+        self.move_count = 0
+        # 多个怪物可以传入同一个流场，玩家不换格时不会重复计算
+        self.flow_field = flow_field if flow_field is not None else FlowField()
+        # 随机游走使用的随机数源，默认为全局random
+        self.rng = rng if rng is not None else random
+        # 属于怪物群时由 MonsterCrowd 分配移动机会并检查格子占用
+        self.crowd = None
+        
+    def update(self, dt, player_x, player_y, maze):
+        if not self.active:
+            return
+            
+        self.move_timer += dt
+        if self.move_timer >= self.move_interval:
+            # 怪物群这个tick的AI预算用完时保留计时器，下一个tick优先移动
+            if self.crowd is not None and not self.crowd.take_budget(self):
+                return
+            self.move_timer = 0
+            self.move_towards_player(player_x, player_y, maze)
+    
+    def find_path_to_player(self, player_x, player_y, maze):
+        """沿流场下降得到到玩家的最短路径"""
+        self.flow_field.update(maze, player_x, player_y, (self.x, self.y))
+        
+        path = []
+        x, y = self.x, self.y
+        step = self.flow_field.next_step(x, y)
+        while step:
+            path.append(step)
+            x, y = x + step[0], y + step[1]
+            step = self.flow_field.next_step(x, y)
+        return path
+    
+    def move_towards_player(self, player_x, player_y, maze):
+        # 从共享流场中查询下一步；只需要扩展到怪物所在格，追得越近算得越少
+        self.flow_field.update(maze, player_x, player_y, (self.x, self.y))
+        step = self.flow_field.next_step(self.x, self.y)
+        
+        if step:
+            dx, dy = step
+            new_x, new_y = self.x + dx, self.y + dy
+            
+            # 确保移动是有效的
+            if self.can_enter(new_x, new_y, maze):
+                self.step_to(new_x, new_y)
+        else:
+            # 如果没有找到路径，随机移动
+            valid_directions = []
+            
+            for dx, dy in DIRECTIONS:
+                new_x, new_y = self.x + dx, self.y + dy
+                if self.can_enter(new_x, new_y, maze):
+                    valid_directions.append((dx, dy))
+            
+            if valid_directions:
+                dx, dy = self.rng.choice(valid_directions)
+                self.step_to(self.x + dx, self.y + dy)
+    
+    def can_enter(self, x, y, maze):
+        # 怪物群里的怪物不能走进其他怪物所在的格子
+        return is_valid_move(maze, x, y) and (self.crowd is None or self.crowd.is_free(x, y))
+    
+    def step_to(self, x, y):
+        old_x, old_y = self.x, self.y
+        self.x = x
+        self.y = y
+        self.move_count += 1
+        if self.crowd is not None:
+            self.crowd.moved(self, old_x, old_y)
+    
+    def activate(self, player_x, player_y, maze, x=1, y=1):
+        # 怪物出生点默认为主角出生点 (1, 1)，怪物群的怪物出生在各自选好的格子
+        self.x = x
+        self.y = y
+        self.active = True
+
+# 怪物群参数
+CROWD_SIZE = 500
+CROWD_SPAWN_PER_MOVE = 4  # 主角每走一步新激活几个怪物
+CROWD_SPAWN_DISTANCE = 8  # 新怪物出生点离主角的最短路距离下限
+CROWD_AI_BUDGET = 48  # 每个tick最多移动几个怪物，其余的顺延到下一个tick
+
+# 怪物群 - 几百个怪物共享一个流场，按主角的步数分批激活；
+# 每个tick只允许 ai_budget 个怪物移动，轮流从上次用完预算的位置开始，寻路开销被摊到多个tick上；
+# 格子下标 -> 怪物 的空间哈希让怪物与主角、怪物与怪物的占用检查都是O(1)
+class MonsterCrowd:
+    def __init__(self, count, free_cells, rng, activation_moves=5, spawn_per_move=CROWD_SPAWN_PER_MOVE,
+                 ai_budget=CROWD_AI_BUDGET, spawn_distance=CROWD_SPAWN_DISTANCE):
+        # 迷宫太小时减少怪物数量，至少留出四分之三的空格
+        count = max(1, min(count, len(free_cells) // 4))
+        self.free_cells = free_cells
+        self.width = free_cells.maze.width
+        self.rng = rng
+        self.ai_budget = ai_budget
+        self.spawn_distance = spawn_distance
+        
+        self.flow_field = FlowField()
+        self.monsters = [Monster(1, 1, self.flow_field, rng) for _ in range(count)]
+        for monster in self.monsters:
+            monster.crowd = self
+        # 第 i 个怪物在主角走到第 thresholds[i] 步时激活
+        self.thresholds = [activation_moves + i // spawn_per_move for i in range(count)]
+        self.spawned = 0
+        
+        self.cells = {}
+        self.budget = 0
+        self.cursor = 0
+        self.current = 0
+        self.deferred = None
+        # 本tick移动过的怪物 -> 移动前的位置，用于绘制插值
+        self.previous = {}
+    
+    def __len__(self):
+        return len(self.monsters)
+    
+    @property
+    def active_monsters(self):
+        return self.monsters[:self.spawned]
+    
+    def is_free(self, x, y):
+        return y * self.width + x not in self.cells
+    
+    def monster_at(self, x, y):
+        return self.cells.get(y * self.width + x)
+    
+    def moved(self, monster, old_x, old_y):
+        del self.cells[old_y * self.width + old_x]
+        self.cells[monster.y * self.width + monster.x] = monster
+        self.previous.setdefault(monster, (old_x, old_y))
+    
+    def take_budget(self, monster):
+        if self.budget > 0:
+            self.budget -= 1
+            return True
+        if self.deferred is None:
+            self.deferred = self.current
+        return False
+    
+    def spawn(self, player_x, player_y, player_move_count, maze):
+        """激活已经到了步数门槛的怪物；出生点随机选在离主角足够远的空格，找不到就下个tick再试"""
+        if self.spawned >= len(self.monsters) or player_move_count < self.thresholds[self.spawned]:
+            return
+        # 出生点要按离主角的距离筛选，需要完整的距离表
+        field = self.flow_field
+        field.update(maze, player_x, player_y)
+        indices = self.free_cells.indices
+        while self.spawned < len(self.monsters) and player_move_count >= self.thresholds[self.spawned]:
+            for _ in range(8):
+                index = indices[self.rng.randrange(len(indices))]
+                if index not in self.cells and field.distances[index] >= self.spawn_distance:
+                    break
+            else:
+                return
+            monster = self.monsters[self.spawned]
+            y, x = divmod(index, self.width)
+            monster.activate(player_x, player_y, maze, x, y)
+            self.cells[index] = monster
+            self.spawned += 1
+    
+    def update(self, dt, player_x, player_y, player_move_count, maze):
+        self.previous = {}
+        self.spawn(player_x, player_y, player_move_count, maze)
+        
+        monsters = self.monsters
+        count = self.spawned
+        if not count:
+            return
+        self.budget = self.ai_budget
+        self.deferred = None
+        start = self.cursor % count
+        for k in range(count):
+            self.current = (start + k) % count
+            monsters[self.current].update(dt, player_x, player_y, maze)
+        # 下一个tick从第一个没轮到的怪物开始
+        if self.deferred is not None:
+            self.cursor = self.deferred
+    
+    def monsters_in(self, x0, y0, x1, y1):
+        """矩形 [x0, x1) x [y0, y1) 内的怪物；怪物比格子少时遍历怪物，否则查空间哈希"""
+        if self.spawned <= (x1 - x0) * (y1 - y0):
+            return [monster for monster in self.active_monsters
+                    if x0 <= monster.x < x1 and y0 <= monster.y < y1]
+        cells = self.cells
+        width = self.width
+        found = []
+        for y in range(max(0, y0), y1):
+            for x in range(max(0, x0), min(width, x1)):
+                monster = cells.get(y * width + x)
+                if monster is not None:
+                    found.append(monster)
+        return found
+    
+    def position(self, monster, alpha=1.0):
+        return lerp_position(self.previous.get(monster), (monster.x, monster.y), alpha)
+
+# 更复杂的迷宫生成算法（具体实现见 maze_generation，这里保留多起点回溯的原有风格）
+def generate_maze(rng=None, width=COLS, height=ROWS, algorithm="backtracker"):
+    if rng is None:
+        rng = random
+    
+    # 从多个起点生成迷宫，创造更多分支
+    start_points = None
+    if algorithm == "backtracker":
+        start_points = [(1, 1), (width-2, height-2), (width//2, 1), (1, height//2)]
+    
+    cells = maze_generation.generate(width, height, algorithm=algorithm,
+                                     start_points=start_points, rng=rng)
+    return MazeGrid(width, height, cells)
+
+# 地刺类 - 支持动画和批次管理
+class Spike:
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+        self.active = False
+        self.animation_progress = 0.0
+        self.cycle_timer = 0
+        self.visible = False
+        self.cycle_completed = False
+        
+        # 地刺动画参数
+        self.rise_duration = SPIKE_RISE_DURATION
+        self.fall_duration = SPIKE_FALL_DURATION
+        self.hidden_duration = SPIKE_HIDDEN_DURATION
+        
+    def update(self, dt):
+        self.cycle_completed = False
+        old_active = self.active
+        
+        self.cycle_timer += dt
+        
+        cycle_length = self.rise_duration + self.fall_duration + self.hidden_duration
+        cycle_progress = (self.cycle_timer % cycle_length) / cycle_length
+        
+        if cycle_progress < self.rise_duration / cycle_length:
+            # 升起阶段
+            phase_progress = cycle_progress / (self.rise_duration / cycle_length)
+            self.animation_progress = phase_progress
+            self.active = True
+            self.visible = True
+        elif cycle_progress < (self.rise_duration + self.fall_duration) / cycle_length:
+            # 保持阶段
+            self.animation_progress = 1.0
+            self.active = True
+            self.visible = True
+        elif cycle_progress < (self.rise_duration + self.fall_duration + self.hidden_duration * 0.2) / cycle_length:
+            # 下降阶段
+            phase_progress = (cycle_progress - (self.rise_duration + self.fall_duration) / cycle_length) / (self.hidden_duration * 0.2 / cycle_length)
+            self.animation_progress = 1.0 - phase_progress
+            self.active = True
+            self.visible = True
+        else:
+            # 完全隐藏阶段 - 检测周期完成
+            self.animation_progress = 0.0
+            self.active = False
+            self.visible = False
+            
+            # 检查是否刚刚完成一个完整周期
+            if old_active and not self.active:
+                self.cycle_completed = True
+    
+
+# 单个地刺某一时刻的状态，供绘制和碰撞使用
+SpikeState = namedtuple("SpikeState", "x y active visible animation_progress")
+
+# 地刺标志位
+SPIKE_ACTIVE = 1
+SPIKE_VISIBLE = 2
+SPIKE_CYCLE_COMPLETED = 4
+
+# 地刺阵列 - 一批地刺同时生成、计时器同时从0开始、每次加同样的dt，所以整批共用一个计时器：
+# update 只推进这一个时钟并算出一次阶段（与地刺数量无关），单个地刺的状态在绘制或碰撞时按需组合；
+# 位置存成连续数组，再用按格子索引的占用表把"某格有没有活跃地刺"变成O(1)查询
+class SpikeField:
+    def __init__(self, width, height, positions=(),
+                 rise_duration=SPIKE_RISE_DURATION, fall_duration=SPIKE_FALL_DURATION,
+                 hidden_duration=SPIKE_HIDDEN_DURATION):
+        self.width = width
+        self.height = height
+        self.rise_duration = rise_duration
+        self.fall_duration = fall_duration
+        self.hidden_duration = hidden_duration
+        # 阶段边界：升起到 rise，保持到 hold_end，下降到 fall_end，之后隐藏到 cycle_length
+        self.hold_end = rise_duration + fall_duration
+        self.fall_time = hidden_duration * 0.2
+        self.fall_end = self.hold_end + self.fall_time
+        self.cycle_length = self.hold_end + hidden_duration
+        
+        self.xs = array("i")
+        self.ys = array("i")
+        # 占用表：格子 -> 地刺下标，-1 表示没有地刺
+        self.occupancy = array("i", [-1]) * (width * height)
+        for x, y in positions:
+            index = y * width + x
+            if self.occupancy[index] < 0:
+                self.occupancy[index] = len(self.xs)
+                self.xs.append(x)
+                self.ys.append(y)
+        
+        # 整批共用的时钟和当前阶段（SPIKE_* 标志位、动画进度）
+        self.timer = 0.0
+        self.flags = 0
+        self.animation_progress = 0.0
+    
+    def __len__(self):
+        return len(self.xs)
+    
+    def __iter__(self):
+        for i in range(len(self.xs)):
+            yield self.state(i)
+    
+    def state(self, i):
+        flags = self.flags
+        return SpikeState(self.xs[i], self.ys[i], bool(flags & SPIKE_ACTIVE),
+                          bool(flags & SPIKE_VISIBLE), self.animation_progress)
+    
+    @property
+    def active(self):
+        return bool(self.flags & SPIKE_ACTIVE)
+    
+    @property
+    def visible(self):
+        return bool(self.flags & SPIKE_VISIBLE)
+    
+    # 与逐个地刺计数时的含义相同：整批同时处于某个阶段，要么全部计入，要么都不计入
+    @property
+    def active_count(self):
+        return len(self.xs) if self.flags & SPIKE_ACTIVE else 0
+    
+    @property
+    def visible_count(self):
+        return len(self.xs) if self.flags & SPIKE_VISIBLE else 0
+    
+    @property
+    def completed_count(self):
+        return len(self.xs) if self.flags & SPIKE_CYCLE_COMPLETED else 0
+    
+    def phase(self, timer):
+        """时钟为 timer 秒时的 (第几个周期, 是否活跃, 动画进度)，不改变这一批的状态；
+        阶段划分只写在这里，update 和无尽模式的世界时钟都用它"""
+        cycle, t = divmod(timer, self.cycle_length)
+        if t < self.fall_end:
+            if t < self.rise_duration:
+                # 升起阶段
+                return int(cycle), True, t / self.rise_duration
+            if t < self.hold_end:
+                # 保持阶段
+                return int(cycle), True, 1.0
+            # 下降阶段
+            return int(cycle), True, 1.0 - (t - self.hold_end) / self.fall_time
+        # 完全隐藏阶段
+        return int(cycle), False, 0.0
+    
+    def update(self, dt):
+        """推进整批的时钟，O(1)；阶段划分与 Spike.update 相同"""
+        self.timer += dt
+        _, active, self.animation_progress = self.phase(self.timer)
+        if active:
+            self.flags = SPIKE_ACTIVE | SPIKE_VISIBLE
+        else:
+            # 从活跃变为隐藏的那一帧算作完成一个周期
+            self.flags = SPIKE_CYCLE_COMPLETED if self.flags & SPIKE_ACTIVE else 0
+    
+    def time_until_hidden(self):
+        """距离这一批下一次从活跃变为隐藏（也就是可以换批）还有多少秒"""
+        t = self.timer % self.cycle_length
+        if t < self.fall_end:
+            return self.fall_end - t
+        return self.cycle_length - t + self.fall_end
+    
+    def ticks_until_hidden(self, dt):
+        """每个tick调用一次 update(dt) 时，第几个tick这一批从活跃变为隐藏；
+        tick数按 time_until_hidden 直接算出。边界常常正好落在整tick上，浮点累加可能差一个tick，
+        所以从估算值前两个tick起按 update 的累加方式核对"""
+        guess = max(1, math.ceil(self.time_until_hidden() / dt))
+        ticks = max(guess - 2, 0)
+        timer = self.timer
+        for _ in range(ticks):
+            timer += dt
+        was_active = self.active if ticks == 0 else timer % self.cycle_length < self.fall_end
+        while True:
+            ticks += 1
+            timer += dt
+            active = timer % self.cycle_length < self.fall_end
+            if was_active and not active:
+                return ticks
+            was_active = active
+    
+    def spike_at(self, x, y):
+        """返回该格上的地刺下标，没有则返回-1"""
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self.occupancy[y * self.width + x]
+        return -1
+    
+    def indices_in(self, x0, y0, x1, y1):
+        """矩形 [x0, x1) x [y0, y1) 内的地刺下标；地刺比矩形里的格子少时直接遍历地刺，
+        否则按占用表逐行扫描，耗时不超过矩形的大小"""
+        x0, y0 = max(0, x0), max(0, y0)
+        x1, y1 = min(self.width, x1), min(self.height, y1)
+        if x0 >= x1 or y0 >= y1:
+            return []
+        
+        xs, ys = self.xs, self.ys
+        if len(xs) <= (x1 - x0) * (y1 - y0):
+            return [i for i in range(len(xs)) if x0 <= xs[i] < x1 and y0 <= ys[i] < y1]
+        
+        occupancy = self.occupancy
+        indices = []
+        for y in range(y0, y1):
+            row = y * self.width
+            indices.extend(i for i in occupancy[row + x0:row + x1] if i >= 0)
+        return indices
+    
+    def is_active_at(self, x, y):
+        return bool(self.flags & SPIKE_ACTIVE) and self.spike_at(x, y) >= 0
+    
+    def all_cycle_completed(self):
+        return len(self.xs) > 0 and bool(self.flags & SPIKE_CYCLE_COMPLETED)
+    
+    def all_hidden(self):
+        return not len(self.xs) or not self.flags & (SPIKE_ACTIVE | SPIKE_VISIBLE)
+
+# 可放地刺的格子索引 - 每个迷宫预先算一次所有通道格（不含起点和终点）
+class FreeCellIndex:
+    def __init__(self, maze, exclude=None):
+        if exclude is None:
+            exclude = [(1, 1), (maze.width-2, maze.height-2)]
+        excluded = {maze.index(x, y) for x, y in exclude if maze.in_bounds(x, y)}
+        
+        self.maze = maze
+        cells = maze.cells
+        self.indices = array("i", [i for i in range(len(cells))
+                                   if cells[i] == 0 and i not in excluded])
+    
+    def __len__(self):
+        return len(self.indices)
+    
+    def sample(self, player_x, player_y, count, rng):
+        """无放回抽样，再过滤掉离主角太近的格子，返回恰好 min(count, 可用格子数-5) 个位置"""
+        indices = self.indices
+        # 如果可用格子太少，减少地刺数量
+        actual_count = min(count, len(indices) - 5)
+        if actual_count <= 0:
+            return []
+        
+        # 允许出现在主角附近，但不能太近（至少1格距离）：离主角不到1.2格的只有主角所在格和上下左右4格，
+        # 多抽5个一定够用；先按下标排除这5格，再只给留下的格子算坐标
+        maze = self.maze
+        width = maze.width
+        near = {maze.index(player_x + dx, player_y + dy) for dx, dy in ((0, 0),) + tuple(DIRECTIONS)
+                if maze.in_bounds(player_x + dx, player_y + dy)}
+        picked = [indices[k] for k in rng.sample(range(len(indices)), min(len(indices), actual_count + 5))]
+        picked = [index for index in picked if index not in near][:actual_count]
+        return [(index % width, index // width) for index in picked]
+
+# 每批地刺的数量：默认尺寸30个，更大的迷宫按面积保持同样的密度
+def default_spike_count(width, height):
+    return max(30, 30 * width * height // (COLS * ROWS))
+
+# 生成新的随机地刺位置
+def generate_random_spikes(maze, player_x, player_y, count=30, rng=None, free_cells=None):
+    if rng is None:
+        rng = random
+    if free_cells is None:
+        free_cells = FreeCellIndex(maze)
+    return [Spike(x, y) for x, y in free_cells.sample(player_x, player_y, count, rng)]
+
+# 一个关卡：种子、迷宫和第一批地刺的位置
+class Level:
+    def __init__(self, seed, maze, spikes, free_cells=None):
+        self.seed = seed
+        self.maze = maze
+        self.spikes = spikes
+        self.free_cells = free_cells
+
+# 按种子生成关卡：迷宫和第一批地刺都取自同一个 random.Random(seed)；
+# GameSession.reset(seed)、关卡包和录像重放都走这里，同一个种子得到完全相同的开局
+def generate_level(seed, width=COLS, height=ROWS, spike_count=30, algorithm="backtracker"):
+    rng = random.Random(seed)
+    maze = generate_maze(rng, width, height, algorithm)
+    free_cells = FreeCellIndex(maze)
+    return Level(seed, maze, free_cells.sample(1, 1, spike_count, rng), free_cells)
+
+# 检查移动是否有效
+def is_valid_move(maze, x, y):
+    return maze.is_open(x, y)
+
+# 玩家输入
+class Action:
+    NONE = 0
+    UP = 1
+    DOWN = 2
+    LEFT = 3
+    RIGHT = 4
+
+ACTION_DELTAS = {
+    Action.NONE: (0, 0),
+    Action.UP: (0, -1),
+    Action.DOWN: (0, 1),
+    Action.LEFT: (-1, 0),
+    Action.RIGHT: (1, 0),
+}
+
+# 固定步长模拟的默认频率（每秒tick数），与渲染帧率无关
+TICK_RATE = 60
+PLAYER_MOVE_INTERVAL = 0.1  # 玩家每移动一格至少间隔的秒数
+
+# 两个tick之间的插值位置；跳跃超过一格（出生、激活）时不插值
+def lerp_position(previous, current, alpha):
+    if previous is None or abs(current[0] - previous[0]) + abs(current[1] - previous[1]) > 1:
+        return current
+    return (previous[0] + (current[0] - previous[0]) * alpha,
+            previous[1] + (current[1] - previous[1]) * alpha)
+
+_getrandbits = random.Random.getrandbits
+
+# 记录播种以来用掉了多少个32位随机数的Random，(种子, 个数) 就能重建出完全相同的状态，
+# 存档时不用保存梅森旋转约2.5KB的内部状态；随机数序列与 random.Random 完全相同
+class CountingRandom(random.Random):
+    def seed(self, a=None, version=2):
+        super().seed(a, version)
+        # 只有整数种子能重建；None（系统熵）等其他种子记为None
+        self.initial_seed = a if isinstance(a, int) else None
+        self.words = 0
+    
+    def random(self):
+        self.words += 2
+        return super().random()
+    
+    def getrandbits(self, k):
+        if k > 0:
+            self.words += (k - 1) // 32 + 1
+        return super().getrandbits(k)
+    
+    def _randbelow(self, n):
+        # 与 random.Random._randbelow 相同，但直接调用C实现的getrandbits、最后一次性计数；
+        # sample/choice/randrange 每个数都经过这里，少一层Python调用（换批地刺时要抽几千个数）
+        k = n.bit_length()
+        calls = 1
+        r = _getrandbits(self, k)
+        while r >= n:
+            r = _getrandbits(self, k)
+            calls += 1
+        if k > 0:
+            self.words += calls * ((k - 1) // 32 + 1)
+        return r
+    
+    def setstate(self, state):
+        super().setstate(state)
+        self.initial_seed = None
+    
+    def skip(self, words):
+        """跳过 words 个32位随机数，每次最多取一整块（624个）"""
+        self.words += words
+        while words > 0:
+            count = min(words, 624)
+            super().getrandbits(32 * count)
+            words -= count
+
+# 一局游戏的完整状态和规则，前端只负责输入和绘制
+class GameSession:
+    def __init__(self, spike_count=30, maze_algorithm="backtracker", tick_rate=TICK_RATE,
+                 width=COLS, height=ROWS, crowd_size=CROWD_SIZE):
+        self.spike_count = spike_count
+        self.crowd_size = crowd_size
+        self.maze_algorithm = maze_algorithm
+        # 不传关卡时生成的迷宫尺寸，可以比窗口大
+        self.width = width
+        self.height = height
+        self.tick_rate = tick_rate
+        self.tick_dt = 1.0 / tick_rate
+        # 玩家每隔多少个tick才能移动一格
+        self.move_interval = max(1, round(PLAYER_MOVE_INTERVAL * tick_rate))
+        self.monster_activation_moves = MONSTER_ACTIVATION_MOVES
+        
+        self.state = GameState.MENU
+        self.difficulty = None
+        self.seed = None
+        self.rng = CountingRandom()
+        
+        self.maze = None
+        self.free_cells = None
+        self.spikes = SpikeField(0, 0)
+        self.monster = None
+        self.crowd = None
+        self.player_x, self.player_y = 1, 1
+        self.player_move_count = 0
+        self.move_delay = 0
+        self.need_respawn = False
+        self.tick = 0
+        
+        # 上一个tick结束时的位置，用于绘制插值
+        self.previous_player = None
+        self.previous_monster = None
+        
+        # 可选的帧分析器（frame_profiler.FrameProfiler），为None时不计时
+        self.profiler = None
+    
+    def reset(self, seed=None, difficulty=Difficulty.NORMAL, level=None):
+        """用给定种子（None 时随机选一个）和难度开始新的一局；传入预生成的关卡时直接使用它的迷宫和第一批地刺。
+        只给种子时按 generate_level 生成关卡，与录像重放的开局相同"""
+        if level is None:
+            if seed is None:
+                seed = random.getrandbits(63)
+            level = generate_level(seed, self.width, self.height, self.spike_count, self.maze_algorithm)
+        seed = level.seed
+        self.seed = seed
+        self.rng = CountingRandom(seed)
+        self.difficulty = difficulty
+        self.state = GameState.PLAYING
+        
+        self.player_x, self.player_y = 1, 1
+        self.maze = level.maze
+        self.free_cells = level.free_cells
+        if self.free_cells is None:
+            self.free_cells = FreeCellIndex(self.maze)
+        self.spikes = SpikeField(self.maze.width, self.maze.height, level.spikes)
+        # Hard模式有怪物，出生在主角位置
+        self.monster = Monster(1, 1, rng=self.rng) if difficulty == Difficulty.HARD else None
+        # 怪物群模式
+        self.crowd = None
+        if difficulty == Difficulty.CROWD:
+            self.crowd = MonsterCrowd(self.crowd_size, self.free_cells, self.rng, self.monster_activation_moves)
+        self.player_move_count = 0
+        self.move_delay = 0
+        self.need_respawn = False
+        self.tick = 0
+        self.previous_player = None
+        self.previous_monster = None
+        return self
+    
+    @property
+    def goal(self):
+        return (self.maze.width-2, self.maze.height-2)
+    
+    def step(self, action=Action.NONE):
+        """推进一个固定时长的tick：更新地刺、怪物，然后处理玩家移动，返回当前状态"""
+        if self.state != GameState.PLAYING:
+            return self.state
+        
+        dt = self.tick_dt
+        monster = self.monster
+        self.previous_player = (self.player_x, self.player_y)
+        self.previous_monster = (monster.x, monster.y) if monster and monster.active else None
+        
+        self.tick += 1
+        profiler = self.profiler
+        if profiler is None:
+            self.update_spikes(dt)
+            self.update_monster(dt)
+            if self.state == GameState.PLAYING:
+                self.move_player(action)
+            return self.state
+        
+        with profiler.phase("spike update"):
+            self.spikes.update(dt)
+        with profiler.phase("respawn"):
+            self.respawn_spikes()
+        with profiler.phase("monster update"):
+            self.update_monster(dt)
+        if self.state == GameState.PLAYING:
+            with profiler.phase("movement"):
+                self.move_player(action)
+        return self.state
+    
+    def player_position(self, alpha=1.0):
+        """alpha 为距上一个tick的比例（0~1），返回插值后的格子坐标"""
+        return lerp_position(self.previous_player, (self.player_x, self.player_y), alpha)
+    
+    def monster_position(self, alpha=1.0):
+        monster = self.monster
+        return lerp_position(self.previous_monster, (monster.x, monster.y), alpha)
+    
+    def state_hash(self):
+        """整局状态的摘要（迷宫、玩家、怪物、地刺、计数器和随机数状态），用于校验回放是否一致"""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(struct.pack("<12sIiiIIB", self.state.encode("ascii"), self.tick,
+                                  self.player_x, self.player_y, self.player_move_count,
+                                  self.move_delay, self.need_respawn))
+        if self.maze is not None:
+            digest.update(struct.pack("<HH", self.maze.width, self.maze.height))
+            digest.update(self.maze.cells)
+        monster = self.monster
+        if monster is not None:
+            digest.update(struct.pack("<iiBId", monster.x, monster.y, monster.active,
+                                      monster.move_count, monster.move_timer))
+        # 按逐个地刺保存计时器时的列布局摘要，旧录像的状态摘要仍然有效
+        spikes = self.spikes
+        count = len(spikes)
+        for column in (spikes.xs, spikes.ys, array("d", [spikes.timer]) * count,
+                       array("d", [spikes.animation_progress]) * count):
+            if sys.byteorder != "little":
+                column = array(column.typecode, column)
+                column.byteswap()
+            digest.update(column.tobytes())
+        digest.update(bytes([spikes.flags]) * count)
+        crowd = self.crowd
+        if crowd is not None:
+            digest.update(struct.pack("<II", crowd.spawned, crowd.cursor))
+            for monster in crowd.active_monsters:
+                digest.update(struct.pack("<iiId", monster.x, monster.y, monster.move_count, monster.move_timer))
+        digest.update(repr(self.rng.getstate()).encode("ascii"))
+        return digest.digest()
+    
+    def spawn_spikes(self):
+        positions = self.free_cells.sample(self.player_x, self.player_y, self.spike_count, self.rng)
+        return SpikeField(self.maze.width, self.maze.height, positions)
+    
+    def update_spikes(self, dt):
+        # 更新地刺动画并检查是否完成周期
+        self.spikes.update(dt)
+        self.respawn_spikes()
+    
+    def respawn_spikes(self):
+        # 当地刺批次完成完整周期后重新生成
+        if self.spikes.all_cycle_completed() and not self.need_respawn:
+            self.need_respawn = True
+        
+        # 在下一批地刺开始前重新生成位置
+        if self.need_respawn and self.spikes.all_hidden():
+            self.spikes = self.spawn_spikes()
+            self.need_respawn = False
+    
+    def update_monster(self, dt):
+        crowd = self.crowd
+        if crowd is not None:
+            crowd.update(dt, self.player_x, self.player_y, self.player_move_count, self.maze)
+            # 空间哈希里查主角所在格有没有怪物
+            if crowd.monster_at(self.player_x, self.player_y) is not None:
+                self.state = GameState.GAME_OVER
+            return
+        
+        monster = self.monster
+        if not monster or self.difficulty != Difficulty.HARD:
+            return
+        
+        # 玩家移动5格后激活怪物
+        if not monster.active and self.player_move_count >= self.monster_activation_moves:
+            monster.activate(self.player_x, self.player_y, self.maze)
+        
+        monster.update(dt, self.player_x, self.player_y, self.maze)
+        
+        # 检查怪物碰撞
+        if monster.active and monster.x == self.player_x and monster.y == self.player_y:
+            self.state = GameState.GAME_OVER
+    
+    def move_player(self, action):
+        # 处理连续移动
+        self.move_delay += 1
+        if self.move_delay < self.move_interval:
+            return
+        
+        dx, dy = ACTION_DELTAS[action]
+        new_x, new_y = self.player_x + dx, self.player_y + dy
+        if not is_valid_move(self.maze, new_x, new_y) or (new_x, new_y) == (self.player_x, self.player_y):
+            return
+        
+        self.player_x, self.player_y = new_x, new_y
+        self.move_delay = 0
+        self.player_move_count += 1
+        
+        # 检查是否到达终点
+        if (self.player_x, self.player_y) == self.goal:
+            self.state = GameState.VICTORY
+        
+        # 检查是否碰到活跃的地刺
+        if self.spikes.is_active_at(self.player_x, self.player_y):
+            self.state = GameState.GAME_OVER
+
+# 不绘制、不限速地推进一局，用于快进和批量评估；policy(session) 返回每个tick的动作
+def run_session(session, policy, max_ticks=None):
+    while session.state == GameState.PLAYING:
+        if max_ticks is not None and session.tick >= max_ticks:
+            break
+        session.step(policy(session))
+    return session.state
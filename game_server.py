@@ -0,0 +1,635 @@
+import argparse
+import asyncio
+import random
+import socket
+import struct
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from frame_profiler import FrameProfiler
+from game_core import (
+    ROWS, COLS, TICK_RATE, ACTION_DELTAS, Action, Difficulty, GameSession, GameState, Monster, SpikeField,
+    default_spike_count, lerp_position,
+)
+from level_pack import build_level
+from maze_grid import MazeGrid
+from replay import DIFFICULTY_CODES, DIFFICULTIES, STATE_CODES, STATES
+
+# 多局游戏服务器 - 一个asyncio进程里按固定tick推进几百局权威的GameSession，
+# 客户端通过本地socket发送输入，每个tick只收到有变化的部分
+#
+#   python game_server.py serve --port 7777
+#   python puzzle.py --connect 127.0.0.1:7777          # pygame客户端
+#   python game_server.py load --clients 100 200 400   # 无窗口的压测客户端
+#
+# 每条消息（小端）：payload长度(I) 类型(B) payload
+#
+# 客户端 -> 服务器
+#   JOIN     difficulty(B) seed(q, 负数表示随机)       开始一局
+#   INPUT    action(B) seq(H)                         之后每个tick都按这个动作推进，直到下一次INPUT
+#   RESTART  difficulty(B)                            用新关卡重新开始
+#   STATS                                             查询服务器的tick耗时
+#
+# 服务器 -> 客户端
+#   START    session_id(I) tick_rate(H) width(H) height(H) difficulty(B) seed(Q) activation_moves(B) 迷宫位图
+#   SPIKES   tick(I) timer(d) flags(B) count(I) 地刺一维下标(count 个 I)   开局和每次换批时发送
+#   TICK     tick(I) mask(B) 再按 mask 的位顺序跟随各字段，没有变化的tick不发送：
+#              DELTA_PLAYER   x(H) y(H) move_count(I)
+#              DELTA_MONSTER  active(B) x(H) y(H)
+#              DELTA_SPIKES   flags(B) timer(d)      地刺阶段变化时同步时钟，其余时间客户端自己推进
+#              DELTA_STATE    state(B)
+#              DELTA_ACK      seq(H)                 本tick已经用上的最后一个INPUT
+#   STATS    sessions(I) ticks(Q) late_ticks(Q) p50(d) p95(d) p99(d) bytes_sent(Q)
+#   ERROR    UTF-8 文本
+#
+# 怪物群模式每个tick有几十个怪物移动，不在服务器上提供
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 7777
+MAX_FRAME = 1 << 20  # 单条消息的长度上限，防止错误的长度字段占满内存
+MAX_WRITE_BUFFER = 256 * 1024  # 客户端积压超过这么多字节时断开它，不让慢客户端拖住服务器
+MAX_LAG = 0.25  # 落后超过这么多秒时放弃补跑，与 puzzle.MAX_FRAME_TIME 相同
+
+FRAME = struct.Struct("<IB")
+
+JOIN = 1
+INPUT = 2
+RESTART = 3
+STATS = 4
+
+START = 1
+SPIKES = 2
+TICK = 3
+STATS_REPLY = 4
+ERROR = 5
+
+DELTA_PLAYER = 1
+DELTA_MONSTER = 2
+DELTA_SPIKES = 4
+DELTA_STATE = 8
+DELTA_ACK = 16
+
+JOIN_MESSAGE = struct.Struct("<Bq")
+INPUT_MESSAGE = struct.Struct("<BH")
+RESTART_MESSAGE = struct.Struct("<B")
+START_MESSAGE = struct.Struct("<IHHHBQB")
+SPIKES_MESSAGE = struct.Struct("<IdBI")
+TICK_MESSAGE = struct.Struct("<IB")
+PLAYER_FIELDS = struct.Struct("<HHI")
+MONSTER_FIELDS = struct.Struct("<BHH")
+SPIKE_FIELDS = struct.Struct("<Bd")
+STATE_FIELDS = struct.Struct("<B")
+ACK_FIELDS = struct.Struct("<H")
+STATS_MESSAGE = struct.Struct("<IQQdddQ")
+
+SERVED_DIFFICULTIES = (Difficulty.NORMAL, Difficulty.HARD)
+
+def encode_frame(kind, payload=b""):
+    return FRAME.pack(len(payload), kind) + payload
+
+def split_frames(buffer):
+    """从 buffer 开头取出所有完整的消息，返回 [(类型, payload)]，剩下不完整的部分留在 buffer 里"""
+    frames = []
+    offset = 0
+    while len(buffer) - offset >= FRAME.size:
+        length, kind = FRAME.unpack_from(buffer, offset)
+        end = offset + FRAME.size + length
+        if end > len(buffer):
+            break
+        frames.append((kind, bytes(buffer[offset + FRAME.size:end])))
+        offset = end
+    del buffer[:offset]
+    return frames
+
+async def read_frame(reader):
+    length, kind = FRAME.unpack(await reader.readexactly(FRAME.size))
+    if length > MAX_FRAME:
+        raise ValueError(f"message of {length} bytes is too long")
+    return kind, await reader.readexactly(length)
+
+def encode_spikes(session):
+    spikes = session.spikes
+    width = session.maze.width
+    indices = array("I", [y * width + x for x, y in zip(spikes.xs, spikes.ys)])
+    if sys.byteorder != "little":
+        indices.byteswap()
+    return encode_frame(SPIKES, SPIKES_MESSAGE.pack(session.tick, spikes.timer, spikes.flags, len(indices)) +
+                        indices.tobytes())
+
+def make_level(seed, width, height, spike_count, algorithm):
+    """生成一个可以通关的关卡，终点不可达时按种子推出下一个种子重试；在工作进程里跑"""
+    level = build_level(seed, width, height, spike_count, algorithm)
+    while level is None:
+        seed = random.Random(seed).getrandbits(63)
+        level = build_level(seed, width, height, spike_count, algorithm)
+    return level
+
+# 服务器上的一个连接和它的那一局
+class Player:
+    def __init__(self, session_id, writer, tick_rate, width, height):
+        self.id = session_id
+        self.writer = writer
+        self.session = GameSession(default_spike_count(width, height), tick_rate=tick_rate,
+                                   width=width, height=height)
+        self.rng = random.Random()
+        self.action = Action.NONE
+        self.seq = 0
+        self.acked_seq = 0
+        # 上次发给客户端的状态，用来算增量
+        self.sent_player = None
+        self.sent_monster = None
+        self.sent_spikes = None
+        self.sent_flags = None
+        self.sent_state = None
+
+    def level_options(self, seed=-1):
+        """make_level 的参数：种子（负数时换成随机种子）和这一局的迷宫设置"""
+        session = self.session
+        if seed < 0:
+            seed = self.rng.getrandbits(63)
+        return seed, session.width, session.height, session.spike_count, session.maze_algorithm
+
+    def start(self, difficulty, level):
+        """用 make_level 生成的关卡开始新的一局，返回要发送的START和SPIKES"""
+        session = self.session
+        session.reset(difficulty=difficulty, level=level)
+        self.action = Action.NONE
+
+        maze = session.maze
+        data = encode_frame(START, START_MESSAGE.pack(self.id, session.tick_rate, maze.width, maze.height,
+                                                      DIFFICULTY_CODES[difficulty], level.seed,
+                                                      session.monster_activation_moves) + maze.pack_bits())
+        data += encode_spikes(session)
+        self.sent_player = (session.player_x, session.player_y, session.player_move_count)
+        self.sent_monster = self.monster_fields()
+        self.sent_spikes = session.spikes
+        self.sent_flags = session.spikes.flags
+        self.sent_state = session.state
+        return data
+
+    def monster_fields(self):
+        monster = self.session.monster
+        if monster is None:
+            return None
+        return (monster.active, monster.x, monster.y)
+
+    def delta(self):
+        """自上次调用以来的变化，编码成一条TICK消息（地刺换批时前面再加一条SPIKES）；没有变化时返回空字节串"""
+        session = self.session
+        if session.maze is None:
+            return b""
+        data = b""
+        mask = 0
+        fields = []
+
+        player = (session.player_x, session.player_y, session.player_move_count)
+        if player != self.sent_player:
+            mask |= DELTA_PLAYER
+            fields.append(PLAYER_FIELDS.pack(*player))
+            self.sent_player = player
+
+        monster = self.monster_fields()
+        if monster != self.sent_monster:
+            mask |= DELTA_MONSTER
+            fields.append(MONSTER_FIELDS.pack(*monster))
+            self.sent_monster = monster
+
+        spikes = session.spikes
+        if spikes is not self.sent_spikes:
+            data = encode_spikes(session)
+            self.sent_spikes = spikes
+            self.sent_flags = spikes.flags
+        elif spikes.flags != self.sent_flags:
+            mask |= DELTA_SPIKES
+            fields.append(SPIKE_FIELDS.pack(spikes.flags, spikes.timer))
+            self.sent_flags = spikes.flags
+
+        if session.state != self.sent_state:
+            mask |= DELTA_STATE
+            fields.append(STATE_FIELDS.pack(STATE_CODES[session.state]))
+            self.sent_state = session.state
+
+        if self.seq != self.acked_seq:
+            mask |= DELTA_ACK
+            fields.append(ACK_FIELDS.pack(self.seq))
+            self.acked_seq = self.seq
+
+        if mask:
+            data += encode_frame(TICK, TICK_MESSAGE.pack(session.tick, mask) + b"".join(fields))
+        return data
+
+class GameServer:
+    def __init__(self, tick_rate=TICK_RATE, width=COLS, height=ROWS, max_sessions=2000, profile_trace=None,
+                 level_workers=None):
+        self.tick_rate = tick_rate
+        self.tick_dt = 1.0 / tick_rate
+        self.width = width
+        self.height = height
+        self.max_sessions = max_sessions
+        self.players = {}
+        self.next_id = 1
+        self.ticks = 0
+        self.late_ticks = 0
+        self.bytes_sent = 0
+        # 每个服务器tick算作一帧，最近5秒的耗时用于STATS
+        self.profiler = FrameProfiler(window=tick_rate * 5, trace_path=profile_trace)
+        # 生成关卡的工作进程，第一次用到时才启动
+        self.level_pool = ProcessPoolExecutor(level_workers)
+
+    async def handle(self, reader, writer):
+        if len(self.players) >= self.max_sessions:
+            writer.write(encode_frame(ERROR, b"server is full"))
+            writer.close()
+            return
+        loop = asyncio.get_running_loop()
+        player = Player(self.next_id, writer, self.tick_rate, self.width, self.height)
+        self.next_id += 1
+        self.players[player.id] = player
+        try:
+            while True:
+                kind, payload = await read_frame(reader)
+                if kind == INPUT:
+                    action, seq = INPUT_MESSAGE.unpack(payload)
+                    if action in ACTION_DELTAS:
+                        player.action = action
+                        player.seq = seq
+                elif kind in (JOIN, RESTART):
+                    if kind == JOIN:
+                        code, seed = JOIN_MESSAGE.unpack(payload)
+                    else:
+                        code, = RESTART_MESSAGE.unpack(payload)
+                        seed = -1
+                    difficulty = DIFFICULTIES.get(code)
+                    if difficulty not in SERVED_DIFFICULTIES:
+                        self.send(player, encode_frame(ERROR, b"unsupported difficulty"))
+                        continue
+                    # 生成关卡要几到几十毫秒，放到工作进程里，事件循环照常跑tick；
+                    # 用线程的话生成关卡的纯Python代码会和tick抢GIL
+                    level = await loop.run_in_executor(self.level_pool, make_level, *player.level_options(seed))
+                    self.send(player, player.start(difficulty, level))
+                elif kind == STATS:
+                    self.send(player, encode_frame(STATS_REPLY, self.stats()))
+                else:
+                    self.send(player, encode_frame(ERROR, f"unknown message type {kind}".encode()))
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError, struct.error):
+            pass
+        finally:
+            self.players.pop(player.id, None)
+            writer.close()
+
+    def send(self, player, data):
+        writer = player.writer
+        if writer.is_closing():
+            return
+        writer.write(data)
+        self.bytes_sent += len(data)
+        # 慢客户端：积压太多就断开，asyncio的写缓冲不会自己限制大小
+        if writer.transport.get_write_buffer_size() > MAX_WRITE_BUFFER:
+            self.players.pop(player.id, None)
+            writer.transport.abort()
+
+    def tick(self):
+        """所有进行中的局各推进一个tick，再把增量发给各自的客户端"""
+        profiler = self.profiler
+        profiler.begin_frame()
+        players = list(self.players.values())
+        with profiler.phase("simulate"):
+            for player in players:
+                session = player.session
+                if session.state == GameState.PLAYING:
+                    session.step(player.action)
+        with profiler.phase("send"):
+            for player in players:
+                data = player.delta()
+                if data:
+                    self.send(player, data)
+        profiler.end_frame()
+        self.ticks += 1
+
+    def stats(self):
+        p = self.profiler.percentiles()
+        sessions = sum(1 for player in self.players.values() if player.session.maze is not None)
+        return STATS_MESSAGE.pack(sessions, self.ticks, self.late_ticks, p[50], p[95], p[99],
+                                  self.bytes_sent)
+
+    async def run_ticks(self):
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while True:
+            next_tick += self.tick_dt
+            delay = next_tick - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                # 来不及了：这个tick紧接着跑；落后太多时放弃补跑
+                self.late_ticks += 1
+                if delay < -MAX_LAG:
+                    next_tick = loop.time()
+                await asyncio.sleep(0)
+            self.tick()
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        server = await asyncio.start_server(self.handle, host, port, backlog=1024)
+        print(f"serving on {host}:{port} at {self.tick_rate} ticks/s")
+        async with server:
+            try:
+                await self.run_ticks()
+            finally:
+                self.profiler.close()
+                self.level_pool.shutdown(cancel_futures=True)
+
+# 客户端上的一局：按服务器发来的消息重建出 puzzle 绘制所需的 GameSession 字段
+class RemoteSession:
+    def __init__(self):
+        self.state = GameState.MENU
+        self.session_id = None
+        self.difficulty = None
+        self.seed = None
+        self.tick_rate = TICK_RATE
+        self.tick_dt = 1.0 / TICK_RATE
+        self.tick = 0
+        self.monster_activation_moves = 5
+
+        self.maze = None
+        self.spikes = SpikeField(0, 0)
+        self.monster = None
+        self.crowd = None
+        self.player_x, self.player_y = 1, 1
+        self.player_move_count = 0
+        self.previous_player = None
+        self.previous_monster = None
+        self.acked_seq = 0
+        self.received_at = 0.0
+        self.error = None
+
+    @property
+    def goal(self):
+        return (self.maze.width-2, self.maze.height-2)
+
+    def apply(self, kind, payload, now=None):
+        """应用一条服务器消息"""
+        if now is None:
+            now = time.perf_counter()
+        if kind == START:
+            (self.session_id, self.tick_rate, width, height, difficulty, self.seed,
+             self.monster_activation_moves) = START_MESSAGE.unpack_from(payload)
+            self.tick_dt = 1.0 / self.tick_rate
+            self.difficulty = DIFFICULTIES[difficulty]
+            self.maze = MazeGrid.from_bits(width, height, payload[START_MESSAGE.size:])
+            self.state = GameState.PLAYING
+            self.tick = 0
+            self.monster = Monster(1, 1) if self.difficulty == Difficulty.HARD else None
+            self.player_x, self.player_y = 1, 1
+            self.player_move_count = 0
+            self.previous_player = None
+            self.previous_monster = None
+        elif kind == SPIKES:
+            self.tick, timer, flags, count = SPIKES_MESSAGE.unpack_from(payload)
+            indices = array("I")
+            indices.frombytes(payload[SPIKES_MESSAGE.size:SPIKES_MESSAGE.size + count * 4])
+            if sys.byteorder != "little":
+                indices.byteswap()
+            width = self.maze.width
+            self.spikes = SpikeField(width, self.maze.height, [(i % width, i // width) for i in indices])
+            self.sync_spikes(timer, flags)
+        elif kind == TICK:
+            self.apply_tick(payload)
+            self.received_at = now
+        elif kind == ERROR:
+            self.error = payload.decode("utf-8", "replace")
+        return kind
+
+    def apply_tick(self, payload):
+        self.tick, mask = TICK_MESSAGE.unpack_from(payload)
+        offset = TICK_MESSAGE.size
+        # 没有出现在增量里的实体这个tick没动，插值的起点就是当前位置
+        self.previous_player = (self.player_x, self.player_y)
+        monster = self.monster
+        self.previous_monster = (monster.x, monster.y) if monster and monster.active else None
+
+        if mask & DELTA_PLAYER:
+            self.player_x, self.player_y, self.player_move_count = PLAYER_FIELDS.unpack_from(payload, offset)
+            offset += PLAYER_FIELDS.size
+        if mask & DELTA_MONSTER:
+            active, monster.x, monster.y = MONSTER_FIELDS.unpack_from(payload, offset)
+            if active and not monster.active:
+                self.previous_monster = None
+            monster.active = bool(active)
+            offset += MONSTER_FIELDS.size
+        if mask & DELTA_SPIKES:
+            flags, timer = SPIKE_FIELDS.unpack_from(payload, offset)
+            self.sync_spikes(timer, flags)
+            offset += SPIKE_FIELDS.size
+        if mask & DELTA_STATE:
+            self.state = STATES[payload[offset]]
+            offset += STATE_FIELDS.size
+        if mask & DELTA_ACK:
+            (self.acked_seq,) = ACK_FIELDS.unpack_from(payload, offset)
+
+    def sync_spikes(self, timer, flags):
+        spikes = self.spikes
+        spikes.timer = timer
+        spikes.update(0.0)
+        spikes.flags = flags
+
+    def advance(self, dt):
+        """两条消息之间在本地推进地刺时钟，动画不用等服务器"""
+        if self.state == GameState.PLAYING:
+            self.spikes.update(dt)
+
+    def alpha(self, now=None):
+        """距收到最近一个TICK的tick比例，用于插值"""
+        if now is None:
+            now = time.perf_counter()
+        return min(1.0, (now - self.received_at) / self.tick_dt)
+
+    def player_position(self, alpha=1.0):
+        return lerp_position(self.previous_player, (self.player_x, self.player_y), alpha)
+
+    def monster_position(self, alpha=1.0):
+        monster = self.monster
+        return lerp_position(self.previous_monster, (monster.x, monster.y), alpha)
+
+# 给pygame主循环用的同步客户端：非阻塞socket，每帧调用一次 poll()
+class GameClient:
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self.sock = socket.create_connection((host, port))
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock.setblocking(False)
+        self.buffer = bytearray()
+        self.session = RemoteSession()
+        self.action = Action.NONE
+        self.seq = 0
+
+    def send(self, kind, payload=b""):
+        self.sock.setblocking(True)
+        try:
+            self.sock.sendall(encode_frame(kind, payload))
+        finally:
+            self.sock.setblocking(False)
+
+    def join(self, difficulty=Difficulty.NORMAL, seed=-1):
+        self.send(JOIN, JOIN_MESSAGE.pack(DIFFICULTY_CODES[difficulty], seed))
+
+    def restart(self, difficulty):
+        self.action = Action.NONE
+        self.send(RESTART, RESTART_MESSAGE.pack(DIFFICULTY_CODES[difficulty]))
+
+    def set_action(self, action):
+        """动作变化时才发送"""
+        if action != self.action:
+            self.action = action
+            self.seq = (self.seq + 1) & 0xFFFF
+            self.send(INPUT, INPUT_MESSAGE.pack(action, self.seq))
+
+    def poll(self):
+        """读取并应用所有已到达的消息；服务器断开时返回False"""
+        while True:
+            try:
+                data = self.sock.recv(65536)
+            except BlockingIOError:
+                break
+            if not data:
+                return False
+            self.buffer += data
+        now = time.perf_counter()
+        for kind, payload in split_frames(self.buffer):
+            self.session.apply(kind, payload, now)
+        return True
+
+    def close(self):
+        self.sock.close()
+
+# 压测：在一个进程里开很多个无窗口客户端，随机换方向，测输入到生效的延迟
+class LoadStats:
+    def __init__(self):
+        self.latencies = []
+        self.bytes_received = 0
+        self.messages = 0
+        self.games = 0
+
+async def load_client(host, port, stats, rng, stop):
+    reader, writer = await asyncio.open_connection(host, port)
+    session = RemoteSession()
+    pending = {}
+    seq = 0
+    difficulty = rng.choice(SERVED_DIFFICULTIES)
+    writer.write(encode_frame(JOIN, JOIN_MESSAGE.pack(DIFFICULTY_CODES[difficulty], -1)))
+
+    async def send_inputs():
+        nonlocal seq
+        while not stop.is_set():
+            await asyncio.sleep(rng.uniform(0.1, 0.5))
+            seq = (seq + 1) & 0xFFFF
+            pending[seq] = time.perf_counter()
+            writer.write(encode_frame(INPUT, INPUT_MESSAGE.pack(rng.randint(Action.UP, Action.RIGHT), seq)))
+
+    inputs = asyncio.create_task(send_inputs())
+    try:
+        while not stop.is_set():
+            kind, payload = await read_frame(reader)
+            now = time.perf_counter()
+            stats.bytes_received += FRAME.size + len(payload)
+            stats.messages += 1
+            acked, state = session.acked_seq, session.state
+            session.apply(kind, payload, now)
+            if session.acked_seq != acked:
+                sent = pending.pop(session.acked_seq, None)
+                if sent is not None:
+                    stats.latencies.append(now - sent)
+                    # 更早的输入被这一个覆盖了，不会再单独确认
+                    for key in [key for key, time_sent in pending.items() if time_sent < sent]:
+                        del pending[key]
+            if session.state != state and session.state in (GameState.GAME_OVER, GameState.VICTORY):
+                stats.games += 1
+                writer.write(encode_frame(RESTART, RESTART_MESSAGE.pack(DIFFICULTY_CODES[difficulty])))
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        inputs.cancel()
+        writer.close()
+
+async def query_stats(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(encode_frame(STATS))
+    kind, payload = await read_frame(reader)
+    writer.close()
+    return STATS_MESSAGE.unpack(payload)
+
+def percentile(ordered, point):
+    if not ordered:
+        return 0.0
+    last = len(ordered) - 1
+    return ordered[min(last, round(point / 100 * last))]
+
+async def run_load(host, port, client_counts, duration, warmup=1.0, seed=0):
+    """逐级增加客户端数量，每级跑 duration 秒，打印服务器tick耗时和输入延迟"""
+    rng = random.Random(seed)
+    stop = asyncio.Event()
+    stats = LoadStats()
+    tasks = []
+    print(f"{'clients':>8} {'tick p50':>9} {'tick p99':>9} {'late':>6} "
+          f"{'lat p50':>8} {'lat p95':>8} {'lat p99':>8} {'KB/s/client':>12}")
+    for count in client_counts:
+        while len(tasks) < count:
+            tasks.append(asyncio.create_task(load_client(host, port, stats, random.Random(rng.random()), stop)))
+        await asyncio.sleep(warmup)
+
+        _, _, late_before, _, _, _, _ = await query_stats(host, port)
+        stats.latencies = []
+        stats.bytes_received = 0
+        start = time.perf_counter()
+        await asyncio.sleep(duration)
+        elapsed = time.perf_counter() - start
+        sessions, _, late_after, p50, _, p99, _ = await query_stats(host, port)
+
+        latencies = sorted(stats.latencies)
+        print(f"{sessions:8d} {p50 * 1e3:7.2f}ms {p99 * 1e3:7.2f}ms {late_after - late_before:6d} "
+              f"{percentile(latencies, 50) * 1e3:6.2f}ms {percentile(latencies, 95) * 1e3:6.2f}ms "
+              f"{percentile(latencies, 99) * 1e3:6.2f}ms {stats.bytes_received / elapsed / count / 1024:12.2f}")
+
+    stop.set()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maze Adventure multi-session game server")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="run the authoritative game server")
+    serve.add_argument("--host", default=DEFAULT_HOST)
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve.add_argument("--tick-rate", type=int, default=TICK_RATE)
+    serve.add_argument("--maze-size", metavar="WxH", default=f"{COLS}x{ROWS}")
+    serve.add_argument("--max-sessions", type=int, default=2000)
+    serve.add_argument("--profile-trace", metavar="FILE", help="write per-tick timings as a Chrome trace")
+    serve.add_argument("--level-workers", type=int, default=None,
+                       help="processes that generate levels (default: CPU count)")
+
+    load = commands.add_parser("load", help="connect many headless clients and report tick cost and latency")
+    load.add_argument("--host", default=DEFAULT_HOST)
+    load.add_argument("--port", type=int, default=DEFAULT_PORT)
+    load.add_argument("--clients", type=int, nargs="+", default=[50, 100, 200, 400],
+                      help="client counts to step through")
+    load.add_argument("--duration", type=float, default=5.0, help="seconds measured at each step")
+    load.add_argument("--seed", type=int, default=0)
+
+    args = parser.parse_args(argv)
+    try:
+        if args.command == "serve":
+            width, height = (int(n) for n in args.maze_size.lower().split("x"))
+            server = GameServer(args.tick_rate, width, height, args.max_sessions, args.profile_trace,
+                                args.level_workers)
+            asyncio.run(server.serve(args.host, args.port))
+        else:
+            asyncio.run(run_load(args.host, args.port, args.clients, args.duration, seed=args.seed))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+import argparse
+import mmap
+import os
+import random
+import struct
+import sys
+import time
+from array import array
+from multiprocessing import Pool
+
+from game_core import ROWS, COLS, TICK_RATE, FlowField, GameSession, Level, generate_level
+from maze_grid import MazeGrid
+
+# 关卡包 - 批量预生成并校验关卡，写成带索引头的紧凑二进制文件，游戏通过mmap按需读取
+#
+# 文件布局（小端）：
+#   头部   magic(4s) version(H) width(H) height(H) spike_count(H) count(I) index_offset(Q)
+#   算法名 长度(B) + ASCII，紧跟在头部之后（版本1没有这一段，地刺数和算法按生成时的默认值 30/backtracker）
+#   索引   count+1 个 Q，第 i 个关卡的数据在 [index[i], index[i+1]) 之间
+#   关卡   seed(Q) spike_count(H) 迷宫位图((width*height+7)//8 字节) 地刺一维下标(spike_count 个 I)
+
+MAGIC = b"MZLP"
+VERSION = 2
+HEADER = struct.Struct("<4sHHHHIQ")
+OFFSET = struct.Struct("<Q")
+RECORD_HEADER = struct.Struct("<QH")
+
+def build_level(seed, width=COLS, height=ROWS, spike_count=30, algorithm="backtracker"):
+    """按 generate_level 生成一个关卡；终点不可达时返回None"""
+    level = generate_level(seed, width, height, spike_count, algorithm)
+
+    # 检查从起点 (1, 1) 能否走到终点
+    field = FlowField()
+    field.update(level.maze, width - 2, height - 2)
+    if field.distance(1, 1) < 0:
+        return None
+    return level
+
+def encode_level(level):
+    width = level.maze.width
+    spikes = array("I", [y * width + x for x, y in level.spikes])
+    if sys.byteorder != "little":
+        spikes.byteswap()
+    return (RECORD_HEADER.pack(level.seed, len(spikes)) +
+            level.maze.pack_bits() + spikes.tobytes())
+
+def decode_level(data, width, height):
+    seed, spike_count = RECORD_HEADER.unpack_from(data, 0)
+    offset = RECORD_HEADER.size
+    maze_bytes = (width * height + 7) // 8
+    maze = MazeGrid.from_bits(width, height, data[offset:offset + maze_bytes])
+    offset += maze_bytes
+
+    spikes = array("I")
+    spikes.frombytes(data[offset:offset + spike_count * 4])
+    if sys.byteorder != "little":
+        spikes.byteswap()
+    return Level(seed, maze, [(index % width, index // width) for index in spikes])
+
+# 进程池的工作函数：返回 (种子, 编码后的关卡或None)
+def _build_encoded(task):
+    seed, width, height, spike_count, algorithm = task
+    level = build_level(seed, width, height, spike_count, algorithm)
+    return seed, encode_level(level) if level is not None else None
+
+def write_pack(path, seeds, width=COLS, height=ROWS, spike_count=30,
+               algorithm="backtracker", workers=None, chunksize=256):
+    """用进程池生成关卡并写入关卡包，返回 (写入数量, 被丢弃的种子列表)"""
+    seeds = list(seeds)
+    tasks = [(seed, width, height, spike_count, algorithm) for seed in seeds]
+    # 先按种子数量预留索引区，写完后再回填头部和索引
+    algorithm_name = algorithm.encode("ascii")
+    index_offset = HEADER.size + 1 + len(algorithm_name)
+    data_offset = index_offset + OFFSET.size * (len(seeds) + 1)
+    offsets = []
+    rejected = []
+
+    with open(path, "wb") as f:
+        f.write(b"\0" * data_offset)
+        position = data_offset
+
+        with Pool(workers) as pool:
+            for seed, record in pool.imap(_build_encoded, tasks, chunksize):
+                if record is None:
+                    rejected.append(seed)
+                    continue
+                offsets.append(position)
+                f.write(record)
+                position += len(record)
+        offsets.append(position)
+
+        f.seek(0)
+        # 回放和之后每批地刺的数量都要与生成关卡时一致，所以地刺数和算法也写进头部
+        f.write(HEADER.pack(MAGIC, VERSION, width, height, spike_count, len(offsets) - 1, index_offset))
+        f.write(bytes([len(algorithm_name)]) + algorithm_name)
+        f.write(array("Q", offsets).tobytes() if sys.byteorder == "little"
+                else b"".join(OFFSET.pack(offset) for offset in offsets))
+
+    return len(offsets) - 1, rejected
+
+# 只读关卡包，通过mmap访问，打开时只读取头部
+class LevelPack:
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.width, self.height, self.spike_count, self.count, self.index_offset = \
+            HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a level pack")
+        if version == 1:
+            self.spike_count = 30
+            self.algorithm = "backtracker"
+        elif version == VERSION:
+            length = self._map[HEADER.size]
+            self.algorithm = self._map[HEADER.size + 1:HEADER.size + 1 + length].decode("ascii")
+        else:
+            self.close()
+            raise ValueError(f"unsupported level pack version {version}")
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError("level index out of range")
+        start, end = struct.unpack_from("<QQ", self._map, self.index_offset + i * OFFSET.size)
+        return decode_level(self._map[start:end], self.width, self.height)
+
+    def new_session(self, tick_rate=TICK_RATE):
+        """按包头的尺寸、地刺数和算法创建 GameSession，换批地刺和录像都与生成关卡时一致"""
+        return GameSession(self.spike_count, self.algorithm, tick_rate, self.width, self.height)
+
+    def random_level(self, rng=random):
+        return self[rng.randrange(self.count)]
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate and inspect Maze Adventure level packs")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="generate seeded levels into a pack file")
+    build.add_argument("output")
+    build.add_argument("--count", type=int, default=1000)
+    build.add_argument("--seed", type=int, default=0, help="first seed; levels use seed..seed+count-1")
+    build.add_argument("--width", type=int, default=COLS)
+    build.add_argument("--height", type=int, default=ROWS)
+    build.add_argument("--spikes", type=int, default=30)
+    build.add_argument("--algorithm", default="backtracker")
+    build.add_argument("--workers", type=int, default=None, help="process count (default: CPU count)")
+
+    info = commands.add_parser("info", help="print a pack header")
+    info.add_argument("pack")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        start = time.perf_counter()
+        written, rejected = write_pack(args.output, range(args.seed, args.seed + args.count),
+                                       args.width, args.height, args.spikes,
+                                       args.algorithm, args.workers)
+        elapsed = time.perf_counter() - start
+        print(f"wrote {written} levels to {args.output} in {elapsed:.2f}s "
+              f"({written / elapsed if elapsed else 0:.0f} levels/s, {os.path.getsize(args.output)} bytes)")
+        if rejected:
+            print(f"rejected {len(rejected)} unreachable seeds: {rejected[:10]}")
+    else:
+        with LevelPack(args.pack) as pack:
+            print(f"{args.pack}: {len(pack)} levels, {pack.width}x{pack.height}, "
+                  f"{pack.spike_count} spikes, {pack.algorithm}")
+
+if __name__ == "__main__":
+    main()
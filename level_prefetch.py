@@ -0,0 +1,69 @@
+import random
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from game_core import FreeCellIndex
+from level_pack import LevelPack, build_level
+
+# 关卡预取 - 游戏进行时由一个工作进程提前准备好下一关，重新开始时直接取出现成的关卡。
+# 关卡与难度无关（难度只影响 reset 时放不放怪物），所有难度共用一个队列；
+# 生成大迷宫是纯计算，放在线程里会一直占着GIL卡住画面，所以和 game_server 一样放到进程里
+
+# 生成一个关卡（在工作进程里跑）：有关卡包时取第 seed % 关卡数 个关卡，
+# 否则按种子生成，终点不可达时按种子推出下一个种子重试
+def load_level(seed, pack_path=None, level_options=None):
+    if pack_path is not None:
+        with LevelPack(pack_path) as pack:
+            level = pack[seed % len(pack)]
+        # 空闲格索引也在后台建好，reset时不用再扫描整个迷宫
+        level.free_cells = FreeCellIndex(level.maze)
+        return level
+
+    level_options = level_options or {}
+    level = build_level(seed, **level_options)
+    while level is None:
+        seed = random.Random(seed).getrandbits(63)
+        level = build_level(seed, **level_options)
+    return level
+
+class LevelPrefetcher:
+    def __init__(self, depth=1, level_pack=None, seed=None, **level_options):
+        self.pack_path = level_pack.path if level_pack is not None else None
+        self.level_options = level_options
+        self.depth = depth
+        self.seed_rng = random.Random(seed)
+        # 已经交给工作进程的关卡，按提交顺序取
+        self.pending = deque()
+        self.pool = None
+
+    def start(self):
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(1)
+            self.refill()
+        return self
+
+    def stop(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+        self.pending.clear()
+
+    def make_level(self):
+        """在当前进程里同步生成一个关卡"""
+        return load_level(self.seed_rng.getrandbits(63), self.pack_path, self.level_options)
+
+    def take(self):
+        """取出一个准备好的关卡；工作进程还没生成完时等它，没有启动时同步生成"""
+        if self.pending:
+            level = self.pending.popleft().result()
+        else:
+            level = self.make_level()
+        self.refill()
+        return level
+
+    def refill(self):
+        if self.pool is None:
+            return
+        while len(self.pending) < self.depth:
+            seed = self.seed_rng.getrandbits(63)
+            self.pending.append(self.pool.submit(load_level, seed, self.pack_path, self.level_options))
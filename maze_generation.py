@@ -0,0 +1,298 @@
+import random
+from itertools import permutations
+
+# 迷宫生成 - 任意尺寸、给定种子可完全复现、不使用递归
+# 迷宫存成一维 bytearray：1 是墙，0 是通道，下标为 y * width + x
+# 生成算法都在"奇数坐标格点"上工作：格点 (2i+1, 2j+1) 是房间，相邻格点之间的偶数坐标是墙
+
+WALL = 1
+PATH = 0
+
+# Wilson算法每次从随机数生成器取多少个32位数
+_WILSON_BLOCK = 4096
+# 内部格点 randrange(4) 取最高3位：最高字节映射成方向 0-3，4 表示这个数要丢掉重取
+_WILSON_MOVES = bytes(b >> 5 if b >> 5 < 4 else 4 for b in range(256))
+
+# 回溯法每访问一个格子就需要一个随机方向顺序，预先列出全部24种排列，用一次随机数取一个
+_STEP_PERMUTATIONS = [list(p) for p in permutations([(0, -2), (2, 0), (0, 2), (-2, 0)])]
+
+def lattice_size(width, height):
+    """奇数坐标格点的列数和行数"""
+    return (width - 1) // 2, (height - 1) // 2
+
+# 递归回溯法（显式栈）- 从每个起点出发，按随机方向每次跨两格挖通道
+def carve_backtracker(cells, width, height, rng, start_points=None):
+    if start_points is None:
+        start_points = [(1, 1)]
+    choose = rng.random
+    permutation_count = len(_STEP_PERMUTATIONS)
+
+    for start_x, start_y in start_points:
+        if cells[start_y * width + start_x] != WALL:
+            continue
+
+        cells[start_y * width + start_x] = PATH
+        stack = [(start_x, start_y, iter(_STEP_PERMUTATIONS[int(choose() * permutation_count)]))]
+
+        while stack:
+            x, y, directions = stack[-1]
+            # 栈顶保存方向迭代器，回溯回来时从上次停下的方向继续
+            for dx, dy in directions:
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < width and 0 <= ny < height and cells[ny * width + nx] == WALL:
+                    cells[(y + dy // 2) * width + x + dx // 2] = PATH
+                    cells[ny * width + nx] = PATH
+                    stack.append((nx, ny, iter(_STEP_PERMUTATIONS[int(choose() * permutation_count)])))
+                    break
+            else:
+                stack.pop()
+
+# Kruskal算法 - 随机打乱所有格点之间的墙，用并查集只拆掉连接不同集合的墙
+def carve_kruskal(cells, width, height, rng, start_points=None):
+    columns, rows = lattice_size(width, height)
+    if columns <= 0 or rows <= 0:
+        return
+
+    parent = list(range(columns * rows))
+
+    # 边编码为 格点编号*2 + 方向（0 向右，1 向下）
+    edges = []
+    for j in range(rows):
+        row = j * columns
+        room = (2 * j + 1) * width + 1
+        cells[room:room + 2 * columns:2] = bytes(columns)
+        if j + 1 < rows:
+            for node in range(row, row + columns - 1):
+                edges += (node * 2, node * 2 + 1)
+            edges.append((row + columns - 1) * 2 + 1)
+        else:
+            edges += range(row * 2, (row + columns - 1) * 2, 2)
+    rng.shuffle(edges)
+
+    for edge in edges:
+        node = edge >> 1
+        other = node + columns if edge & 1 else node + 1
+        # 查找根节点并做路径减半；内联写出，一百万条边时函数调用的开销比查找本身还大
+        root_a = node
+        while parent[root_a] != root_a:
+            parent[root_a] = root_a = parent[parent[root_a]]
+        root_b = other
+        while parent[root_b] != root_b:
+            parent[root_b] = root_b = parent[parent[root_b]]
+        if root_a != root_b:
+            parent[root_a] = root_b
+            j, i = divmod(node, columns)
+            if edge & 1:
+                cells[(2 * j + 2) * width + 2 * i + 1] = PATH
+            else:
+                cells[(2 * j + 1) * width + 2 * i + 2] = PATH
+
+# Wilson算法 - 循环擦除随机游走，生成在所有生成树中均匀分布的迷宫
+def carve_wilson(cells, width, height, rng, start_points=None):
+    columns, rows = lattice_size(width, height)
+    total = columns * rows
+    if total <= 0:
+        return
+
+    # 格点状态：0 内部格点、1 边界格点（都还不在树里），2 已在树里；游走时一次查表就知道该怎么走
+    status = bytearray(b"\1") * total
+    for j in range(1, rows - 1):
+        status[j * columns + 1:(j + 1) * columns - 1] = bytes(max(columns - 2, 0))
+    # 游走时记录每个格点最后一次离开的方向，自然完成循环擦除
+    next_node = [0] * total
+    # 内部格点的四个邻居，顺序与边界格点逐个追加时相同（左、右、上、下）
+    offsets = (-1, 1, -columns, columns)
+
+    root = rng.randrange(total)
+    status[root] = 2
+    cells[(2 * (root // columns) + 1) * width + 2 * (root % columns) + 1] = PATH
+
+    # 游走要抽上百万次 randrange(n)（n 为2到4）。randrange 每次取一个32位随机数的最高 n.bit_length() 位，
+    # 不小于 n 就再取一个；这里按同样的规则直接用32位数的最高字节，结果与逐次调用 randrange 相同。
+    # 普通的 random.Random 一次取一大块，结束时退回状态再跳过实际用掉的个数，之后的随机数序列也不变；
+    # 其他随机数类（比如要计数的 CountingRandom）每次只取一个
+    block = _WILSON_BLOCK if type(rng) is random.Random else 1
+    state = None
+    tops = moves = b""
+    pos = end = 0
+
+    for start in range(total):
+        if status[start] == 2:
+            continue
+
+        node = start
+        while True:
+            kind = status[node]
+            if kind == 0:
+                while True:
+                    if pos == end:
+                        if block > 1:
+                            state = rng.getstate()
+                        tops = rng.getrandbits(32 * block).to_bytes(4 * block, "little")[3::4]
+                        moves = tops.translate(_WILSON_MOVES)
+                        pos, end = 0, block
+                    r = moves[pos]
+                    pos += 1
+                    if r < 4:
+                        break
+                following = node + offsets[r]
+            elif kind == 1:
+                j, i = divmod(node, columns)
+                neighbors = []
+                if i > 0:
+                    neighbors.append(node - 1)
+                if i + 1 < columns:
+                    neighbors.append(node + 1)
+                if j > 0:
+                    neighbors.append(node - columns)
+                if j + 1 < rows:
+                    neighbors.append(node + columns)
+                count = len(neighbors)
+                while True:
+                    if pos == end:
+                        if block > 1:
+                            state = rng.getstate()
+                        tops = rng.getrandbits(32 * block).to_bytes(4 * block, "little")[3::4]
+                        moves = tops.translate(_WILSON_MOVES)
+                        pos, end = 0, block
+                    # 边界格点的邻居不超过三个，randrange 取最高2位
+                    r = tops[pos] >> (8 - count.bit_length())
+                    pos += 1
+                    if r < count:
+                        break
+                following = neighbors[r]
+            else:
+                break
+            next_node[node] = following
+            node = following
+
+        # 沿着擦除循环后的路径把格点加入树，并拆掉路径上的墙
+        node = start
+        while status[node] != 2:
+            status[node] = 2
+            following = next_node[node]
+            j, i = divmod(node, columns)
+            l, k = divmod(following, columns)
+            cells[(2 * j + 1) * width + 2 * i + 1] = PATH
+            cells[(j + l + 1) * width + i + k + 1] = PATH
+            node = following
+
+    # 退回最后一块取之前的状态，只跳过用掉的随机数
+    if state is not None:
+        rng.setstate(state)
+        if pos:
+            rng.getrandbits(32 * pos)
+
+# Eller算法 - 逐行生成，只需要保存当前一行的集合编号
+def carve_eller(cells, width, height, rng, start_points=None):
+    columns, rows = lattice_size(width, height)
+    if columns <= 0 or rows <= 0:
+        return
+
+    parent = []
+
+    def new_set():
+        parent.append(len(parent))
+        return len(parent) - 1
+
+    def find(node):
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    chance = rng.random
+    row_sets = [-1] * columns
+
+    for j in range(rows):
+        y = 2 * j + 1
+        last_row = j == rows - 1
+
+        for i in range(columns):
+            if row_sets[i] < 0:
+                row_sets[i] = new_set()
+            cells[y * width + 2 * i + 1] = PATH
+
+        # 横向随机合并相邻的不同集合（最后一行必须全部合并）
+        for i in range(columns - 1):
+            root_a, root_b = find(row_sets[i]), find(row_sets[i + 1])
+            if root_a != root_b and (last_row or chance() < 0.5):
+                parent[root_b] = root_a
+                cells[y * width + 2 * i + 2] = PATH
+
+        if last_row:
+            break
+
+        # 每个集合至少向下打通一格
+        groups = {}
+        for i in range(columns):
+            groups.setdefault(find(row_sets[i]), []).append(i)
+
+        next_sets = [-1] * columns
+        for root, members in groups.items():
+            rng.shuffle(members)
+            for index, i in enumerate(members):
+                if index == 0 or chance() < 0.5:
+                    next_sets[i] = root
+                    cells[(y + 1) * width + 2 * i + 1] = PATH
+        row_sets = next_sets
+
+# 可插拔的生成算法表，新算法只需要注册同样签名的函数
+ALGORITHMS = {
+    "backtracker": carve_backtracker,
+    "kruskal": carve_kruskal,
+    "wilson": carve_wilson,
+    "eller": carve_eller,
+}
+
+# 添加一些额外的通道增加复杂度（在完美迷宫上制造回路）
+def add_extra_passages(cells, width, height, rng, count=None):
+    if count is None:
+        count = height * width // 50
+    randint = rng.randint
+
+    for _ in range(count):
+        x = randint(1, width - 2)
+        y = randint(1, height - 2)
+        index = y * width + x
+        if cells[index] == WALL:
+            neighbors = ((cells[index - width] == PATH) + (cells[index + 1] == PATH) +
+                         (cells[index + width] == PATH) + (cells[index - 1] == PATH))
+            if neighbors >= 2:
+                cells[index] = PATH
+
+# 保证某个格子连到奇数格点网络上（例如高度为偶数时的终点）
+def connect_to_lattice(cells, width, x, y):
+    cells[y * width + x] = PATH
+    if x % 2 == 0 and x > 1:
+        x -= 1
+        cells[y * width + x] = PATH
+    if y % 2 == 0 and y > 1:
+        y -= 1
+        cells[y * width + x] = PATH
+
+def generate(width, height, seed=None, algorithm="backtracker", extra_passages=True,
+             start_points=None, rng=None):
+    """生成 width x height 的迷宫，返回一维 bytearray；相同种子的结果逐字节相同"""
+    if width < 3 or height < 3:
+        raise ValueError("maze must be at least 3x3")
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"unknown maze algorithm: {algorithm}")
+    if rng is None:
+        rng = random.Random(seed)
+
+    cells = bytearray([WALL]) * (width * height)
+    ALGORITHMS[algorithm](cells, width, height, rng, start_points)
+
+    # 起点和终点一定是通道，且和迷宫连通
+    for x, y in ((1, 1), (width - 2, height - 2)):
+        if cells[y * width + x] == WALL:
+            connect_to_lattice(cells, width, x, y)
+
+    if extra_passages:
+        add_extra_passages(cells, width, height, rng)
+    return cells
+
+def to_rows(cells, width, height):
+    """转换为 maze[y][x] 形式的二维列表"""
+    return [list(cells[y * width:(y + 1) * width]) for y in range(height)]
@@ -0,0 +1,107 @@
+from maze_generation import WALL, PATH
+
+# 紧凑的迷宫表示 - 一维 bytearray 每格一个字节（1 墙 0 路），
+# 热点代码直接用一维下标和预先算好的邻居偏移访问，避免 maze[y][x] 的两次索引
+class MazeGrid:
+    __slots__ = ("width", "height", "cells", "neighbor_offsets", "_rows")
+
+    def __init__(self, width, height, cells=None):
+        if cells is None:
+            cells = bytearray([WALL]) * (width * height)
+        elif len(cells) != width * height:
+            raise ValueError("cell buffer does not match maze size")
+        self.width = width
+        self.height = height
+        self.cells = cells if isinstance(cells, bytearray) else bytearray(cells)
+        # 左、右、上、下（与 DIRECTIONS 的顺序一致）
+        self.neighbor_offsets = (-1, 1, -width, width)
+        self._rows = None
+
+    @classmethod
+    def from_rows(cls, rows):
+        height = len(rows)
+        width = len(rows[0]) if height else 0
+        cells = bytearray()
+        for row in rows:
+            cells.extend(row)
+        return cls(width, height, cells)
+
+    def to_rows(self):
+        width = self.width
+        return [list(self.cells[y * width:(y + 1) * width]) for y in range(self.height)]
+
+    # 兼容 maze[y][x] 的写法：每行是共享底层缓冲区的 memoryview
+    def __getitem__(self, y):
+        if self._rows is None:
+            view = memoryview(self.cells)
+            width = self.width
+            self._rows = [view[row * width:(row + 1) * width] for row in range(self.height)]
+        return self._rows[y]
+
+    def __len__(self):
+        return self.height
+
+    def __eq__(self, other):
+        if not isinstance(other, MazeGrid):
+            return NotImplemented
+        return (self.width, self.height, self.cells) == (other.width, other.height, other.cells)
+
+    def __getstate__(self):
+        return (self.width, self.height, bytes(self.cells))
+
+    def __setstate__(self, state):
+        width, height, cells = state
+        self.__init__(width, height, bytearray(cells))
+
+    def index(self, x, y):
+        return y * self.width + x
+
+    def position(self, index):
+        """一维下标 -> (x, y)"""
+        y, x = divmod(index, self.width)
+        return x, y
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def is_open(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height and self.cells[y * self.width + x] == PATH
+
+    def is_open_index(self, index):
+        return self.cells[index] == PATH
+
+    def open_neighbors(self, index):
+        """返回与该格相邻的通道格的一维下标（不会跨行越界）"""
+        width = self.width
+        cells = self.cells
+        x = index % width
+        result = []
+        if x > 0 and cells[index - 1] == PATH:
+            result.append(index - 1)
+        if x < width - 1 and cells[index + 1] == PATH:
+            result.append(index + 1)
+        if index >= width and cells[index - width] == PATH:
+            result.append(index - width)
+        if index + width < len(cells) and cells[index + width] == PATH:
+            result.append(index + width)
+        return result
+
+    def open_count(self):
+        return self.cells.count(PATH)
+
+    # 位图打包：每格1位（第 i 格对应第 i 位，小端），用于存档和关卡包
+    def pack_bits(self):
+        count = len(self.cells)
+        bits = self.cells.translate(_CELL_TO_BIT)[::-1]
+        value = int(bits, 2) if count else 0
+        return value.to_bytes((count + 7) // 8, "little")
+
+    @classmethod
+    def from_bits(cls, width, height, packed):
+        count = width * height
+        value = int.from_bytes(packed[:(count + 7) // 8], "little")
+        bits = format(value, "b").zfill(count)[::-1][:count]
+        return cls(width, height, bytearray(bits.encode("ascii").translate(_BIT_TO_CELL)))
+
+_CELL_TO_BIT = bytes.maketrans(bytes([PATH, WALL]), b"01")
+_BIT_TO_CELL = bytes.maketrans(b"01", bytes([PATH, WALL]))
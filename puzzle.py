@@ -1,17 +1,26 @@
 import pygame
-import random
+import argparse
+import os
 import sys
-import math
-from collections import deque
+import time
+from collections import OrderedDict
 
-# 初始化pygame
-pygame.init()
+from endless import ChunkedWorld, EndlessSession
+from frame_profiler import FrameProfiler, NULL_PROFILER
+from level_prefetch import LevelPrefetcher
+from replay import Recording
+from snapshot import Snapshot, RewindBuffer
+from solver import SOLVED, UNSOLVABLE, Solver
+from game_core import ROWS, COLS, GameState, Difficulty, Action, GameSession, TICK_RATE, default_spike_count
 
 # 游戏常量
 WIDTH, HEIGHT = 1000, 800
 CELL_SIZE = 30
-ROWS, COLS = HEIGHT // CELL_SIZE, WIDTH // CELL_SIZE
-FPS = 60
+FPS = 60  # 渲染帧率；模拟频率见 game_core.TICK_RATE
+MAX_FRAME_TIME = 0.25  # 单帧最多补跑这么多秒的模拟，避免卡顿后越追越慢
+DIRTY_RECT_RENDERING = True  # 只推送有变化的区域，而不是每帧整屏flip
+SNAPSHOT_PATH = "quicksave.mzs"  # F5存档、F9读档的文件
+REWIND_SECONDS = 5  # 按住Backspace最多能倒回多少秒
 
 # 颜色定义
 BLACK = (0, 0, 0)
@@ -30,760 +39,1231 @@ UI_BG = (30, 30, 30, 200)
 DARK_GREEN = (0, 100, 0)
 DARK_PURPLE = (100, 0, 100)
 
-# 创建游戏窗口
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Maze Adventure")
-clock = pygame.time.Clock()
-
-# 游戏状态
-class GameState:
-    MENU = "menu"
-    PLAYING = "playing"
-    GAME_OVER = "game_over"
-    VICTORY = "victory"
-
-# 难度模式
-class Difficulty:
-    NORMAL = "normal"
-    HARD = "hard"
-
-# 小怪物类 - 改进的寻路算法
-class Monster:
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-        self.target_x = x
-        self.target_y = y
-        self.move_timer = 0
-        self.move_interval = 0.4  # 移动间隔（秒）- 加快速度
-        self.active = False
-        self.move_count = 0
-        
-    def update(self, dt, player_x, player_y, maze):
-        if not self.active:
-            return
-            
-        self.move_timer += dt
-        if self.move_timer >= self.move_interval:
-            self.move_timer = 0
-            self.move_towards_player(player_x, player_y, maze)
-    
-    def find_path_to_player(self, player_x, player_y, maze):
-        """使用BFS算法找到到玩家的最短路径"""
-        if self.x == player_x and self.y == player_y:
-            return []
-            
-        # BFS队列：(x, y, path)
-        queue = deque([(self.x, self.y, [])])
-        visited = set()
-        visited.add((self.x, self.y))
-        
-        directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
-        
-        while queue:
-            x, y, path = queue.popleft()
-            
-            for dx, dy in directions:
-                nx, ny = x + dx, y + dy
-                
-                # 检查是否到达玩家位置
-                if nx == player_x and ny == player_y:
-                    return path + [(dx, dy)]
-                
-                # 检查新位置是否有效且未访问过
-                if (0 <= nx < COLS and 0 <= ny < ROWS and 
-                    maze[ny][nx] == 0 and 
-                    (nx, ny) not in visited):
-                    
-                    visited.add((nx, ny))
-                    queue.append((nx, ny, path + [(dx, dy)]))
-        
-        # 如果没有找到路径，返回空列表
-        return []
+# 游戏窗口和时钟由 init_display() 创建（main/main_endless 开头调用），
+# 导入本模块不会初始化pygame或打开窗口，测试、基准和子进程可以直接导入
+screen = None
+clock = None
+
+def init_display(headless=False):
+    """初始化pygame并创建窗口，已经创建过时直接返回；headless 时用SDL的dummy驱动，不打开真正的窗口"""
+    global screen, clock
+    if screen is not None:
+        return screen
+    if headless:
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+        os.environ["SDL_AUDIODRIVER"] = "dummy"
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption("Maze Adventure")
+    clock = pygame.time.Clock()
+    return screen
+
+# UI渲染缓存 - 字体、文字和预先画好的面板/渐变，超出容量时淘汰最久未使用的项
+class UICache:
+    def __init__(self, max_fonts=16, max_texts=256, max_surfaces=32):
+        self.fonts = OrderedDict()
+        self.texts = OrderedDict()
+        self.surfaces = OrderedDict()
+        self.max_fonts = max_fonts
+        self.max_texts = max_texts
+        self.max_surfaces = max_surfaces
     
-    def move_towards_player(self, player_x, player_y, maze):
-        # 使用BFS找到到玩家的最短路径
-        path = self.find_path_to_player(player_x, player_y, maze)
-        
-        if path:
-            # 沿着路径的第一步移动
-            dx, dy = path[0]
-            new_x, new_y = self.x + dx, self.y + dy
-            
-            # 确保移动是有效的
-            if is_valid_move(maze, new_x, new_y):
-                self.x = new_x
-                self.y = new_y
-                self.move_count += 1
+    def _get(self, cache, limit, key, build):
+        value = cache.get(key)
+        if value is None:
+            value = build()
+            cache[key] = value
+            if len(cache) > limit:
+                cache.popitem(last=False)
         else:
-            # 如果没有找到路径，随机移动
-            directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
-            valid_directions = []
-            
-            for dx, dy in directions:
-                new_x, new_y = self.x + dx, self.y + dy
-                if is_valid_move(maze, new_x, new_y):
-                    valid_directions.append((dx, dy))
-            
-            if valid_directions:
-                dx, dy = random.choice(valid_directions)
-                self.x += dx
-                self.y += dy
-                self.move_count += 1
-    
-    def draw(self, screen):
-        if not self.active:
-            return
-            
-        center_x = self.x * CELL_SIZE + CELL_SIZE // 2
-        center_y = self.y * CELL_SIZE + CELL_SIZE // 2
-        
-        # 怪物身体（紫色）
-        body_radius = CELL_SIZE // 2 - 4
-        pygame.draw.circle(screen, PURPLE, (center_x, center_y), body_radius)
-        
-        # 怪物眼睛（红色）
-        eye_radius = 3
-        pygame.draw.circle(screen, RED, (center_x - 4, center_y - 3), eye_radius)
-        pygame.draw.circle(screen, RED, (center_x + 4, center_y - 3), eye_radius)
-        
-        # 怪物嘴巴
-        pygame.draw.arc(screen, RED, 
-                       (center_x - 6, center_y + 2, 12, 8), 
-                       0.2, 2.9, 2)
-        
-        # 怪物角
-        pygame.draw.polygon(screen, RED, [
-            (center_x - 3, center_y - body_radius),
-            (center_x - 8, center_y - body_radius - 8),
-            (center_x, center_y - body_radius - 4)
-        ])
-        pygame.draw.polygon(screen, RED, [
-            (center_x + 3, center_y - body_radius),
-            (center_x + 8, center_y - body_radius - 8),
-            (center_x, center_y - body_radius - 4)
-        ])
-        
-    def activate(self, player_x, player_y, maze):
-        # 怪物出生点为主角出生点 (1, 1)
-        self.x = 1
-        self.y = 1
-        self.active = True
-
-# 更复杂的迷宫生成算法
-def generate_maze():
-    maze = [[1 for _ in range(COLS)] for _ in range(ROWS)]
-    
-    def carve_path(x, y):
-        maze[y][x] = 0
-        
-        directions = [(0, -2), (2, 0), (0, 2), (-2, 0)]
-        random.shuffle(directions)
-        
-        for dx, dy in directions:
-            nx, ny = x + dx, y + dy
-            if 0 <= nx < COLS and 0 <= ny < ROWS and maze[ny][nx] == 1:
-                maze[y + dy//2][x + dx//2] = 0
-                carve_path(nx, ny)
-    
-    # 从多个起点生成迷宫，创造更多分支
-    start_points = [(1, 1), (COLS-2, ROWS-2), (COLS//2, 1), (1, ROWS//2)]
-    for start_x, start_y in start_points:
-        if maze[start_y][start_x] == 1:
-            carve_path(start_x, start_y)
-    
-    # 添加一些额外的通道增加复杂度
-    for _ in range(ROWS * COLS // 50):
-        x = random.randint(1, COLS-2)
-        y = random.randint(1, ROWS-2)
-        if maze[y][x] == 1:
-            neighbors = 0
-            for dx, dy in [(0, -1), (1, 0), (0, 1), (-1, 0)]:
-                nx, ny = x + dx, y + dy
-                if 0 <= nx < COLS and 0 <= ny < ROWS and maze[ny][nx] == 0:
-                    neighbors += 1
-            if neighbors >= 2:
-                maze[y][x] = 0
-    
-    maze[1][1] = 0
-    maze[ROWS-2][COLS-2] = 0
-    
-    return maze
-
-# 地刺类 - 支持动画和批次管理
-class Spike:
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-        self.active = False
-        self.animation_progress = 0.0
-        self.cycle_timer = 0
-        self.visible = False
-        self.cycle_completed = False
-        
-        # 地刺动画参数
-        self.rise_duration = 0.8
-        self.fall_duration = 0.8
-        self.hidden_duration = 1.0
-        
-    def update(self, dt):
-        self.cycle_completed = False
-        old_active = self.active
-        
-        self.cycle_timer += dt
-        
-        cycle_length = self.rise_duration + self.fall_duration + self.hidden_duration
-        cycle_progress = (self.cycle_timer % cycle_length) / cycle_length
-        
-        if cycle_progress < self.rise_duration / cycle_length:
-            # 升起阶段
-            phase_progress = cycle_progress / (self.rise_duration / cycle_length)
-            self.animation_progress = phase_progress
-            self.active = True
-            self.visible = True
-        elif cycle_progress < (self.rise_duration + self.fall_duration) / cycle_length:
-            # 保持阶段
-            self.animation_progress = 1.0
-            self.active = True
-            self.visible = True
-        elif cycle_progress < (self.rise_duration + self.fall_duration + self.hidden_duration * 0.2) / cycle_length:
-            # 下降阶段
-            phase_progress = (cycle_progress - (self.rise_duration + self.fall_duration) / cycle_length) / (self.hidden_duration * 0.2 / cycle_length)
-            self.animation_progress = 1.0 - phase_progress
-            self.active = True
-            self.visible = True
-        else:
-            # 完全隐藏阶段 - 检测周期完成
-            self.animation_progress = 0.0
-            self.active = False
-            self.visible = False
-            
-            # 检查是否刚刚完成一个完整周期
-            if old_active and not self.active:
-                self.cycle_completed = True
+            cache.move_to_end(key)
+        return value
     
-    def draw(self, screen):
-        if not self.visible:
-            return
-            
-        base_height = 6
-        spike_height = (CELL_SIZE - 10) * self.animation_progress
-        
-        # 绘制地刺底座
-        base_rect = pygame.Rect(
-            self.x * CELL_SIZE + 5,
-            self.y * CELL_SIZE + CELL_SIZE - base_height,
-            CELL_SIZE - 10,
-            base_height
-        )
-        pygame.draw.rect(screen, (80, 0, 0), base_rect)
-        pygame.draw.rect(screen, (120, 0, 0), base_rect, 1)
-        
-        if self.animation_progress > 0:
-            # 绘制地刺（带动画高度）
-            spike_color = (
-                min(255, 150 + int(105 * self.animation_progress)),
-                max(0, 50 - int(50 * self.animation_progress)),
-                max(0, 50 - int(50 * self.animation_progress))
-            )
-            
-            spike_points = [
-                (self.x * CELL_SIZE + CELL_SIZE // 2, 
-                 self.y * CELL_SIZE + CELL_SIZE - base_height - spike_height),
-                (self.x * CELL_SIZE + 8, 
-                 self.y * CELL_SIZE + CELL_SIZE - base_height),
-                (self.x * CELL_SIZE + CELL_SIZE - 8, 
-                 self.y * CELL_SIZE + CELL_SIZE - base_height)
-            ]
-            pygame.draw.polygon(screen, spike_color, spike_points)
-            pygame.draw.polygon(screen, (200, 0, 0), spike_points, 1)
-            
-            # 地刺发光效果
-            if self.animation_progress > 0.7:
-                glow_alpha = int(100 * (self.animation_progress - 0.7) / 0.3)
-                glow_surface = pygame.Surface((CELL_SIZE, CELL_SIZE), pygame.SRCALPHA)
-                pygame.draw.polygon(glow_surface, (*RED, glow_alpha), [
-                    (CELL_SIZE // 2, CELL_SIZE - base_height - spike_height),
-                    (8, CELL_SIZE - base_height),
-                    (CELL_SIZE - 8, CELL_SIZE - base_height)
-                ])
-                screen.blit(glow_surface, (self.x * CELL_SIZE, self.y * CELL_SIZE))
-
-# 生成新的随机地刺位置
-def generate_random_spikes(maze, player_x, player_y, count=30):
-    spikes = []
-    attempts = 0
-    max_attempts = count * 15
-    
-    # 计算可用的路径格子数量
-    available_cells = 0
-    for y in range(ROWS):
-        for x in range(COLS):
-            if (maze[y][x] == 0 and 
-                (x, y) != (1, 1) and 
-                (x, y) != (COLS-2, ROWS-2)):
-                available_cells += 1
-    
-    # 如果可用格子太少，减少地刺数量
-    actual_count = min(count, available_cells - 5)
-    
-    while len(spikes) < actual_count and attempts < max_attempts:
-        x = random.randint(1, COLS-2)
-        y = random.randint(1, ROWS-2)
-        
-        # 检查位置是否有效
-        if (maze[y][x] == 0 and 
-            (x, y) != (1, 1) and 
-            (x, y) != (COLS-2, ROWS-2) and
-            (x, y) != (player_x, player_y) and
-            not any(spike.x == x and spike.y == y for spike in spikes)):
-            
-            # 计算与主角的距离
-            distance_to_player = math.sqrt((x - player_x)**2 + (y - player_y)**2)
-            
-            # 允许出现在主角附近，但不能太近（至少1格距离）
-            if distance_to_player >= 1.2:
-                spikes.append(Spike(x, y))
-        
-        attempts += 1
+    def font(self, size, bold=False, name="arial"):
+        return self._get(self.fonts, self.max_fonts, (name, size, bold),
+                         lambda: pygame.font.SysFont(name, size, bold=bold))
+    
+    def text(self, string, size, color, bold=False, name="arial"):
+        return self._get(self.texts, self.max_texts, (string, color, name, size, bold),
+                         lambda: self.font(size, bold, name).render(string, True, color))
+    
+    def panel(self, width, height, alpha):
+        def build():
+            s = pygame.Surface((width, height), pygame.SRCALPHA)
+            s.fill((30, 30, 30, alpha))
+            pygame.draw.rect(s, WHITE, s.get_rect(), 2, border_radius=10)
+            return s
+        return self._get(self.surfaces, self.max_surfaces, ("panel", width, height, alpha), build)
     
-    return spikes
+    def button(self, text, width, height, color):
+        def build():
+            s = pygame.Surface((width, height), pygame.SRCALPHA)
+            pygame.draw.rect(s, color, s.get_rect(), border_radius=12)
+            pygame.draw.rect(s, WHITE, s.get_rect(), 3, border_radius=12)
+            text_surface = self.text(text, 28, WHITE, bold=True)
+            s.blit(text_surface, text_surface.get_rect(center=s.get_rect().center))
+            return s
+        return self._get(self.surfaces, self.max_surfaces, ("button", text, width, height, color), build)
+    
+    def menu_background(self):
+        def build():
+            s = pygame.Surface((WIDTH, HEIGHT)).convert()
+            for y in range(HEIGHT):
+                color_value = max(20, 50 - y // 20)
+                pygame.draw.line(s, (color_value, color_value, color_value), (0, y), (WIDTH, y))
+            return s
+        return self._get(self.surfaces, self.max_surfaces, ("menu_background", WIDTH, HEIGHT), build)
+
+ui_cache = UICache()
+
+# 摄像机 - 迷宫比窗口大时跟随主角滚动；x, y 为视口左上角在整个迷宫中的像素坐标
+class Camera:
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.x = 0
+        self.y = 0
+    
+    def center_on(self, x, y):
+        """让格子坐标 (x, y) 处于视口中央（无尽模式的世界没有边界）"""
+        self.x = round((x + 0.5) * CELL_SIZE - self.width / 2)
+        self.y = round((y + 0.5) * CELL_SIZE - self.height / 2)
+    
+    def follow(self, x, y, maze):
+        """让格子坐标 (x, y) 尽量处于视口中央，但不滚出迷宫边界"""
+        self.center_on(x, y)
+        self.x = max(0, min(maze.width * CELL_SIZE - self.width, self.x))
+        self.y = max(0, min(maze.height * CELL_SIZE - self.height, self.y))
+    
+    def to_screen(self, x, y):
+        """格子坐标（可以是小数）对应的屏幕像素坐标"""
+        return round(x * CELL_SIZE) - self.x, round(y * CELL_SIZE) - self.y
+    
+    def visible_cells(self):
+        """视口覆盖的格子范围 (x0, y0, x1, y1)，右边和下边不包含"""
+        return (self.x // CELL_SIZE, self.y // CELL_SIZE,
+                -(-(self.x + self.width) // CELL_SIZE), -(-(self.y + self.height) // CELL_SIZE))
+
+camera = Camera(WIDTH, HEIGHT)
+
+# 帧分析器：按F3打开叠加层或用 --profile-trace 导出时才真正计时
+profiler = NULL_PROFILER
+profiler_lines = None  # 叠加层当前显示的内容，None 表示不显示
 
 # 绘制半透明UI背景
 def draw_ui_panel(rect, alpha=200):
-    s = pygame.Surface((rect.width, rect.height), pygame.SRCALPHA)
-    s.fill((30, 30, 30, alpha))
-    screen.blit(s, (rect.x, rect.y))
-    pygame.draw.rect(screen, WHITE, rect, 2, border_radius=10)
+    screen.blit(ui_cache.panel(rect.width, rect.height, alpha), (rect.x, rect.y))
 
 # 绘制按钮
 def draw_button(text, rect, color, hover_color, is_hovered):
     button_color = hover_color if is_hovered else color
-    pygame.draw.rect(screen, button_color, rect, border_radius=12)
-    pygame.draw.rect(screen, WHITE, rect, 3, border_radius=12)
-    
-    font = pygame.font.SysFont("arial", 28, bold=True)
-    text_surface = font.render(text, True, WHITE)
-    text_rect = text_surface.get_rect(center=rect.center)
-    screen.blit(text_surface, text_rect)
+    screen.blit(ui_cache.button(text, rect.width, rect.height, button_color), rect.topleft)
 
-# 绘制主角（年轻冒险者）
-def draw_player(x, y):
-    center_x = x * CELL_SIZE + CELL_SIZE // 2
-    center_y = y * CELL_SIZE + CELL_SIZE // 2
+# 绘制主角图形（左上角为 left, top 的格子）
+def paint_player(surface, left, top):
+    center_x = left + CELL_SIZE // 2
+    center_y = top + CELL_SIZE // 2
     
     # 身体（绿色冒险服）
-    body_rect = pygame.Rect(x * CELL_SIZE + 6, y * CELL_SIZE + 12, CELL_SIZE - 12, CELL_SIZE - 16)
-    pygame.draw.rect(screen, (0, 150, 0), body_rect, border_radius=4)
+    body_rect = pygame.Rect(left + 6, top + 12, CELL_SIZE - 12, CELL_SIZE - 16)
+    pygame.draw.rect(surface, (0, 150, 0), body_rect, border_radius=4)
     
     # 头部（年轻肤色）
     head_radius = CELL_SIZE // 3
-    head_center = (center_x, y * CELL_SIZE + 8 + head_radius)
-    pygame.draw.circle(screen, (255, 220, 180), head_center, head_radius)
+    head_center = (center_x, top + 8 + head_radius)
+    pygame.draw.circle(surface, (255, 220, 180), head_center, head_radius)
     
     # 头发（棕色短发）
-    hair_rect = pygame.Rect(center_x - head_radius + 2, y * CELL_SIZE + 6, head_radius * 2 - 4, head_radius - 2)
-    pygame.draw.ellipse(screen, (101, 67, 33), hair_rect)
+    hair_rect = pygame.Rect(center_x - head_radius + 2, top + 6, head_radius * 2 - 4, head_radius - 2)
+    pygame.draw.ellipse(surface, (101, 67, 33), hair_rect)
     
     # 眼睛（更有活力）
-    eye_y = y * CELL_SIZE + 10
-    pygame.draw.circle(screen, (0, 0, 139), (center_x - 4, eye_y), 3)
-    pygame.draw.circle(screen, (0, 0, 139), (center_x + 4, eye_y), 3)
-    pygame.draw.circle(screen, WHITE, (center_x - 3, eye_y - 1), 1)
-    pygame.draw.circle(screen, WHITE, (center_x + 5, eye_y - 1), 1)
+    eye_y = top + 10
+    pygame.draw.circle(surface, (0, 0, 139), (center_x - 4, eye_y), 3)
+    pygame.draw.circle(surface, (0, 0, 139), (center_x + 4, eye_y), 3)
+    pygame.draw.circle(surface, WHITE, (center_x - 3, eye_y - 1), 1)
+    pygame.draw.circle(surface, WHITE, (center_x + 5, eye_y - 1), 1)
     
     # 微笑
-    pygame.draw.arc(screen, (200, 0, 0), 
+    pygame.draw.arc(surface, (200, 0, 0), 
                    (center_x - 6, eye_y + 2, 12, 8), 
                    0.2, 2.9, 2)
     
     # 背包
-    pack_rect = pygame.Rect(x * CELL_SIZE + 4, y * CELL_SIZE + 18, 8, CELL_SIZE - 22)
-    pygame.draw.rect(screen, (139, 69, 19), pack_rect, border_radius=2)
-    pygame.draw.rect(screen, (101, 67, 33), pack_rect, 1, border_radius=2)
+    pack_rect = pygame.Rect(left + 4, top + 18, 8, CELL_SIZE - 22)
+    pygame.draw.rect(surface, (139, 69, 19), pack_rect, border_radius=2)
+    pygame.draw.rect(surface, (101, 67, 33), pack_rect, 1, border_radius=2)
     
     # 剑
     sword_length = CELL_SIZE - 10
-    pygame.draw.line(screen, SILVER, 
+    pygame.draw.line(surface, SILVER, 
                     (center_x + 10, center_y - sword_length//2),
                     (center_x + 10, center_y + sword_length//2), 3)
     
     # 剑柄
-    pygame.draw.rect(screen, (139, 69, 19), 
+    pygame.draw.rect(surface, (139, 69, 19), 
                     (center_x + 7, center_y - 2, 6, 4))
     
     # 剑格
-    pygame.draw.rect(screen, GOLD, 
+    pygame.draw.rect(surface, GOLD, 
                     (center_x + 5, center_y - 1, 10, 2))
     
     # 剑刃尖端
-    pygame.draw.polygon(screen, SILVER, [
+    pygame.draw.polygon(surface, SILVER, [
         (center_x + 10, center_y - sword_length//2),
         (center_x + 13, center_y - sword_length//2 + 5),
         (center_x + 7, center_y - sword_length//2 + 5)
     ])
 
-# 绘制宝箱
-def draw_treasure_chest(x, y):
-    chest_rect = pygame.Rect(x * CELL_SIZE + 5, y * CELL_SIZE + 8, CELL_SIZE - 10, CELL_SIZE - 16)
+
+# 绘制怪物图形（左上角为 left, top 的格子）
+def paint_monster(surface, left, top):
+    center_x = left + CELL_SIZE // 2
+    center_y = top + CELL_SIZE // 2
+
+    # 怪物身体（紫色）
+    body_radius = CELL_SIZE // 2 - 4
+    pygame.draw.circle(surface, PURPLE, (center_x, center_y), body_radius)
+
+    # 怪物眼睛（红色）
+    eye_radius = 3
+    pygame.draw.circle(surface, RED, (center_x - 4, center_y - 3), eye_radius)
+    pygame.draw.circle(surface, RED, (center_x + 4, center_y - 3), eye_radius)
+
+    # 怪物嘴巴
+    pygame.draw.arc(surface, RED, 
+                   (center_x - 6, center_y + 2, 12, 8), 
+                   0.2, 2.9, 2)
+
+    # 怪物角
+    pygame.draw.polygon(surface, RED, [
+        (center_x - 3, center_y - body_radius),
+        (center_x - 8, center_y - body_radius - 8),
+        (center_x, center_y - body_radius - 4)
+    ])
+    pygame.draw.polygon(surface, RED, [
+        (center_x + 3, center_y - body_radius),
+        (center_x + 8, center_y - body_radius - 8),
+        (center_x, center_y - body_radius - 4)
+    ])
+
+# 绘制宝箱图形（左上角为 left, top 的格子）
+def paint_treasure_chest(surface, left, top):
+    chest_rect = pygame.Rect(left + 5, top + 8, CELL_SIZE - 10, CELL_SIZE - 16)
     
     # 宝箱主体
-    pygame.draw.rect(screen, (139, 69, 19), chest_rect, border_radius=3)
+    pygame.draw.rect(surface, (139, 69, 19), chest_rect, border_radius=3)
     
     # 宝箱金属边
-    pygame.draw.rect(screen, GOLD, chest_rect, 2, border_radius=3)
+    pygame.draw.rect(surface, GOLD, chest_rect, 2, border_radius=3)
     
     # 宝箱盖子
-    lid_rect = pygame.Rect(x * CELL_SIZE + 3, y * CELL_SIZE + 5, CELL_SIZE - 6, 8)
-    pygame.draw.rect(screen, (160, 82, 45), lid_rect, border_radius=2)
-    pygame.draw.rect(screen, GOLD, lid_rect, 2, border_radius=2)
+    lid_rect = pygame.Rect(left + 3, top + 5, CELL_SIZE - 6, 8)
+    pygame.draw.rect(surface, (160, 82, 45), lid_rect, border_radius=2)
+    pygame.draw.rect(surface, GOLD, lid_rect, 2, border_radius=2)
     
     # 宝箱锁
-    lock_rect = pygame.Rect(x * CELL_SIZE + CELL_SIZE//2 - 3, y * CELL_SIZE + 10, 6, 8)
-    pygame.draw.rect(screen, GOLD, lock_rect)
-    pygame.draw.circle(screen, GOLD, (x * CELL_SIZE + CELL_SIZE//2, y * CELL_SIZE + 18), 3)
+    lock_rect = pygame.Rect(left + CELL_SIZE//2 - 3, top + 10, 6, 8)
+    pygame.draw.rect(surface, GOLD, lock_rect)
+    pygame.draw.circle(surface, GOLD, (left + CELL_SIZE//2, top + 18), 3)
+
+# 绘制某一动画进度的地刺（左上角为 left, top 的格子）
+def paint_spike(surface, left, top, progress):
+    base_height = 6
+    spike_height = (CELL_SIZE - 10) * progress
+
+    # 绘制地刺底座
+    base_rect = pygame.Rect(
+        left + 5,
+        top + CELL_SIZE - base_height,
+        CELL_SIZE - 10,
+        base_height
+    )
+    pygame.draw.rect(surface, (80, 0, 0), base_rect)
+    pygame.draw.rect(surface, (120, 0, 0), base_rect, 1)
+
+    if progress > 0:
+        # 绘制地刺（带动画高度）
+        spike_color = (
+            min(255, 150 + int(105 * progress)),
+            max(0, 50 - int(50 * progress)),
+            max(0, 50 - int(50 * progress))
+        )
+
+        spike_points = [
+            (left + CELL_SIZE // 2, 
+             top + CELL_SIZE - base_height - spike_height),
+            (left + 8, 
+             top + CELL_SIZE - base_height),
+            (left + CELL_SIZE - 8, 
+             top + CELL_SIZE - base_height)
+        ]
+        pygame.draw.polygon(surface, spike_color, spike_points)
+        pygame.draw.polygon(surface, (200, 0, 0), spike_points, 1)
+
+        # 地刺发光效果
+        if progress > 0.7:
+            glow_alpha = int(100 * (progress - 0.7) / 0.3)
+            glow_surface = pygame.Surface((CELL_SIZE, CELL_SIZE), pygame.SRCALPHA)
+            pygame.draw.polygon(glow_surface, (*RED, glow_alpha), [
+                (CELL_SIZE // 2, CELL_SIZE - base_height - spike_height),
+                (8, CELL_SIZE - base_height),
+                (CELL_SIZE - 8, CELL_SIZE - base_height)
+            ])
+            surface.blit(glow_surface, (left, top))
+
+# 精灵图集 - 启动时把主角、怪物、宝箱和各动画进度的地刺画到一张图上，绘制时只需一次blit
+SPRITE_MARGIN = 8  # 每个格子上方预留的像素（怪物的角）
+SPIKE_FRAMES = 32  # 地刺动画进度的量化帧数
+
+class SpriteAtlas:
+    def __init__(self):
+        slot_height = CELL_SIZE + SPRITE_MARGIN
+        self.surface = pygame.Surface((CELL_SIZE * (3 + SPIKE_FRAMES), slot_height), pygame.SRCALPHA)
+        self.surface.fill((0, 0, 0, 0))
+        
+        paint_player(self.surface, 0, SPRITE_MARGIN)
+        paint_monster(self.surface, CELL_SIZE, SPRITE_MARGIN)
+        paint_treasure_chest(self.surface, CELL_SIZE * 2, SPRITE_MARGIN)
+        for frame in range(SPIKE_FRAMES):
+            paint_spike(self.surface, CELL_SIZE * (3 + frame), SPRITE_MARGIN,
+                        frame / (SPIKE_FRAMES - 1))
+        
+        if pygame.display.get_surface() is not None:
+            self.surface = self.surface.convert_alpha()
+        
+        self.player = self.cell(0)
+        self.monster = self.surface.subsurface((CELL_SIZE, 0, CELL_SIZE, slot_height))
+        self.chest = self.cell(2)
+        self.spike_frames = [self.cell(3 + frame) for frame in range(SPIKE_FRAMES)]
+    
+    def cell(self, slot):
+        return self.surface.subsurface((CELL_SIZE * slot, SPRITE_MARGIN, CELL_SIZE, CELL_SIZE))
+    
+    def spike_frame(self, progress):
+        frame = int(progress * (SPIKE_FRAMES - 1) + 0.5)
+        return self.spike_frames[max(0, min(SPIKE_FRAMES - 1, frame))]
+
+_sprite_atlas = None
+
+def get_sprite_atlas():
+    global _sprite_atlas
+    if _sprite_atlas is None:
+        _sprite_atlas = SpriteAtlas()
+    return _sprite_atlas
+
+# 绘制主角（年轻冒险者）；坐标可以是插值得到的小数格子坐标
+def draw_player(x, y):
+    screen.blit(get_sprite_atlas().player, camera.to_screen(x, y))
+
+# 绘制怪物；position 为插值后的坐标，默认用怪物当前所在格
+def draw_monster(monster, position=None):
+    if not monster.active:
+        return
+    
+    x, y = position if position is not None else (monster.x, monster.y)
+    # 怪物的角会超出格子上沿，精灵图向上多留了 SPRITE_MARGIN 像素
+    rect = monster_rect(x, y)
+    if rect.colliderect(screen.get_rect()):
+        screen.blit(get_sprite_atlas().monster, rect)
+
+# 怪物群里位于视口内（含移动前所在格）的怪物
+def visible_monsters(crowd):
+    x0, y0, x1, y1 = camera.visible_cells()
+    # 多取一圈：刚走出视口的怪物插值时还有一部分在屏幕上，精灵图的角也会伸到上一格
+    return crowd.monsters_in(x0 - 1, y0 - 1, x1 + 1, y1 + 2)
+
+# 绘制怪物群，只画视口附近的怪物
+def draw_crowd(crowd, alpha=1.0):
+    for monster in visible_monsters(crowd):
+        draw_monster(monster, crowd.position(monster, alpha))
+
+# 绘制地刺：只画视口内的；整批共用一个阶段，按动画进度取一次预渲染的帧（包含发光效果）
+def draw_spikes(spikes):
+    if not spikes.visible:
+        return
+    frame = get_sprite_atlas().spike_frame(spikes.animation_progress)
+    xs, ys = spikes.xs, spikes.ys
+    for i in spikes.indices_in(*camera.visible_cells()):
+        screen.blit(frame, camera.to_screen(xs[i], ys[i]))
+
+# 绘制宝箱
+def draw_treasure_chest(x, y, surface=None):
+    if surface is None:
+        surface = screen
+    surface.blit(get_sprite_atlas().chest, (x * CELL_SIZE, y * CELL_SIZE))
+
+# 迷宫静态图层缓存 - 墙壁、地面和宝箱按 MAZE_CHUNK_CELLS 见方的块绘制，
+# 只画视口碰到的块，超出容量时淘汰最久未使用的块，大迷宫也不用整张图
+MAZE_CHUNK_CELLS = 16
+MAZE_CHUNK_CACHE = 24
+
+class MazeLayer:
+    def __init__(self, maze, chunk_cells=MAZE_CHUNK_CELLS, max_chunks=MAZE_CHUNK_CACHE):
+        self.maze = maze
+        self.chunk_cells = chunk_cells
+        self.chunk_size = chunk_cells * CELL_SIZE
+        self.max_chunks = max_chunks
+        self.chunks = OrderedDict()
+        
+        # 砖块图案对所有墙格都一样，先画成一个格子再复用
+        self.wall_tile = pygame.Surface((CELL_SIZE, CELL_SIZE)).convert()
+        self.wall_tile.fill(BLUE)
+        pygame.draw.rect(self.wall_tile, (0, 80, 200), self.wall_tile.get_rect(), 2)
+        for i in range(0, CELL_SIZE, 6):
+            for j in range(0, CELL_SIZE, 6):
+                if (i//6 + j//6) % 2 == 0:
+                    pygame.draw.rect(self.wall_tile, (0, 100, 220), (i, j, 3, 3))
+        
+        self.floor_tile = pygame.Surface((CELL_SIZE, CELL_SIZE)).convert()
+        self.floor_tile.fill(BLACK)
+        pygame.draw.rect(self.floor_tile, (30, 30, 30), self.floor_tile.get_rect(), 1)
+    
+    def chunk(self, cx, cy):
+        surface = self.chunks.get((cx, cy))
+        if surface is None:
+            surface = self.render_chunk(cx, cy)
+            self.chunks[(cx, cy)] = surface
+            if len(self.chunks) > self.max_chunks:
+                self.chunks.popitem(last=False)
+        else:
+            self.chunks.move_to_end((cx, cy))
+        return surface
+    
+    def render_cells(self, maze, x0, y0, x1, y1):
+        """把 maze 中 [x0, x1) x [y0, y1) 的格子画成一张图"""
+        surface = pygame.Surface(((x1 - x0) * CELL_SIZE, (y1 - y0) * CELL_SIZE)).convert()
+        cells = maze.cells
+        wall_tile, floor_tile = self.wall_tile, self.floor_tile
+        tiles = []
+        for y in range(y0, y1):
+            row = y * maze.width
+            for x in range(x0, x1):
+                tiles.append((wall_tile if cells[row + x] == 1 else floor_tile,
+                              ((x - x0) * CELL_SIZE, (y - y0) * CELL_SIZE)))
+        surface.blits(tiles, doreturn=False)
+        return surface
+    
+    def render_chunk(self, cx, cy):
+        maze = self.maze
+        x0, y0 = cx * self.chunk_cells, cy * self.chunk_cells
+        x1 = min(maze.width, x0 + self.chunk_cells)
+        y1 = min(maze.height, y0 + self.chunk_cells)
+        surface = self.render_cells(maze, x0, y0, x1, y1)
+        
+        # 终点宝箱
+        goal_x, goal_y = maze.width-2, maze.height-2
+        if x0 <= goal_x < x1 and y0 <= goal_y < y1:
+            draw_treasure_chest(goal_x - x0, goal_y - y0, surface)
+        return surface
+    
+    def chunk_range(self, left, top, right, bottom):
+        """与像素范围 [left, right) x [top, bottom) 重叠的块 (cx0, cy0, cx1, cy1)，包含两端"""
+        size = self.chunk_size
+        maze = self.maze
+        return (max(0, left // size), max(0, top // size),
+                min((maze.width * CELL_SIZE - 1) // size, (right - 1) // size),
+                min((maze.height * CELL_SIZE - 1) // size, (bottom - 1) // size))
+    
+    def draw(self, surface, rect):
+        """把屏幕矩形 rect 范围内的迷宫背景贴到 surface 上"""
+        size = self.chunk_size
+        left, top = rect.x + camera.x, rect.y + camera.y
+        cx0, cy0, cx1, cy1 = self.chunk_range(left, top, left + rect.width, top + rect.height)
+        
+        for cy in range(cy0, cy1 + 1):
+            for cx in range(cx0, cx1 + 1):
+                chunk = self.chunk(cx, cy)
+                chunk_rect = chunk.get_rect(topleft=(cx * size - camera.x, cy * size - camera.y))
+                part = rect.clip(chunk_rect)
+                if part.width and part.height:
+                    surface.blit(chunk, part, part.move(-chunk_rect.x, -chunk_rect.y))
+
+# 无尽模式的背景图层 - 图层的块与世界的区块一一对应，没有边界
+class WorldLayer(MazeLayer):
+    def __init__(self, world, max_chunks=MAZE_CHUNK_CACHE):
+        super().__init__(world, world.chunk_size, max_chunks)
+        self.world = world
+    
+    def render_chunk(self, cx, cy):
+        size = self.chunk_cells
+        return self.render_cells(self.world.chunk(cx, cy).maze, 0, 0, size, size)
+    
+    def chunk_range(self, left, top, right, bottom):
+        size = self.chunk_size
+        return left // size, top // size, (right - 1) // size, (bottom - 1) // size
+
+_maze_layer = None
+
+def get_maze_layer(maze):
+    global _maze_layer
+    if _maze_layer is None or _maze_layer.maze is not maze:
+        _maze_layer = WorldLayer(maze) if isinstance(maze, ChunkedWorld) else MazeLayer(maze)
+    return _maze_layer
 
 # 绘制迷宫
-def draw_maze(maze, spikes, monster=None):
-    for y in range(ROWS):
-        for x in range(COLS):
-            rect = pygame.Rect(x * CELL_SIZE, y * CELL_SIZE, CELL_SIZE, CELL_SIZE)
-            if maze[y][x] == 1:
-                # 墙壁纹理
-                pygame.draw.rect(screen, BLUE, rect)
-                pygame.draw.rect(screen, (0, 80, 200), rect, 2)
-                # 墙壁砖块效果
-                for i in range(0, CELL_SIZE, 6):
-                    for j in range(0, CELL_SIZE, 6):
-                        if (i//6 + j//6) % 2 == 0:
-                            pygame.draw.rect(screen, (0, 100, 220), 
-                                           (x * CELL_SIZE + i, y * CELL_SIZE + j, 3, 3))
-            else:
-                pygame.draw.rect(screen, BLACK, rect)
-                pygame.draw.rect(screen, (30, 30, 30), rect, 1)
+def draw_maze(maze, spikes, monster=None, monster_position=None):
+    # 静态部分直接贴缓存图层
+    with profiler.phase("draw maze"):
+        get_maze_layer(maze).draw(screen, screen.get_rect())
     
     # 绘制地刺
-    for spike in spikes:
-        spike.draw(screen)
+    with profiler.phase("draw spikes"):
+        draw_spikes(spikes)
     
     # 绘制怪物
     if monster:
-        monster.draw(screen)
-    
-    # 绘制终点宝箱
-    draw_treasure_chest(COLS-2, ROWS-2)
+        with profiler.phase("draw entities"):
+            draw_monster(monster, monster_position)
 
-# 检查移动是否有效
-def is_valid_move(maze, x, y):
-    return 0 <= x < COLS and 0 <= y < ROWS and maze[y][x] == 0
+# 菜单上三个难度按钮的位置
+def menu_buttons():
+    return (pygame.Rect(WIDTH//2 - 150, HEIGHT//2, 300, 60),
+            pygame.Rect(WIDTH//2 - 150, HEIGHT//2 + 80, 300, 60),
+            pygame.Rect(WIDTH//2 - 150, HEIGHT//2 + 160, 300, 60))
 
 # 绘制开始菜单
-def draw_menu(normal_hovered, hard_hovered):
+def draw_menu(normal_hovered, hard_hovered, crowd_hovered=False):
     # 背景渐变
-    for y in range(HEIGHT):
-        color_value = max(20, 50 - y // 20)
-        pygame.draw.line(screen, (color_value, color_value, color_value), (0, y), (WIDTH, y))
+    screen.blit(ui_cache.menu_background(), (0, 0))
     
     # 标题
-    title_font = pygame.font.SysFont("arial", 80, bold=True)
-    title_text = title_font.render("MAZE ADVENTURE", True, YELLOW)
-    title_shadow = title_font.render("MAZE ADVENTURE", True, (100, 100, 0))
+    title_text = ui_cache.text("MAZE ADVENTURE", 80, YELLOW, bold=True)
+    title_shadow = ui_cache.text("MAZE ADVENTURE", 80, (100, 100, 0), bold=True)
     
     # 标题阴影效果
     screen.blit(title_shadow, (WIDTH//2 - title_text.get_width()//2 + 3, HEIGHT//4 + 3))
     screen.blit(title_text, (WIDTH//2 - title_text.get_width()//2, HEIGHT//4))
     
     # 副标题
-    subtitle_font = pygame.font.SysFont("arial", 36)
-    subtitle_text = subtitle_font.render("Choose Your Challenge", True, WHITE)
+    subtitle_text = ui_cache.text("Choose Your Challenge", 36, WHITE)
     screen.blit(subtitle_text, (WIDTH//2 - subtitle_text.get_width()//2, HEIGHT//4 + 90))
     
     # 按钮区域背景
-    button_area = pygame.Rect(WIDTH//2 - 200, HEIGHT//2 - 50, 400, 200)
+    button_area = pygame.Rect(WIDTH//2 - 200, HEIGHT//2 - 50, 400, 280)
     draw_ui_panel(button_area, 180)
     
     # 难度选项按钮
-    normal_button = pygame.Rect(WIDTH//2 - 150, HEIGHT//2, 300, 60)
-    hard_button = pygame.Rect(WIDTH//2 - 150, HEIGHT//2 + 80, 300, 60)
+    normal_button, hard_button, crowd_button = menu_buttons()
     
     draw_button("NORMAL MODE", normal_button, DARK_GREEN, GREEN, normal_hovered)
     draw_button("HARD MODE", hard_button, DARK_PURPLE, PURPLE, hard_hovered)
+    draw_button("CROWD MODE", crowd_button, DARK_RED, RED, crowd_hovered)
     
     # 模式说明
-    desc_font = pygame.font.SysFont("arial", 18)
     desc_lines = [
         "Normal: Classic maze with spikes only",
-        "Hard: Advanced maze with chasing monster"
+        "Hard: Advanced maze with chasing monster",
+        "Crowd: Hundreds of monsters swarm the maze"
     ]
     
     for i, line in enumerate(desc_lines):
-        desc_text = desc_font.render(line, True, WHITE)
-        screen.blit(desc_text, (WIDTH//2 - desc_text.get_width()//2, HEIGHT//2 + 160 + i * 25))
+        desc_text = ui_cache.text(line, 18, WHITE)
+        screen.blit(desc_text, (WIDTH//2 - desc_text.get_width()//2, HEIGHT//2 + 240 + i * 25))
     
     # 操作提示
-    hint_font = pygame.font.SysFont("arial", 16)
-    hint_text = hint_font.render("Click to select your challenge", True, YELLOW)
+    hint_text = ui_cache.text("Click to select your challenge", 16, YELLOW)
     screen.blit(hint_text, (WIDTH//2 - hint_text.get_width()//2, HEIGHT - 50))
 
-# 主游戏函数
-def main():
-    # 游戏状态
-    game_state = GameState.MENU
-    difficulty = None
-    
-    # 游戏变量
-    maze = None
-    spikes = []
-    monster = None
-    player_x, player_y = 1, 1
-    game_over = False
-    win = False
-    move_delay = 0
-    move_interval = 6
-    need_respawn = False
-    player_move_count = 0
+# 格子对应的屏幕矩形
+def cell_rect(x, y):
+    return pygame.Rect(camera.to_screen(x, y), (CELL_SIZE, CELL_SIZE))
+
+# 怪物的角会超出格子上沿，脏矩形需要包含这部分
+def monster_rect(x, y):
+    rect = cell_rect(x, y)
+    rect.top -= SPRITE_MARGIN
+    rect.height += SPRITE_MARGIN
+    return rect
+
+# 当前显示的提示文字（按H求解后设置，主角走一步后清除）
+hint_text = None
+# 进行中的求解：(求解器的分步生成器, 开始求解时的tick, 已用时间)；求解分到多帧里做，不卡住画面
+hint_search = None
+HINT_FRAME_BUDGET = 0.006  # 每帧最多花在求解上的时间（秒）
+HINT_TIME_LIMIT = 3.0      # 累计求解超过这么久就放弃
+HINT_MAX_EXPANSIONS = 50000
+
+# 按H提示：开始求解当前局面，tick上限按迷宫大小和怪物速度估计
+def start_hint(session):
+    global hint_search
+    hint_search = (Solver(session, max_expansions=HINT_MAX_EXPANSIONS).steps(), session.tick, 0.0)
+    # 求解器在第一步读取局面，必须在游戏继续推进之前开始
+    return update_hint(session) or "Hint: thinking..."
+
+# 每帧继续求解，用完本帧的时间预算还没算完时返回None
+def update_hint(session):
+    global hint_search
+    steps, start_tick, elapsed = hint_search
+    start = time.perf_counter()
+    for solution in steps:
+        now = time.perf_counter()
+        if solution is None and elapsed + now - start >= HINT_TIME_LIMIT:
+            hint_search = None
+            return "Hint: search limit reached"
+        if solution is not None:
+            hint_search = None
+            return describe_hint(session, solution, start_tick)
+        if now - start >= HINT_FRAME_BUDGET:
+            break
+    hint_search = (steps, start_tick, elapsed + time.perf_counter() - start)
+    return None
+
+# 把求解结果变成提示文字；求解期间主角没有动，计划的第一步就是下一步
+def describe_hint(session, solution, start_tick):
+    if solution.status == UNSOLVABLE:
+        return "Hint: no safe route found"
+    if solution.status != SOLVED:
+        return "Hint: search limit reached"
+    tick, action = solution.next_move(start_tick)
+    name = {Action.UP: "UP", Action.DOWN: "DOWN", Action.LEFT: "LEFT", Action.RIGHT: "RIGHT"}[action]
+    # 计划的那一步就是最早能走的一步时，直接按住方向键即可
+    if tick <= session.tick + max(1, session.move_interval - session.move_delay):
+        return f"Hint: go {name}"
+    return f"Hint: wait {(tick - session.tick) * session.tick_dt:.1f}s, then go {name}"
+
+# 游戏中的HUD元素：(名称, 内容键, 矩形, 绘制函数)，按绘制顺序排列
+def get_playing_overlays(session):
+    difficulty = session.difficulty
+    monster = session.monster
+    overlays = []
+    
+    # 显示关卡信息
+    mode_text = {Difficulty.NORMAL: "Normal", Difficulty.HARD: "Hard", Difficulty.CROWD: "Crowd"}[difficulty]
+    level_text = ui_cache.text(f"Mode: {mode_text}", 20, WHITE)
+    level_rect = level_text.get_rect(topleft=(10, 10))
+    overlays.append(("level", mode_text, level_rect,
+                     lambda: screen.blit(level_text, level_rect)))
+    
+    # 显示怪物激活倒计时（Hard模式）
+    if difficulty == Difficulty.HARD and monster and not monster.active:
+        remaining = session.monster_activation_moves - session.player_move_count
+        count_text = ui_cache.text(f"Monster activates in: {remaining} moves", 16, YELLOW)
+        count_rect = count_text.get_rect(topleft=(10, 35))
+        overlays.append(("countdown", remaining, count_rect,
+                         lambda: screen.blit(count_text, count_rect)))
+    
+    # 显示已激活的怪物数量（Crowd模式）
+    crowd = session.crowd
+    if crowd is not None:
+        crowd_key = (crowd.spawned, len(crowd))
+        crowd_text = ui_cache.text(f"Monsters: {crowd.spawned}/{len(crowd)}", 16, YELLOW)
+        crowd_rect = crowd_text.get_rect(topleft=(10, 35))
+        overlays.append(("crowd", crowd_key, crowd_rect,
+                         lambda: screen.blit(crowd_text, crowd_rect)))
+    
+    # 帧分析叠加层
+    if profiler_lines:
+        line_height = 16
+        profiler_rect = pygame.Rect(WIDTH - 330, 40, 320, 12 + line_height * len(profiler_lines))
+        
+        def draw_profiler():
+            draw_ui_panel(profiler_rect, 180)
+            for i, (label, value) in enumerate(profiler_lines):
+                top = profiler_rect.y + 6 + i * line_height
+                screen.blit(ui_cache.text(label, 14, WHITE), (profiler_rect.x + 10, top))
+                value_text = ui_cache.text(value, 14, YELLOW)
+                screen.blit(value_text, (profiler_rect.right - 10 - value_text.get_width(), top))
+        
+        overlays.append(("profiler", profiler_lines, profiler_rect, draw_profiler))
+    
+    # 显示提示
+    if hint_text:
+        hint_surface = ui_cache.text(hint_text, 18, GOLD)
+        hint_rect = hint_surface.get_rect(topright=(WIDTH - 10, 10))
+        overlays.append(("hint", hint_text, hint_rect,
+                         lambda: screen.blit(hint_surface, hint_rect)))
+    
+    # 显示操作说明
+    controls_bg = pygame.Rect(5, HEIGHT - 35, WIDTH - 10, 30)
+    if difficulty == Difficulty.CROWD:
+        controls_text = ui_cache.text("Arrow Keys: Move | Avoid Spikes | Escape the Crowd", 16, WHITE)
+    else:
+        # 联机时局面在服务器上，本地没有求解器可用的GameSession，不提供提示
+        hint_keys = " | H: Hint" if isinstance(session, GameSession) else ""
+        controls_text = ui_cache.text("Arrow Keys: Move" + hint_keys + " | Avoid Spikes" + 
+                                      (" | Escape Monster" if difficulty == Difficulty.HARD else ""), 
+                                      16, WHITE)
+    
+    def draw_controls():
+        draw_ui_panel(controls_bg, 150)
+        screen.blit(controls_text, (WIDTH//2 - controls_text.get_width()//2, HEIGHT - 28))
+    
+    overlays.append(("controls", difficulty, controls_bg, draw_controls))
+    return overlays
+
+# 结束画面上切换模式的按键
+MODE_KEYS = ((Difficulty.NORMAL, "N", "Normal"), (Difficulty.HARD, "H", "Hard"), (Difficulty.CROWD, "C", "Crowd"))
+ALL_MODES = tuple(mode for mode, _, _ in MODE_KEYS)
+
+# 绘制游戏结束/胜利面板
+def draw_end_panel(title, color, difficulty, modes=ALL_MODES):
+    panel_rect = pygame.Rect(WIDTH//2 - 250, HEIGHT//2 - 120, 500, 240)
+    draw_ui_panel(panel_rect)
+    
+    text = ui_cache.text(title, 72, color, bold=True)
+    screen.blit(text, (WIDTH//2 - text.get_width()//2, HEIGHT//2 - 80))
+    
+    restart_text = ui_cache.text("Press R to Restart", 28, WHITE)
+    screen.blit(restart_text, (WIDTH//2 - restart_text.get_width()//2, HEIGHT//2 + 20))
+    
+    # 列出当前模式以外、modes 里可以切换的其他模式（联机时只有服务器支持的难度）
+    hints = [f"{key} for {name}" for mode, key, name in MODE_KEYS if mode != difficulty and mode in modes]
+    if hints:
+        switch_text = ui_cache.text("Press " + ", ".join(hints), 28, YELLOW)
+        screen.blit(switch_text, (WIDTH//2 - switch_text.get_width()//2, HEIGHT//2 + 60))
+
+# 完整重绘一帧；alpha 为距上一个模拟tick的比例，用于插值实体位置
+def draw_frame(session, normal_hovered, hard_hovered, crowd_hovered=False, alpha=1.0, modes=ALL_MODES):
+    screen.fill(BLACK)
+    
+    if session.state == GameState.MENU:
+        draw_menu(normal_hovered, hard_hovered, crowd_hovered)
+        return
+    
+    monster_position = session.monster_position(alpha) if session.monster else None
+    draw_maze(session.maze, session.spikes, session.monster, monster_position)
+    with profiler.phase("draw entities"):
+        if session.crowd is not None:
+            draw_crowd(session.crowd, alpha)
+        draw_player(*session.player_position(alpha))
+    
+    if session.state == GameState.PLAYING:
+        with profiler.phase("draw HUD"):
+            for _, _, _, draw in get_playing_overlays(session):
+                draw()
+    
+    # 显示游戏结束状态
+    elif session.state == GameState.GAME_OVER:
+        draw_end_panel("GAME OVER", RED, session.difficulty, modes)
+    
+    # 显示胜利状态
+    elif session.state == GameState.VICTORY:
+        draw_end_panel("VICTORY!", GREEN, session.difficulty, modes)
+
+# 绘制无尽模式的一帧；摄像机始终跟着主角滚动，所以每帧都完整重绘
+def draw_endless_frame(session, alpha=1.0):
+    screen.fill(BLACK)
+    world = session.world
+    
+    with profiler.phase("draw maze"):
+        get_maze_layer(world).draw(screen, screen.get_rect())
+    
+    # 所有地刺共用世界时钟，同一帧的动画进度都一样
+    with profiler.phase("draw spikes"):
+        batch, active, progress = session.spike_phase()
+        if active:
+            frame = get_sprite_atlas().spike_frame(progress)
+            for x, y in world.spike_positions(batch, *camera.visible_cells()):
+                screen.blit(frame, camera.to_screen(x, y))
+    
+    with profiler.phase("draw entities"):
+        draw_player(*session.player_position(alpha))
+    
+    with profiler.phase("draw HUD"):
+        distance_text = ui_cache.text(f"Endless | Distance: {session.farthest}", 20, WHITE)
+        screen.blit(distance_text, (10, 10))
+        
+        if session.state == GameState.PLAYING:
+            controls_bg = pygame.Rect(5, HEIGHT - 35, WIDTH - 10, 30)
+            draw_ui_panel(controls_bg, 150)
+            controls_text = ui_cache.text("Arrow Keys: Move | Avoid Spikes | Explore as far as you can", 16, WHITE)
+            screen.blit(controls_text, (WIDTH//2 - controls_text.get_width()//2, HEIGHT - 28))
+        else:
+            panel_rect = pygame.Rect(WIDTH//2 - 250, HEIGHT//2 - 120, 500, 240)
+            draw_ui_panel(panel_rect)
+            lines = [("GAME OVER", 72, RED, True), (f"Distance: {session.farthest}", 28, YELLOW, False),
+                     ("Press R to Restart", 28, WHITE, False)]
+            top = HEIGHT//2 - 80
+            for line, size, color, bold in lines:
+                text = ui_cache.text(line, size, color, bold=bold)
+                screen.blit(text, (WIDTH//2 - text.get_width()//2, top))
+                top += text.get_height() + 20
+
+# 脏矩形渲染 - 只恢复并推送移动/动画实体和变化的HUD所在区域
+class DirtyRectRenderer:
+    def __init__(self, modes=ALL_MODES):
+        self.modes = modes  # 结束画面上列出的可切换模式
+        self.last_state = None
+        self.last_maze = None
+        self.last_camera = None
+        self.last_hover = None
+        self.entity_rects = []
+        self.overlay_keys = {}
+    
+    def invalidate(self):
+        """下一帧强制完整重绘"""
+        self.last_state = None
+    
+    def render(self, session, normal_hovered, hard_hovered, crowd_hovered=False, alpha=1.0):
+        # 状态切换、换了迷宫或摄像机滚动时完整重绘
+        if (session.state != self.last_state or session.maze is not self.last_maze or
+                (camera.x, camera.y) != self.last_camera):
+            draw_frame(session, normal_hovered, hard_hovered, crowd_hovered, alpha, self.modes)
+            with profiler.phase("flip"):
+                pygame.display.flip()
+            
+            self.last_state = session.state
+            self.last_maze = session.maze
+            self.last_camera = (camera.x, camera.y)
+            self.last_hover = (normal_hovered, hard_hovered, crowd_hovered)
+            self.entity_rects = self.get_entity_rects(session, alpha)
+            self.overlay_keys = {}
+            if session.state == GameState.PLAYING:
+                for name, key, rect, _ in get_playing_overlays(session):
+                    self.overlay_keys[name] = (key, rect)
+            return
+        
+        if session.state == GameState.MENU:
+            self.render_menu(normal_hovered, hard_hovered, crowd_hovered)
+        elif session.state == GameState.PLAYING:
+            self.render_playing(session, alpha)
+        # 结束/胜利画面是静止的，不需要更新
+    
+    def get_entity_rects(self, session, alpha=1.0):
+        if session.state == GameState.MENU:
+            return []
+        
+        spikes = session.spikes
+        rects = []
+        if spikes.visible:
+            rects = [cell_rect(spikes.xs[i], spikes.ys[i]) for i in spikes.indices_in(*camera.visible_cells())]
+        monster = session.monster
+        if monster and monster.active:
+            rects.append(monster_rect(*session.monster_position(alpha)))
+        crowd = session.crowd
+        if crowd is not None:
+            rects.extend(monster_rect(*crowd.position(monster, alpha)) for monster in visible_monsters(crowd))
+        rects.append(cell_rect(*session.player_position(alpha)))
+        return rects
+    
+    def render_menu(self, normal_hovered, hard_hovered, crowd_hovered):
+        hover = (normal_hovered, hard_hovered, crowd_hovered)
+        if hover == self.last_hover:
+            return
+        
+        self.last_hover = hover
+        screen.fill(BLACK)
+        draw_menu(normal_hovered, hard_hovered, crowd_hovered)
+        pygame.display.update(list(menu_buttons()))
+    
+    def render_playing(self, session, alpha):
+        entity_rects = self.get_entity_rects(session, alpha)
+        dirty = self.entity_rects + entity_rects
+        self.entity_rects = entity_rects
+        
+        # 内容变化的HUD元素，新旧位置都要更新
+        overlays = get_playing_overlays(session)
+        overlay_keys = {}
+        for name, key, rect, _ in overlays:
+            overlay_keys[name] = (key, rect)
+            if self.overlay_keys.get(name) != (key, rect):
+                dirty.append(rect)
+        for name, (key, rect) in self.overlay_keys.items():
+            if overlay_keys.get(name) != (key, rect):
+                dirty.append(rect)
+        self.overlay_keys = overlay_keys
+        
+        # 被实体覆盖的HUD要整体重绘，保证叠放顺序不变
+        redraw_overlays = []
+        for overlay in overlays:
+            rect = overlay[2]
+            if rect.collidelist(dirty) != -1:
+                redraw_overlays.append(overlay)
+                dirty.append(rect)
+        
+        # 视口边缘的格子只露出一部分；fill 不会正确裁剪负坐标，先裁到屏幕内
+        screen_rect = screen.get_rect()
+        dirty = [rect.clip(screen_rect) for rect in dirty if rect.colliderect(screen_rect)]
+        
+        # 从背景恢复脏区域
+        with profiler.phase("draw maze"):
+            layer = get_maze_layer(session.maze)
+            for rect in dirty:
+                screen.fill(BLACK, rect)
+                layer.draw(screen, rect)
+        
+        # 所有动态实体的区域都已恢复，直接按原顺序重绘
+        with profiler.phase("draw spikes"):
+            draw_spikes(session.spikes)
+        with profiler.phase("draw entities"):
+            if session.monster:
+                draw_monster(session.monster, session.monster_position(alpha))
+            if session.crowd is not None:
+                draw_crowd(session.crowd, alpha)
+            draw_player(*session.player_position(alpha))
+        
+        with profiler.phase("draw HUD"):
+            for _, _, _, draw in redraw_overlays:
+                draw()
+        
+        with profiler.phase("flip"):
+            pygame.display.update(dirty)
+
+# 读取方向键，对应原来的按键优先级：上、下、左、右
+def read_action():
+    keys = pygame.key.get_pressed()
+    if keys[pygame.K_UP]:
+        return Action.UP
+    elif keys[pygame.K_DOWN]:
+        return Action.DOWN
+    elif keys[pygame.K_LEFT]:
+        return Action.LEFT
+    elif keys[pygame.K_RIGHT]:
+        return Action.RIGHT
+    return Action.NONE
+
+# 主游戏函数 - 游戏规则都在GameSession里，这里只负责输入和绘制
+def main(level_pack=None, tick_rate=TICK_RATE, fps=FPS, record_dir=None, replay=None, profile_trace=None,
+         maze_size=(COLS, ROWS), headless=False):
+    global hint_text, hint_search, profiler, profiler_lines
+    init_display(headless)
+    # 关卡包里的关卡按包头记录的地刺数和算法生成，之后每批地刺和录像都要沿用
+    if level_pack is not None:
+        session = level_pack.new_session(tick_rate)
+    else:
+        width, height = maze_size
+        session = GameSession(default_spike_count(width, height), tick_rate=tick_rate, width=width, height=height)
+    hint_moves = None
+    
+    # 导出trace时从一开始就计时；否则按F3时才创建分析器
+    if profile_trace is not None:
+        profiler = FrameProfiler(trace_path=profile_trace)
+    show_profiler = False
+    profiler_refresh = 0
+    
+    # 工作进程预先准备好下一关（各难度共用，有关卡包时从包里取），重新开始不用等待生成
+    prefetcher = LevelPrefetcher(level_pack=level_pack, width=session.width, height=session.height,
+                                 spike_count=session.spike_count, algorithm=session.maze_algorithm).start()
+    
+    # 录像：每局保存种子和输入变化，结束时写入 record_dir
+    recording = None
+    
+    def save_recording():
+        nonlocal recording
+        if recording is None:
+            return
+        recording.finish(session)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{session.seed}.mzr"
+        recording.save(os.path.join(record_dir, name))
+        recording = None
+    
+    def new_game(difficulty):
+        nonlocal recording
+        save_recording()
+        session.reset(difficulty=difficulty, level=prefetcher.take())
+        rewind.clear()
+        if record_dir is not None:
+            recording = Recording.start(session)
+    
+    # 回放：按录像重建开局，输入来自录像而不是键盘
+    replay_policy = None
+    if replay is not None:
+        session = replay.make_session()
+        replay_policy = replay.policy()
+    
+    # 每个tick自动存一个快照用于倒带；录制和回放时不能存读档，否则输入日志就对不上了
+    rewind = RewindBuffer(REWIND_SECONDS * session.tick_rate)
+    
+    def can_snapshot():
+        return recording is None and replay_policy is None and session.crowd is None
+    
+    def quick_save(save):
+        if not can_snapshot():
+            return "Save/load is off while recording, replaying or in Crowd mode"
+        try:
+            if save:
+                if session.maze is None:
+                    return None
+                Snapshot.capture(session).save(SNAPSHOT_PATH)
+                return "Game saved"
+            Snapshot.load(SNAPSHOT_PATH).restore(session)
+        except (OSError, ValueError) as error:
+            return f"{'Save' if save else 'Load'} failed: {error}"
+        rewind.clear()
+        dirty_renderer.invalidate()
+        return "Game loaded"
     
     # 菜单选择
     normal_hovered = False
     hard_hovered = False
+    crowd_hovered = False
+    
+    dirty_renderer = DirtyRectRenderer()
+    get_sprite_atlas()
     
+    # 固定步长：累积真实经过的时间，每满一个tick推进一次模拟
+    accumulator = 0.0
     last_time = pygame.time.get_ticks()
     
     running = True
+    exit_code = 0
     while running:
+        profiler.begin_frame()
+        session.profiler = profiler if profiler.enabled else None
+        
         current_time = pygame.time.get_ticks()
-        dt = (current_time - last_time) / 1000.0
+        accumulator += min((current_time - last_time) / 1000.0, MAX_FRAME_TIME)
         last_time = current_time
         
         mouse_pos = pygame.mouse.get_pos()
         
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-            
-            elif event.type == pygame.MOUSEBUTTONDOWN:
-                # 菜单状态处理
-                if game_state == GameState.MENU:
-                    normal_button = pygame.Rect(WIDTH//2 - 150, HEIGHT//2, 300, 60)
-                    hard_button = pygame.Rect(WIDTH//2 - 150, HEIGHT//2 + 80, 300, 60)
-                    
-                    if normal_button.collidepoint(mouse_pos):
-                        difficulty = Difficulty.NORMAL
-                        game_state = GameState.PLAYING
-                        # 初始化游戏
-                        maze = generate_maze()
-                        player_x, player_y = 1, 1
-                        spikes = generate_random_spikes(maze, player_x, player_y, 30)
-                        monster = None  # Normal模式没有怪物
-                        game_over = False
-                        win = False
-                        player_move_count = 0
+        with profiler.phase("events"):
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    running = False
+                
+                elif event.type == pygame.MOUSEBUTTONDOWN:
+                    # 菜单状态处理
+                    if session.state == GameState.MENU:
+                        normal_button, hard_button, crowd_button = menu_buttons()
+                        
+                        if normal_button.collidepoint(mouse_pos):
+                            new_game(Difficulty.NORMAL)
+                        elif hard_button.collidepoint(mouse_pos):
+                            new_game(Difficulty.HARD)
+                        elif crowd_button.collidepoint(mouse_pos):
+                            new_game(Difficulty.CROWD)
+                
+                elif event.type == pygame.KEYDOWN:
+                    # F3 切换帧分析叠加层
+                    if event.key == pygame.K_F3:
+                        show_profiler = not show_profiler
+                        if show_profiler and not profiler.enabled:
+                            profiler = FrameProfiler()
+                        elif not show_profiler:
+                            profiler_lines = None
+                            if profile_trace is None:
+                                profiler = NULL_PROFILER
                     
-                    elif hard_button.collidepoint(mouse_pos):
-                        difficulty = Difficulty.HARD
-                        game_state = GameState.PLAYING
-                        # 初始化游戏
-                        maze = generate_maze()
-                        player_x, player_y = 1, 1
-                        spikes = generate_random_spikes(maze, player_x, player_y, 30)
-                        monster = Monster(1, 1)  # Hard模式有怪物，出生在主角位置
-                        game_over = False
-                        win = False
-                        player_move_count = 0
-            
-            elif event.type == pygame.KEYDOWN:
-                # 游戏结束或胜利状态处理
-                if game_state in [GameState.GAME_OVER, GameState.VICTORY]:
-                    if event.key == pygame.K_r:  # 重新开始当前关卡
-                        game_state = GameState.PLAYING
-                        maze = generate_maze()
-                        player_x, player_y = 1, 1
-                        spikes = generate_random_spikes(maze, player_x, player_y, 30)
-                        if difficulty == Difficulty.HARD:
-                            monster = Monster(1, 1)  # 怪物出生在主角位置
-                        else:
-                            monster = None
-                        game_over = False
-                        win = False
-                        player_move_count = 0
+                    # F5存档、F9读档，结果显示在提示的位置
+                    if event.key in (pygame.K_F5, pygame.K_F9):
+                        hint_text = quick_save(event.key == pygame.K_F5)
+                        hint_search = None
+                        hint_moves = session.player_move_count
                     
-                    elif event.key == pygame.K_h:  # 切换到Hard模式
-                        difficulty = Difficulty.HARD
-                        game_state = GameState.PLAYING
-                        maze = generate_maze()
-                        player_x, player_y = 1, 1
-                        spikes = generate_random_spikes(maze, player_x, player_y, 30)
-                        monster = Monster(1, 1)  # 怪物出生在主角位置
-                        game_over = False
-                        win = False
-                        player_move_count = 0
+                    # 游戏中按H显示提示（求解器不模拟怪物群，Crowd模式没有提示）
+                    if (session.state == GameState.PLAYING and event.key == pygame.K_h and
+                            session.crowd is None):
+                        hint_text = start_hint(session)
+                        hint_moves = session.player_move_count
                     
-                    elif event.key == pygame.K_n:  # 切换到Normal模式
-                        difficulty = Difficulty.NORMAL
-                        game_state = GameState.PLAYING
-                        maze = generate_maze()
-                        player_x, player_y = 1, 1
-                        spikes = generate_random_spikes(maze, player_x, player_y, 30)
-                        monster = None
-                        game_over = False
-                        win = False
-                        player_move_count = 0
+                    # 游戏结束或胜利状态处理
+                    if session.state in [GameState.GAME_OVER, GameState.VICTORY]:
+                        if event.key == pygame.K_r:  # 重新开始当前关卡
+                            new_game(session.difficulty)
+                        elif event.key == pygame.K_h:  # 切换到Hard模式
+                            new_game(Difficulty.HARD)
+                        elif event.key == pygame.K_n:  # 切换到Normal模式
+                            new_game(Difficulty.NORMAL)
+                        elif event.key == pygame.K_c:  # 切换到Crowd模式
+                            new_game(Difficulty.CROWD)
         
         # 更新菜单悬停状态
-        if game_state == GameState.MENU:
-            normal_button = pygame.Rect(WIDTH//2 - 150, HEIGHT//2, 300, 60)
-            hard_button = pygame.Rect(WIDTH//2 - 150, HEIGHT//2 + 80, 300, 60)
+        if session.state == GameState.MENU:
+            normal_button, hard_button, crowd_button = menu_buttons()
             normal_hovered = normal_button.collidepoint(mouse_pos)
             hard_hovered = hard_button.collidepoint(mouse_pos)
+            crowd_hovered = crowd_button.collidepoint(mouse_pos)
         
-        # 游戏进行中
-        if game_state == GameState.PLAYING:
-            # 更新地刺动画并检查是否完成周期
-            all_cycle_completed = True
-            for spike in spikes:
-                spike.update(dt)
-                if not spike.cycle_completed:
-                    all_cycle_completed = False
-            
-            # 当地刺批次完成完整周期后重新生成
-            if all_cycle_completed and len(spikes) > 0 and not need_respawn:
-                need_respawn = True
-            
-            # 在下一批地刺开始前重新生成位置
-            if need_respawn and all(not spike.active and not spike.visible for spike in spikes):
-                spikes = generate_random_spikes(maze, player_x, player_y, 30)
-                need_respawn = False
-            
-            # 更新怪物（只在Hard模式）
-            if monster and difficulty == Difficulty.HARD:
-                # 玩家移动5格后激活怪物
-                if not monster.active and player_move_count >= 5:
-                    monster.activate(player_x, player_y, maze)
-                
-                # 怪物一直在移动（即使没有激活也会更新位置）
-                monster.update(dt, player_x, player_y, maze)
-                
-                # 检查怪物碰撞
-                if monster.active and monster.x == player_x and monster.y == player_y:
-                    game_over = True
-                    game_state = GameState.GAME_OVER
-            
-            # 处理连续移动
-            keys = pygame.key.get_pressed()
-            move_delay += 1
-            
-            if move_delay >= move_interval:
-                new_x, new_y = player_x, player_y
-                
-                if keys[pygame.K_UP]:
-                    new_y -= 1
-                elif keys[pygame.K_DOWN]:
-                    new_y += 1
-                elif keys[pygame.K_LEFT]:
-                    new_x -= 1
-                elif keys[pygame.K_RIGHT]:
-                    new_x += 1
-                
-                if is_valid_move(maze, new_x, new_y) and (new_x, new_y) != (player_x, player_y):
-                    player_x, player_y = new_x, new_y
-                    move_delay = 0
-                    player_move_count += 1
-                    
-                    # 检查是否到达终点
-                    if player_x == COLS-2 and player_y == ROWS-2:
-                        win = True
-                        game_state = GameState.VICTORY
-                    
-                    # 检查是否碰到活跃的地刺
-                    for spike in spikes:
-                        if spike.active and spike.x == player_x and spike.y == player_y:
-                            game_over = True
-                            game_state = GameState.GAME_OVER
+        # 按住Backspace倒带：每个tick退回一个自动存档，死亡后也能退回去
+        rewinding = (len(rewind) > 0 and session.state in [GameState.PLAYING, GameState.GAME_OVER] and
+                     can_snapshot() and pygame.key.get_pressed()[pygame.K_BACKSPACE])
+        if rewinding:
+            # 结束画面上不累积时间，先退回一个tick
+            if session.state != GameState.PLAYING:
+                rewind.rewind(session)
+            while accumulator >= session.tick_dt and rewind.rewind(session):
+                accumulator -= session.tick_dt
         
-        # 绘制游戏
-        screen.fill(BLACK)
+        # 游戏进行中
+        elif session.state == GameState.PLAYING:
+            action = read_action()
+            while accumulator >= session.tick_dt and session.state == GameState.PLAYING:
+                if replay_policy is not None:
+                    session.step(replay_policy(session))
+                    if session.tick >= replay.final_tick:
+                        break
+                elif recording is not None:
+                    recording.step(session, action)
+                else:
+                    if session.crowd is None:
+                        rewind.push(session)
+                    session.step(action)
+                accumulator -= session.tick_dt
+        if hint_text and (session.state != GameState.PLAYING or session.player_move_count != hint_moves):
+            hint_text = hint_search = None
+        elif hint_search is not None:
+            hint_text = update_hint(session) or hint_text
+        if replay_policy is not None and (session.tick >= replay.final_tick or session.state != GameState.PLAYING):
+            matched = session.tick == replay.final_tick and session.state_hash() == replay.final_hash
+            print("replay finished:", "state hash matches" if matched else "STATE HASH MISMATCH")
+            replay_policy = None
+            # 无头模式没人看菜单，放完就退出，退出码表示校验结果
+            if headless:
+                exit_code = 0 if matched else 1
+                running = False
+            # 录像在游戏中途结束时回到菜单
+            elif session.state == GameState.PLAYING:
+                session.state = GameState.MENU
+        if session.state != GameState.PLAYING:
+            accumulator = 0.0
+            if recording is not None:
+                save_recording()
         
-        if game_state == GameState.MENU:
-            draw_menu(normal_hovered, hard_hovered)
+        # 叠加层每15帧刷新一次，数字太快看不清
+        if show_profiler:
+            profiler_refresh -= 1
+            if profiler_refresh <= 0:
+                profiler_lines = tuple(profiler.summary_rows())
+                profiler_refresh = 15
         
-        elif game_state == GameState.PLAYING:
-            draw_maze(maze, spikes, monster)
-            draw_player(player_x, player_y)
-            
-            # 显示关卡信息
-            level_font = pygame.font.SysFont("arial", 20)
-            mode_text = "Normal" if difficulty == Difficulty.NORMAL else "Hard"
-            level_text = level_font.render(f"Mode: {mode_text}", True, WHITE)
-            screen.blit(level_text, (10, 10))
-            
-            # 显示怪物激活倒计时（Hard模式）
-            if difficulty == Difficulty.HARD and monster and not monster.active:
-                count_font = pygame.font.SysFont("arial", 16)
-                count_text = count_font.render(f"Monster activates in: {5 - player_move_count} moves", True, YELLOW)
-                screen.blit(count_text, (10, 35))
-        
-        # 显示游戏结束状态
-        elif game_state == GameState.GAME_OVER:
-            draw_maze(maze, spikes, monster)
-            draw_player(player_x, player_y)
-            
-            panel_rect = pygame.Rect(WIDTH//2 - 250, HEIGHT//2 - 120, 500, 240)
-            draw_ui_panel(panel_rect)
-            
-            font_large = pygame.font.SysFont("arial", 72, bold=True)
-            font_medium = pygame.font.SysFont("arial", 28)
-            
-            text = font_large.render("GAME OVER", True, RED)
-            screen.blit(text, (WIDTH//2 - text.get_width()//2, HEIGHT//2 - 80))
-            
-            restart_text = font_medium.render("Press R to Restart", True, WHITE)
-            screen.blit(restart_text, (WIDTH//2 - restart_text.get_width()//2, HEIGHT//2 + 20))
-            
-            if difficulty == Difficulty.NORMAL:
-                switch_text = font_medium.render("Press H for Hard Mode", True, YELLOW)
+        # 绘制游戏（按剩余的不足一个tick的时间插值）
+        alpha = min(1.0, accumulator / session.tick_dt)
+        if session.maze is not None:
+            camera.follow(*session.player_position(alpha), session.maze)
+        with profiler.phase("render"):
+            if DIRTY_RECT_RENDERING:
+                dirty_renderer.render(session, normal_hovered, hard_hovered, crowd_hovered, alpha)
             else:
-                switch_text = font_medium.render("Press N for Normal Mode", True, YELLOW)
-            screen.blit(switch_text, (WIDTH//2 - switch_text.get_width()//2, HEIGHT//2 + 60))
+                draw_frame(session, normal_hovered, hard_hovered, crowd_hovered, alpha)
+                with profiler.phase("flip"):
+                    pygame.display.flip()
+        profiler.end_frame()
+        clock.tick(fps)
+    
+    save_recording()
+    profiler.close()
+    prefetcher.stop()
+    pygame.quit()
+    sys.exit(exit_code)
+
+# 无尽模式主循环 - 没有菜单和难度，按R用同一个种子（或新的随机种子）重新开始
+def main_endless(seed=None, tick_rate=TICK_RATE, fps=FPS, headless=False):
+    init_display(headless)
+    session = EndlessSession(tick_rate).reset(seed)
+    get_sprite_atlas()
+    
+    accumulator = 0.0
+    last_time = pygame.time.get_ticks()
+    
+    running = True
+    while running:
+        current_time = pygame.time.get_ticks()
+        accumulator += min((current_time - last_time) / 1000.0, MAX_FRAME_TIME)
+        last_time = current_time
         
-        # 显示胜利状态
-        elif game_state == GameState.VICTORY:
-            draw_maze(maze, spikes, monster)
-            draw_player(player_x, player_y)
-            
-            panel_rect = pygame.Rect(WIDTH//2 - 250, HEIGHT//2 - 120, 500, 240)
-            draw_ui_panel(panel_rect)
-            
-            font_large = pygame.font.SysFont("arial", 72, bold=True)
-            font_medium = pygame.font.SysFont("arial", 28)
-            
-            text = font_large.render("VICTORY!", True, GREEN)
-            screen.blit(text, (WIDTH//2 - text.get_width()//2, HEIGHT//2 - 80))
-            
-            restart_text = font_medium.render("Press R to Restart", True, WHITE)
-            screen.blit(restart_text, (WIDTH//2 - restart_text.get_width()//2, HEIGHT//2 + 20))
-            
-            if difficulty == Difficulty.NORMAL:
-                switch_text = font_medium.render("Press H for Hard Mode", True, YELLOW)
-            else:
-                switch_text = font_medium.render("Press N for Normal Mode", True, YELLOW)
-            screen.blit(switch_text, (WIDTH//2 - switch_text.get_width()//2, HEIGHT//2 + 60))
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_r and session.state != GameState.PLAYING:
+                session.reset(seed)
         
-        # 显示操作说明
-        if game_state == GameState.PLAYING:
-            controls_bg = pygame.Rect(5, HEIGHT - 35, WIDTH - 10, 30)
-            draw_ui_panel(controls_bg, 150)
-            
-            font = pygame.font.SysFont("arial", 16)
-            controls_text = font.render("Arrow Keys: Move | Avoid Spikes" + 
-                                      (" | Escape Monster" if difficulty == Difficulty.HARD else ""), 
-                                      True, WHITE)
-            screen.blit(controls_text, (WIDTH//2 - controls_text.get_width()//2, HEIGHT - 28))
+        if session.state == GameState.PLAYING:
+            action = read_action()
+            while accumulator >= session.tick_dt and session.state == GameState.PLAYING:
+                session.step(action)
+                accumulator -= session.tick_dt
+        else:
+            accumulator = 0.0
         
+        alpha = min(1.0, accumulator / session.tick_dt)
+        camera.center_on(*session.player_position(alpha))
+        draw_endless_frame(session, alpha)
         pygame.display.flip()
-        clock.tick(FPS)
+        clock.tick(fps)
+    
+    pygame.quit()
+    sys.exit()
+
+# 联机客户端 - 游戏在 game_server 上运行，这里只发送方向键、按收到的增量绘制
+def main_online(host, port, difficulty=Difficulty.NORMAL, fps=FPS, headless=False):
+    from game_server import GameClient, SERVED_DIFFICULTIES
+    init_display(headless)
+    client = GameClient(host, port)
+    client.join(difficulty)
+    session = client.session
+    # 结束画面只列出服务器支持的难度
+    dirty_renderer = DirtyRectRenderer(SERVED_DIFFICULTIES)
+    get_sprite_atlas()
     
+    last_time = pygame.time.get_ticks()
+    running = True
+    while running:
+        current_time = pygame.time.get_ticks()
+        dt = min((current_time - last_time) / 1000.0, MAX_FRAME_TIME)
+        last_time = current_time
+        
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.KEYDOWN and session.state in [GameState.GAME_OVER, GameState.VICTORY]:
+                if event.key == pygame.K_r:
+                    client.restart(session.difficulty)
+                elif event.key == pygame.K_h:
+                    client.restart(Difficulty.HARD)
+                elif event.key == pygame.K_n:
+                    client.restart(Difficulty.NORMAL)
+        
+        if session.state == GameState.PLAYING:
+            client.set_action(read_action())
+        if not client.poll():
+            print("disconnected from server")
+            running = False
+        if session.error:
+            print("server error:", session.error)
+            session.error = None
+        
+        # 第一个START到达之前没有东西可画
+        if session.maze is not None:
+            session.advance(dt)
+            alpha = session.alpha()
+            camera.follow(*session.player_position(alpha), session.maze)
+            dirty_renderer.render(session, False, False, False, alpha)
+        clock.tick(fps)
+    
+    client.close()
     pygame.quit()
     sys.exit()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Maze Adventure")
+    parser.add_argument("--level-pack", help="play pre-generated levels from a level pack file")
+    parser.add_argument("--endless", action="store_true", help="explore an endless maze generated chunk by chunk")
+    parser.add_argument("--seed", type=int, help="world seed for --endless (default: random)")
+    parser.add_argument("--maze-size", metavar="WxH", default=f"{COLS}x{ROWS}",
+                        help=f"maze width and height in cells; larger mazes scroll (default {COLS}x{ROWS})")
+    parser.add_argument("--tick-rate", type=int, default=TICK_RATE, help="simulation ticks per second")
+    parser.add_argument("--fps", type=int, default=FPS, help="render frame cap (0 = uncapped)")
+    parser.add_argument("--record", metavar="DIR", help="save a replay of every game into DIR")
+    parser.add_argument("--replay", metavar="FILE", help="watch a recorded game at normal speed")
+    parser.add_argument("--profile-trace", metavar="FILE",
+                        help="write per-phase frame timings as a Chrome trace / Perfetto JSON file")
+    parser.add_argument("--headless", action="store_true",
+                        help="run without a window using the SDL dummy video driver (e.g. for --replay on a server)")
+    parser.add_argument("--connect", metavar="HOST:PORT", help="play on a game_server.py server instead of locally")
+    parser.add_argument("--difficulty", choices=[Difficulty.NORMAL, Difficulty.HARD], default=Difficulty.NORMAL,
+                        help="difficulty of the first game with --connect")
+    args = parser.parse_args()
+    
+    if args.connect:
+        host, _, port = args.connect.rpartition(":")
+        main_online(host or "127.0.0.1", int(port), args.difficulty, args.fps, args.headless)
+    if args.endless:
+        main_endless(args.seed, args.tick_rate, args.fps, args.headless)
+    
+    try:
+        maze_size = tuple(int(n) for n in args.maze_size.lower().split("x"))
+    except ValueError:
+        maze_size = ()
+    if len(maze_size) != 2 or min(maze_size) < 5:
+        parser.error("--maze-size must look like 101x101 and be at least 5x5")
+    level_pack = None
+    if args.level_pack:
+        from level_pack import LevelPack
+        level_pack = LevelPack(args.level_pack)
+    if args.record:
+        os.makedirs(args.record, exist_ok=True)
+    replay = Recording.load(args.replay) if args.replay else None
+    main(level_pack, args.tick_rate if replay is None else replay.tick_rate, args.fps, args.record, replay,
+         args.profile_trace, maze_size, args.headless)
\ No newline at end of file
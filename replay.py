@@ -0,0 +1,240 @@
+import argparse
+import random
+import struct
+import sys
+import time
+from multiprocessing import Pool
+
+from game_core import ROWS, COLS, TICK_RATE, Action, Difficulty, GameState, GameSession, generate_level, run_session
+from level_pack import LevelPack
+
+# 录像与回放 - 一局游戏只保存种子、关卡参数和"输入变化"日志，回放时逐tick重新模拟，
+# 最后比对状态摘要确认结果完全一致
+#
+# 文件布局（小端）：
+#   头部   magic(4s) version(H) tick_rate(H) width(H) height(H) spike_count(H) difficulty(B)
+#          algorithm长度(B) seed(Q) final_tick(I) change_count(I) final_hash(16s)
+#   算法名 algorithm长度 字节的ASCII
+#   终局   状态名长度(B) + ASCII
+#   输入   change_count 个变长整数，每个编码 (距上次变化的tick数 << 3) | 动作
+
+MAGIC = b"MZRP"
+VERSION = 1
+HEADER = struct.Struct("<4sHHHHHBBQII16s")
+
+DIFFICULTY_CODES = {Difficulty.NORMAL: 0, Difficulty.HARD: 1, Difficulty.CROWD: 2}
+DIFFICULTIES = {code: difficulty for difficulty, code in DIFFICULTY_CODES.items()}
+STATE_CODES = {GameState.MENU: 0, GameState.PLAYING: 1, GameState.GAME_OVER: 2, GameState.VICTORY: 3}
+STATES = {code: state for state, code in STATE_CODES.items()}
+
+def write_varint(out, value):
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+def read_varint(data, offset):
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+# 一局游戏的录像：changes 是 (tick, 动作) 列表，只在动作变化时记一条
+class Recording:
+    def __init__(self, seed, difficulty, tick_rate=TICK_RATE, width=COLS, height=ROWS,
+                 spike_count=30, algorithm="backtracker"):
+        self.seed = seed
+        self.difficulty = difficulty
+        self.tick_rate = tick_rate
+        self.width = width
+        self.height = height
+        self.spike_count = spike_count
+        self.algorithm = algorithm
+
+        self.changes = []
+        self.last_action = Action.NONE
+        self.final_tick = 0
+        self.final_state = GameState.PLAYING
+        self.final_hash = bytes(16)
+
+    @classmethod
+    def start(cls, session):
+        """开始录制一局刚reset过的游戏；重放时按种子用 generate_level 重建开局，所以种子必须能写进录像"""
+        if not isinstance(session.seed, int) or not 0 <= session.seed < 1 << 64:
+            raise ValueError(f"cannot record a session without a 64-bit seed (seed={session.seed!r})")
+        return cls(session.seed, session.difficulty, session.tick_rate,
+                   session.maze.width, session.maze.height,
+                   session.spike_count, session.maze_algorithm)
+
+    def record(self, tick, action):
+        if action != self.last_action:
+            self.changes.append((tick, action))
+            self.last_action = action
+
+    def step(self, session, action):
+        """记录动作并推进一个tick"""
+        self.record(session.tick, action)
+        return session.step(action)
+
+    def finish(self, session):
+        self.final_tick = session.tick
+        self.final_state = session.state
+        self.final_hash = session.state_hash()
+        return self
+
+    def make_session(self):
+        """按录像里的种子和参数重建开局"""
+        level = generate_level(self.seed, self.width, self.height, self.spike_count, self.algorithm)
+        session = GameSession(self.spike_count, self.algorithm, self.tick_rate)
+        return session.reset(difficulty=self.difficulty, level=level)
+
+    def policy(self):
+        """返回按tick给出录像动作的策略函数，可直接交给 run_session"""
+        changes = self.changes
+        state = {"next": 0, "action": Action.NONE}
+
+        def action_at(session):
+            while state["next"] < len(changes) and changes[state["next"]][0] <= session.tick:
+                state["action"] = changes[state["next"]][1]
+                state["next"] += 1
+            return state["action"]
+        return action_at
+
+    def encode(self):
+        algorithm = self.algorithm.encode("ascii")
+        final_state = self.final_state.encode("ascii")
+        out = bytearray(HEADER.pack(MAGIC, VERSION, self.tick_rate, self.width, self.height,
+                                    self.spike_count, DIFFICULTY_CODES[self.difficulty],
+                                    len(algorithm), self.seed, self.final_tick,
+                                    len(self.changes), self.final_hash))
+        out += algorithm
+        out.append(len(final_state))
+        out += final_state
+
+        last_tick = 0
+        for tick, action in self.changes:
+            write_varint(out, (tick - last_tick) << 3 | action)
+            last_tick = tick
+        return bytes(out)
+
+    @classmethod
+    def decode(cls, data):
+        (magic, version, tick_rate, width, height, spike_count, difficulty,
+         algorithm_length, seed, final_tick, change_count, final_hash) = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError("not a replay file")
+        if version != VERSION:
+            raise ValueError(f"unsupported replay version {version}")
+
+        offset = HEADER.size
+        algorithm = bytes(data[offset:offset + algorithm_length]).decode("ascii")
+        offset += algorithm_length
+        state_length = data[offset]
+        final_state = bytes(data[offset + 1:offset + 1 + state_length]).decode("ascii")
+        offset += 1 + state_length
+
+        recording = cls(seed, DIFFICULTIES[difficulty], tick_rate, width, height, spike_count, algorithm)
+        tick = 0
+        for _ in range(change_count):
+            value, offset = read_varint(data, offset)
+            tick += value >> 3
+            recording.changes.append((tick, value & 7))
+        if recording.changes:
+            recording.last_action = recording.changes[-1][1]
+        recording.final_tick = final_tick
+        recording.final_state = final_state
+        recording.final_hash = final_hash
+        return recording
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.encode())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls.decode(f.read())
+
+def replay(recording):
+    """无窗口、不限速地重放录像，返回重放结束时的 session"""
+    session = recording.make_session()
+    run_session(session, recording.policy(), recording.final_tick)
+    return session
+
+def verify(recording):
+    session = replay(recording)
+    return session.tick == recording.final_tick and session.state_hash() == recording.final_hash
+
+# 进程池的工作函数：返回 (路径, 是否一致, 错误信息)
+def _verify_file(path):
+    try:
+        return path, verify(Recording.load(path)), None
+    except (OSError, ValueError, struct.error) as error:
+        return path, False, str(error)
+
+def check_pack(path, games=20, max_ticks=3000, seed=0):
+    """像游戏前端一样从关卡包开局（LevelPack.new_session）、随机操作并录制，再按录像重放校验，
+    返回 (通过局数, 总局数)；跑到足够多的tick让地刺换过几批，地刺数量与包不一致时一定会对不上"""
+    rng = random.Random(seed)
+    passed = 0
+    with LevelPack(path) as pack:
+        for _ in range(games):
+            session = pack.new_session()
+            session.reset(difficulty=rng.choice([Difficulty.NORMAL, Difficulty.HARD]), level=pack.random_level(rng))
+            recording = Recording.start(session)
+            action = Action.NONE
+            while session.state == GameState.PLAYING and session.tick < max_ticks:
+                if rng.random() < 0.05:
+                    action = rng.randint(Action.NONE, Action.RIGHT)
+                recording.step(session, action)
+            recording.finish(session)
+            passed += verify(Recording.decode(recording.encode()))
+    return passed, games
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verify and inspect Maze Adventure replays")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    verify_command = commands.add_parser("verify", help="re-simulate replays headless and check their final state")
+    verify_command.add_argument("replays", nargs="+")
+    verify_command.add_argument("--workers", type=int, default=None, help="process count (default: CPU count)")
+
+    info = commands.add_parser("info", help="print a replay header")
+    info.add_argument("replay")
+
+    check = commands.add_parser("check-pack", help="record random games on levels from a pack and verify them")
+    check.add_argument("pack")
+    check.add_argument("--games", type=int, default=20)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "check-pack":
+        passed, games = check_pack(args.pack, args.games)
+        print(f"{passed}/{games} recordings from {args.pack} verified")
+        return 0 if passed == games else 1
+
+    if args.command == "verify":
+        start = time.perf_counter()
+        failed = 0
+        with Pool(args.workers) as pool:
+            for path, ok, error in pool.imap_unordered(_verify_file, args.replays, 8):
+                if not ok:
+                    failed += 1
+                    print(f"MISMATCH {path}" + (f": {error}" if error else ""))
+        elapsed = time.perf_counter() - start
+        print(f"verified {len(args.replays) - failed}/{len(args.replays)} replays in {elapsed:.2f}s")
+        return 1 if failed else 0
+
+    recording = Recording.load(args.replay)
+    print(f"{args.replay}: seed {recording.seed}, {recording.difficulty}, "
+          f"{recording.width}x{recording.height} {recording.algorithm}, "
+          f"{recording.final_tick} ticks @ {recording.tick_rate}Hz, "
+          f"{len(recording.changes)} input changes, ended {recording.final_state}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,309 @@
+import struct
+import sys
+from array import array
+from collections import deque
+
+from game_core import PLAYER_MOVE_INTERVAL, CountingRandom, FreeCellIndex, Monster, SpikeField
+from maze_grid import MazeGrid
+from replay import DIFFICULTY_CODES, DIFFICULTIES, STATE_CODES, STATES, write_varint, read_varint
+
+# 存档快照 - 把一局 GameSession 的完整状态压成几百字节，恢复后继续模拟的结果（和状态摘要）与原局完全相同
+#
+# 快照分成几个段，每段单独编码；增量快照只包含与基准快照不同的段：
+#   CORE     state(B) difficulty(B) flags(B) tick(I) player_x(H) player_y(H) move_count(I) move_delay(H) seed(q)
+#            tick_rate(H) spike_count(I)
+#   CLOCK    地刺时钟 timer(d) animation_progress(d) flags(B)
+#   MONSTER  active(B) x(H) y(H) move_count(I) move_timer(d)；没有怪物时为空
+#   RNG      0 seed(q) words(Q)                按种子和已用掉的随机数个数重建（CountingRandom）
+#            1 state(625 个 I) has_gauss(B) gauss(d)   无法重建时保存完整状态
+#   MAZE     width(H) height(H) 迷宫位图
+#   SPIKES   count(I) 地刺一维下标（格子数不超过65536时每个 H，否则 I）
+#
+# 编码（小端）：version(B) kind(B) mask(B) base_tick(I)，之后按 mask 的位顺序，每段为 长度(变长整数) + 内容
+# 每个tick变化的只有 CORE、CLOCK 和 MONSTER，增量快照约60字节；换批地刺或随机数被用过时才多带相应的段
+#
+# 怪物群的几百个怪物不在快照里，Crowd模式不能存档
+
+VERSION = 1
+FULL = 0
+DELTA = 1
+
+HEADER = struct.Struct("<BBBI")
+CORE = struct.Struct("<BBBIHHIHqHI")
+CLOCK = struct.Struct("<ddB")
+MONSTER = struct.Struct("<BHHId")
+RNG_SEEDED = struct.Struct("<BqQ")
+RNG_GAUSS = struct.Struct("<Bd")
+MAZE_SIZE = struct.Struct("<HH")
+SPIKE_COUNT = struct.Struct("<I")
+
+CORE_SECTION, CLOCK_SECTION, MONSTER_SECTION, RNG_SECTION, MAZE_SECTION, SPIKES_SECTION = range(6)
+SECTION_COUNT = 6
+
+NEED_RESPAWN = 1
+HAS_SEED = 2
+
+FILE_MAGIC = b"MZSS"
+
+def spike_typecode(maze_width, maze_height):
+    return "H" if maze_width * maze_height <= 0x10000 else "I"
+
+def encode_rng(rng):
+    seed = getattr(rng, "initial_seed", None)
+    if seed is not None and -(1 << 63) <= seed < 1 << 63:
+        return RNG_SEEDED.pack(0, seed, rng.words)
+    _, words, gauss = rng.getstate()
+    state = array("I", words)
+    if sys.byteorder != "little":
+        state.byteswap()
+    return b"\x01" + state.tobytes() + RNG_GAUSS.pack(gauss is not None, gauss or 0.0)
+
+def encode_maze(maze):
+    return MAZE_SIZE.pack(maze.width, maze.height) + maze.pack_bits()
+
+def encode_spike_positions(spikes):
+    indices = array(spike_typecode(spikes.width, spikes.height),
+                    [y * spikes.width + x for x, y in zip(spikes.xs, spikes.ys)])
+    if sys.byteorder != "little":
+        indices.byteswap()
+    return SPIKE_COUNT.pack(len(indices)) + indices.tobytes()
+
+# 一个快照：sections 是各段编码后的字节串；maze、spikes、rng 记住取快照时的对象，
+# 下一个快照发现对象没变就直接复用这几段，恢复时也不用重新解码
+class Snapshot:
+    __slots__ = ("sections", "maze", "spikes", "rng", "rng_words")
+
+    def __init__(self, sections, maze=None, spikes=None, rng=None, rng_words=None):
+        self.sections = sections
+        self.maze = maze
+        self.spikes = spikes
+        self.rng = rng
+        self.rng_words = rng_words
+
+    @classmethod
+    def capture(cls, session, previous=None):
+        """给一局进行中的游戏取快照；传入上一个快照时复用没有变化的迷宫、地刺位置和随机数段"""
+        if session.maze is None:
+            raise ValueError("no game to snapshot")
+        if session.crowd is not None:
+            raise ValueError("crowd games cannot be snapshotted")
+
+        seed = session.seed
+        has_seed = isinstance(seed, int) and -(1 << 63) <= seed < 1 << 63
+        core = CORE.pack(STATE_CODES[session.state], DIFFICULTY_CODES[session.difficulty],
+                         NEED_RESPAWN * session.need_respawn | HAS_SEED * has_seed, session.tick,
+                         session.player_x, session.player_y, session.player_move_count, session.move_delay,
+                         seed if has_seed else 0, session.tick_rate, session.spike_count)
+        spikes = session.spikes
+        clock = CLOCK.pack(spikes.timer, spikes.animation_progress, spikes.flags)
+        monster = session.monster
+        monster_section = b""
+        if monster is not None:
+            monster_section = MONSTER.pack(monster.active, monster.x, monster.y, monster.move_count,
+                                           monster.move_timer)
+
+        maze = session.maze
+        rng = session.rng
+        rng_words = getattr(rng, "words", None)
+        if previous is None:
+            maze_section = encode_maze(maze)
+            spike_section = encode_spike_positions(spikes)
+            rng_section = encode_rng(rng)
+        else:
+            sections = previous.sections
+            maze_section = sections[MAZE_SECTION] if previous.maze is maze else encode_maze(maze)
+            spike_section = (sections[SPIKES_SECTION] if previous.spikes is spikes
+                             else encode_spike_positions(spikes))
+            # CountingRandom 没被用过时状态不变
+            rng_section = (sections[RNG_SECTION] if previous.rng is rng and rng_words is not None and
+                           previous.rng_words == rng_words else encode_rng(rng))
+        return cls((core, clock, monster_section, rng_section, maze_section, spike_section),
+                   maze, spikes, rng, rng_words)
+
+    @property
+    def tick(self):
+        return CORE.unpack(self.sections[CORE_SECTION])[3]
+
+    def encode(self, base=None):
+        """编码成字节串；传入 base 时只包含与它不同的段"""
+        sections = self.sections
+        if base is None:
+            mask = (1 << SECTION_COUNT) - 1
+            out = bytearray(HEADER.pack(VERSION, FULL, mask, 0))
+        else:
+            base_sections = base.sections
+            mask = 0
+            for i in range(SECTION_COUNT):
+                if sections[i] is not base_sections[i] and sections[i] != base_sections[i]:
+                    mask |= 1 << i
+            out = bytearray(HEADER.pack(VERSION, DELTA, mask, base.tick))
+        for i in range(SECTION_COUNT):
+            if mask & 1 << i:
+                write_varint(out, len(sections[i]))
+                out += sections[i]
+        return bytes(out)
+
+    @classmethod
+    def decode(cls, data, base=None):
+        """解码完整快照，或者在 base 的基础上解码增量快照"""
+        version, kind, mask, base_tick = HEADER.unpack_from(data, 0)
+        if version != VERSION:
+            raise ValueError(f"unsupported snapshot version {version}")
+        if kind == DELTA:
+            if base is None or base.tick != base_tick:
+                raise ValueError(f"delta snapshot needs the snapshot of tick {base_tick} as its base")
+            sections = list(base.sections)
+            snapshot = cls(sections, base.maze, base.spikes)
+        elif mask != (1 << SECTION_COUNT) - 1:
+            raise ValueError("full snapshot is missing sections")
+        else:
+            sections = [b""] * SECTION_COUNT
+            snapshot = cls(sections)
+
+        offset = HEADER.size
+        for i in range(SECTION_COUNT):
+            if mask & 1 << i:
+                length, offset = read_varint(data, offset)
+                sections[i] = bytes(data[offset:offset + length])
+                offset += length
+        # 迷宫或地刺位置变了，基准快照里记住的对象就不能再用
+        if mask & 1 << MAZE_SECTION:
+            snapshot.maze = snapshot.spikes = None
+        elif mask & 1 << SPIKES_SECTION:
+            snapshot.spikes = None
+        snapshot.sections = tuple(sections)
+        return snapshot
+
+    def restore(self, session):
+        """把 session 恢复到取快照时的状态"""
+        (state, difficulty, flags, tick, player_x, player_y, move_count, move_delay,
+         seed, tick_rate, spike_count) = CORE.unpack(self.sections[CORE_SECTION])
+
+        maze = self.restore_maze(session.maze)
+        if maze is not session.maze:
+            session.maze = maze
+            session.free_cells = FreeCellIndex(maze)
+        session.spikes = self.restore_spikes(maze)
+        session.rng = self.restore_rng(session.rng)
+
+        monster_section = self.sections[MONSTER_SECTION]
+        if monster_section:
+            monster = session.monster
+            if monster is None:
+                monster = Monster(1, 1)
+            active, monster.x, monster.y, monster.move_count, monster.move_timer = MONSTER.unpack(monster_section)
+            monster.active = bool(active)
+            monster.rng = session.rng
+            session.monster = monster
+        else:
+            session.monster = None
+        session.crowd = None
+
+        session.state = STATES[state]
+        session.difficulty = DIFFICULTIES[difficulty]
+        session.seed = seed if flags & HAS_SEED else None
+        # 按存档时的tick频率和地刺数量继续模拟，结果才与原局相同
+        session.tick_rate = tick_rate
+        session.tick_dt = 1.0 / tick_rate
+        session.move_interval = max(1, round(PLAYER_MOVE_INTERVAL * tick_rate))
+        session.spike_count = spike_count
+        session.need_respawn = bool(flags & NEED_RESPAWN)
+        session.tick = tick
+        session.player_x, session.player_y = player_x, player_y
+        session.player_move_count = move_count
+        session.move_delay = move_delay
+        session.previous_player = None
+        session.previous_monster = None
+        return session
+
+    def restore_maze(self, current=None):
+        if self.maze is not None:
+            return self.maze
+        section = self.sections[MAZE_SECTION]
+        width, height = MAZE_SIZE.unpack_from(section)
+        bits = section[MAZE_SIZE.size:]
+        # 读档到同一个迷宫时沿用现有对象，绘制缓存和寻路表都不会失效
+        if current is not None and (current.width, current.height) == (width, height) and current.pack_bits() == bits:
+            maze = current
+        else:
+            maze = MazeGrid.from_bits(width, height, bits)
+        self.maze = maze
+        return maze
+
+    def restore_spikes(self, maze):
+        spikes = self.spikes
+        if spikes is None:
+            section = self.sections[SPIKES_SECTION]
+            (count,) = SPIKE_COUNT.unpack_from(section)
+            indices = array(spike_typecode(maze.width, maze.height))
+            indices.frombytes(section[SPIKE_COUNT.size:SPIKE_COUNT.size + count * indices.itemsize])
+            if sys.byteorder != "little":
+                indices.byteswap()
+            width = maze.width
+            spikes = SpikeField(width, maze.height, [(index % width, index // width) for index in indices])
+            self.spikes = spikes
+        spikes.timer, spikes.animation_progress, spikes.flags = CLOCK.unpack(self.sections[CLOCK_SECTION])
+        return spikes
+
+    def restore_rng(self, current=None):
+        section = self.sections[RNG_SECTION]
+        if section[0] == 0:
+            _, seed, words = RNG_SEEDED.unpack(section)
+            if getattr(current, "initial_seed", None) == seed and current.words <= words:
+                # 同一个种子往前走：只跳过差的部分（倒带时要从种子重新开始）
+                current.skip(words - current.words)
+                return current
+            rng = CountingRandom(seed)
+            rng.skip(words)
+            return rng
+        state = array("I")
+        state.frombytes(section[1:1 + 625 * 4])
+        if sys.byteorder != "little":
+            state.byteswap()
+        has_gauss, gauss = RNG_GAUSS.unpack_from(section, 1 + 625 * 4)
+        rng = CountingRandom()
+        rng.setstate((3, tuple(state), gauss if has_gauss else None))
+        return rng
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(FILE_MAGIC + self.encode())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        if not data.startswith(FILE_MAGIC):
+            raise ValueError("not a snapshot file")
+        return cls.decode(data[len(FILE_MAGIC):])
+
+# 倒带缓冲 - 每个tick存一个快照，最多保留 capacity 个；相邻快照共用迷宫、地刺位置和随机数段
+class RewindBuffer:
+    def __init__(self, capacity):
+        self.snapshots = deque(maxlen=capacity)
+
+    def __len__(self):
+        return len(self.snapshots)
+
+    def push(self, session):
+        previous = self.snapshots[-1] if self.snapshots else None
+        self.snapshots.append(Snapshot.capture(session, previous))
+
+    def rewind(self, session):
+        """恢复到最近一个快照并把它移出缓冲，没有快照时返回False"""
+        if not self.snapshots:
+            return False
+        self.snapshots.pop().restore(session)
+        return True
+
+    def clear(self):
+        self.snapshots.clear()
+
+    def encoded_size(self):
+        """按“第一个完整、之后都是增量”编码时整个缓冲的字节数"""
+        size = 0
+        previous = None
+        for snapshot in self.snapshots:
+            size += len(snapshot.encode(previous))
+            previous = snapshot
+        return size
@@ -0,0 +1,499 @@
+import argparse
+import heapq
+import random
+import sys
+import time
+from multiprocessing import Pool
+
+from game_core import (MONSTER_MOVE_INTERVAL, Action, Difficulty, FlowField, GameSession, GameState, SpikeField,
+                       run_session)
+from level_pack import build_level
+
+# 时间感知的自动求解 - 在 (格子, 时间) 空间里做A*（space-time A*），
+# 地刺按 rise/fall/hidden 周期和批次换位的时间表、怪物按最短路追击的策略都精确模拟，
+# 返回最早到达终点的走法，或者证明无解
+#
+# 几个让搜索变小的事实：
+#   - 站着不动永远是安全的：地刺只在走进去的那一刻判定，怪物激活前也不会动。
+#     所以怪物未激活时，同一 (格子, 地刺布局, 已走步数) 越早到达越好，晚到的状态直接剪掉，
+#     每个邻格只需要生成"最早能安全走进去"的那一步，再加上一个"原地等到下一批地刺"的后继
+#   - 一批地刺的计时器同时开始，整批共用一个阶段；换批的时刻与玩家无关，可以预先算好。
+#     新一批的位置只和随机数状态、换批时主角所在的格子有关
+#   - 怪物激活后逐tick模拟怪物。这一阶段只在邻格地刺活跃时原地等待，或者原地等到下一批地刺，
+#     不考虑"故意停下来让怪物靠近"的走法；状态按 (格子, 布局, 怪物距离) 合并，
+#     只保留最早到达的。这部分是近似的，结果里用 exact 标出
+#
+# 与游戏规则的区别：主角主动走进怪物所在格也按失败处理（游戏里要等下一tick怪物更新时才判定）
+
+SOLVED = "solved"
+UNSOLVABLE = "unsolvable"
+HORIZON = "horizon"  # tick上限内没找到解，但有走法因为超出上限被剪掉了，不能说明无解
+UNKNOWN = "unknown"  # 超过展开上限，既没找到解也没能证明无解
+
+# 不指定tick上限时：怪物沿最短路从终点走到主角的时间，再留出等这么多批地刺的余量
+HORIZON_SPARE_CYCLES = 4
+
+# 追击阶段合并状态时，怪物距离超过这么多格就不再区分
+MONSTER_HORIZON = 8
+
+# 求解结果；moves 为 [(tick, 动作)]，在第 tick 个tick执行该移动
+# exact 为False时用过追击阶段的近似剪枝：解法仍然可行，但不保证最短，"无解"也只是没找到
+class Solution:
+    def __init__(self, status, ticks=None, moves=None, expanded=0, exact=True):
+        self.status = status
+        self.ticks = ticks
+        self.moves = moves or []
+        self.expanded = expanded
+        self.exact = exact
+
+    def __bool__(self):
+        return self.status == SOLVED
+
+    def policy(self):
+        """返回可以交给 run_session 的策略函数：到了计划的tick就按对应方向移动"""
+        moves = dict(self.moves)
+        return lambda session: moves.get(session.tick + 1, Action.NONE)
+
+    def next_move(self, tick):
+        """当前tick之后的第一步 (tick, 动作)，没有则返回None"""
+        for move in self.moves:
+            if move[0] > tick:
+                return move
+        return None
+
+class Solver:
+    def __init__(self, session, max_ticks=None, max_expansions=200000):
+        self.session = session
+        self.maze = maze = session.maze
+        self.width = maze.width
+        self.max_expansions = max_expansions
+        self.interval = session.move_interval
+        self.start_tick = session.tick
+
+        self.goal = maze.index(*session.goal)
+        self.goal_distances = FlowField()
+        self.goal_distances.update(maze, *session.goal)
+        self.chase_fields = {}
+        self.max_ticks = max_ticks if max_ticks is not None else self.default_horizon()
+
+        self.build_spike_schedule()
+        self.layout_ids = {}
+        self.layouts = []
+        self.layout_cache = {}
+        # 第k批地刺抽样前的随机数状态（怪物有路可走时不会用到随机数，只有换批会消耗）
+        self.rng_states = [None, session.rng.getstate()]
+
+        monster = session.monster
+        self.hard = session.difficulty == Difficulty.HARD and monster is not None
+        if self.hard:
+            self.monster_period = self.ticks_to_move(0.0, monster.move_interval)
+            self.monster_first = self.ticks_to_move(monster.move_timer, monster.move_interval)
+
+    def default_horizon(self):
+        """按迷宫大小和怪物速度估计tick上限：主角离终点越远、怪物走得越慢，允许的时间越长"""
+        session = self.session
+        distance = max(self.goal_distances.distance(session.player_x, session.player_y), 0)
+        monster_period = self.ticks_to_move(0.0, MONSTER_MOVE_INTERVAL)
+        cycle_ticks = int(session.spikes.cycle_length / session.tick_dt) + 1
+        return distance * max(monster_period, self.interval) + HORIZON_SPARE_CYCLES * cycle_ticks
+
+    def ticks_to_move(self, timer, interval):
+        """从计时器当前值起，需要再累加几个tick才会触发移动（与 Monster.update 的浮点累加一致）"""
+        ticks = 0
+        while True:
+            timer += self.session.tick_dt
+            ticks += 1
+            if timer >= interval:
+                return ticks
+
+    # 地刺时间表：换批的tick由 SpikeField.ticks_until_hidden 按共用时钟直接算出，
+    # 新的一批都从0开始计时，之后每隔同样的tick数换一次，活跃区间整段填写
+    def build_spike_schedule(self):
+        session = self.session
+        spikes = session.spikes
+        dt = session.tick_dt
+        start = self.start_tick
+        length = self.max_ticks + self.interval + 1
+
+        # 当前这一批在换批之前一直活跃（变为隐藏的那个tick就会被换掉）；
+        # 没有地刺时只有 need_respawn 才会在下一个tick换批
+        if len(spikes):
+            first = spikes.ticks_until_hidden(dt)
+        elif session.need_respawn:
+            first = 1
+        else:
+            first = length + 1
+        period = SpikeField(0, 0).ticks_until_hidden(dt)
+
+        # active[i] 对应第 start_tick + 1 + i 个tick；next_inactive[i] 是该tick之后（含）第一个地刺不活跃的tick
+        self.active = active = bytearray(length)
+        self.next_inactive = next_inactive = [0] * length
+        self.respawns = []
+        segment_start = 0
+        segment_active = len(spikes) > 0
+        index = first - 1
+        while True:
+            segment_end = min(index, length)
+            if segment_active:
+                active[segment_start:segment_end] = b"\1" * (segment_end - segment_start)
+                following = start + 1 + index if index < length else sys.maxsize
+                next_inactive[segment_start:segment_end] = [following] * (segment_end - segment_start)
+            else:
+                next_inactive[segment_start:segment_end] = range(start + 1 + segment_start, start + 1 + segment_end)
+            if index >= length:
+                break
+            # 换批的tick地刺不活跃
+            self.respawns.append(start + 1 + index)
+            next_inactive[index] = start + 1 + index
+            segment_start = index + 1
+            segment_active = True
+            index += period
+        self.respawns.append(sys.maxsize)
+
+    def spikes_active(self, tick):
+        return self.active[tick - self.start_tick - 1]
+
+    def intern_layout(self, cells):
+        layout = frozenset(cells)
+        layout_id = self.layout_ids.get(layout)
+        if layout_id is None:
+            layout_id = self.layout_ids[layout] = len(self.layouts)
+            self.layouts.append(layout)
+        return layout_id
+
+    def layout(self, batch, player):
+        """第batch批地刺的布局编号；换批时主角在 player 格"""
+        key = (batch, player)
+        layout_id = self.layout_cache.get(key)
+        if layout_id is None:
+            while len(self.rng_states) <= batch:
+                self.layout(len(self.rng_states) - 1, player)
+            rng = random.Random()
+            rng.setstate(self.rng_states[batch])
+            x, y = self.maze.position(player)
+            positions = self.session.free_cells.sample(x, y, self.session.spike_count, rng)
+            if len(self.rng_states) == batch + 1:
+                self.rng_states.append(rng.getstate())
+            layout_id = self.layout_cache[key] = self.intern_layout(
+                self.maze.index(px, py) for px, py in positions)
+        return layout_id
+
+    def chase_field(self, player, monster):
+        """怪物追击用的流场，每个主角格子一个；只扩展到怪物所在格，大迷宫里不用算全图"""
+        field = self.chase_fields.get(player)
+        if field is None:
+            field = self.chase_fields[player] = FlowField()
+            field.update(self.maze, *self.maze.position(player), until=self.maze.position(player))
+        field.expand(monster)
+        return field
+
+    def monster_step(self, monster, player):
+        step = self.chase_field(player, monster).next_step(*self.maze.position(monster))
+        if step is None:
+            return None
+        return monster + step[0] + step[1] * self.width
+
+    def monster_gap(self, monster, player):
+        """怪物离主角的最短路距离，远于 MONSTER_HORIZON 的一律看作同样安全"""
+        if monster is None:
+            return MONSTER_HORIZON
+        return min(self.chase_field(player, monster).distances[monster], MONSTER_HORIZON)
+
+    def heuristic(self, player, tick):
+        distance = self.goal_distances.distances[player]
+        return tick + (distance - 1) * self.interval if distance > 0 else tick
+
+    def normalize(self, player, batch, layout_id, tick):
+        """处理 tick 之前（含）发生的换批，换批时主角都在 player 格"""
+        while self.respawns[batch] <= tick:
+            batch += 1
+            layout_id = self.layout(batch, player)
+        return batch, layout_id
+
+    # 怪物激活后逐tick推进：返回新状态，死亡返回None
+    def advance(self, state, tick, move_to=None):
+        player, batch, layout_id, moves, monster, monster_next = state
+        if self.respawns[batch] == tick:
+            batch += 1
+            layout_id = self.layout(batch, player)
+
+        if monster is None and moves >= self.session.monster_activation_moves:
+            monster = self.maze.index(1, 1)
+            monster_next = tick + self.monster_first - 1
+        if monster is not None:
+            if tick == monster_next:
+                monster = self.monster_step(monster, player)
+                if monster is None:
+                    return None
+                monster_next = tick + self.monster_period
+            if monster == player:
+                return None
+
+        if move_to is not None:
+            if self.spikes_active(tick) and move_to in self.layouts[layout_id]:
+                return None
+            if move_to == monster:
+                return None
+            player = move_to
+            moves = min(moves + 1, self.session.monster_activation_moves)
+        return (player, batch, layout_id, moves, monster, monster_next)
+
+    def wait(self, state, tick, end):
+        """主角原地不动，处理 [tick, end) 这些tick；只在换批和怪物移动的tick上计算，死亡返回None"""
+        if tick >= end:
+            return state
+        player, batch, layout_id, moves, monster, monster_next = state
+        if monster is None and moves >= self.session.monster_activation_moves:
+            state = self.advance(state, tick)
+            if state is None:
+                return None
+            player, batch, layout_id, moves, monster, monster_next = state
+            tick += 1
+
+        while True:
+            respawn = self.respawns[batch]
+            move = monster_next if monster is not None else sys.maxsize
+            if min(respawn, move) >= end:
+                return (player, batch, layout_id, moves, monster, monster_next)
+            if respawn <= move:
+                batch += 1
+                layout_id = self.layout(batch, player)
+            else:
+                monster = self.monster_step(monster, player)
+                if monster is None or monster == player:
+                    return None
+                monster_next = move + self.monster_period
+
+    def solve(self):
+        for result in self.steps():
+            pass
+        return result
+
+    def steps(self):
+        """分步求解：每展开一个状态交出一次None，最后交出结果，调用方可以把搜索分到几帧里做完"""
+        result = yield from self.search()
+        yield result
+
+    def search(self):
+        session = self.session
+        if session.state != GameState.PLAYING:
+            return Solution(UNKNOWN)
+
+        interval = self.interval
+        start = self.maze.index(session.player_x, session.player_y)
+        first_move = self.start_tick + max(1, interval - session.move_delay)
+        initial_layout = self.intern_layout(self.maze.index(x, y) for x, y, *_ in session.spikes)
+
+        monster = session.monster
+        activation = session.monster_activation_moves
+        chasing = self.hard and (monster.active or session.player_move_count >= activation)
+
+        # 状态：(主角, 地刺批次, 布局, 已走步数, 怪物位置或None, 怪物下次移动的tick)
+        #   未追击阶段的状态表示"能在 tick 移动，tick 及之前的换批已处理"
+        #   追击阶段的状态表示"tick 这一步还没处理"
+        moves = min(session.player_move_count, activation) if self.hard else 0
+        if chasing:
+            monster_position = self.maze.index(monster.x, monster.y) if monster.active else None
+            monster_next = self.start_tick + self.monster_first if monster.active else None
+            state = (start, 0, initial_layout, moves, monster_position, monster_next)
+            state = self.wait(state, self.start_tick + 1, first_move)
+            if state is None:
+                return Solution(UNSOLVABLE)
+        else:
+            batch, layout_id = self.normalize(start, 0, initial_layout, first_move)
+            state = (start, batch, layout_id, moves, None, None)
+
+        counter = 0
+        queue = [(self.heuristic(start, first_move), first_move, counter, state, chasing)]
+        parents = {(state, first_move): None}
+        closed = set()
+        expanded = 0
+        approximate = False
+        # 有后继因为超出tick上限被剪掉时，队列空了也不能说明无解
+        cut_off = False
+
+        while queue:
+            _, tick, _, state, chasing = heapq.heappop(queue)
+            if chasing is None:
+                return self.solution(parents, state, tick, expanded, not approximate)
+
+            player, batch, layout_id, moves, monster, monster_next = state
+            if chasing:
+                # 追击阶段按怪物距离合并状态，同一局面只保留最早到达的（近似剪枝）
+                key = (player, batch, layout_id, self.monster_gap(monster, player))
+                approximate = True
+            else:
+                key = state
+            if key in closed:
+                continue
+            closed.add(key)
+
+            expanded += 1
+            if expanded > self.max_expansions:
+                return Solution(UNKNOWN, expanded=expanded, exact=False)
+            yield None
+
+            # 后继：(新状态, 新状态的tick, 这一步移动的tick或None, 是否追击阶段；None 表示到达终点)
+            successors = []
+            if chasing:
+                # 只在邻格地刺活跃时原地等（等待会让怪物靠近）；另外可以原地等到下一批地刺
+                batch_end = self.respawns[batch]
+                for neighbor in self.maze.open_neighbors(player):
+                    move_tick = tick
+                    if neighbor in self.layouts[layout_id] and self.spikes_active(tick):
+                        # 最早的不活跃tick不会晚于换批，换批那一tick地刺也不活跃
+                        move_tick = self.next_inactive[tick - self.start_tick - 1]
+                    moved = self.wait(state, tick, move_tick)
+                    if moved is not None:
+                        moved = self.advance(moved, move_tick, neighbor)
+                    if moved is None:
+                        continue
+                    if neighbor == self.goal:
+                        successors.append((moved, move_tick, move_tick, None))
+                        continue
+                    moved = self.wait(moved, move_tick + 1, move_tick + interval)
+                    if moved is not None:
+                        successors.append((moved, move_tick + interval, move_tick, True))
+
+                if batch_end - self.start_tick <= self.max_ticks:
+                    waiting = self.wait(state, tick, batch_end + 1)
+                    if waiting is not None:
+                        successors.append((waiting, batch_end + 1, None, True))
+                else:
+                    cut_off = True
+            else:
+                batch_end = self.respawns[batch]
+                layout = self.layouts[layout_id]
+                for neighbor in self.maze.open_neighbors(player):
+                    move_tick = tick
+                    if neighbor in layout and self.spikes_active(tick):
+                        move_tick = self.next_inactive[tick - self.start_tick - 1]
+                    if move_tick >= batch_end:
+                        continue
+                    moved_count = moves + 1 if self.hard else 0
+                    moved = (neighbor, batch, layout_id, moved_count, None, None)
+                    if neighbor == self.goal:
+                        successors.append((moved, move_tick, move_tick, None))
+                    elif self.hard and moved_count >= activation:
+                        # 第5步之后进入追击阶段，剩下的冷却tick按追击规则模拟
+                        moved = self.wait(moved, move_tick + 1, move_tick + interval)
+                        if moved is not None:
+                            successors.append((moved, move_tick + interval, move_tick, True))
+                    else:
+                        next_batch, next_layout = self.normalize(neighbor, batch, layout_id,
+                                                                 move_tick + interval)
+                        successors.append(((neighbor, next_batch, next_layout, moved_count, None, None),
+                                           move_tick + interval, move_tick, False))
+                # 原地等到下一批地刺
+                if batch_end - self.start_tick <= self.max_ticks:
+                    next_batch, next_layout = self.normalize(player, batch, layout_id, batch_end)
+                    successors.append(((player, next_batch, next_layout, moves, None, None),
+                                       batch_end, None, False))
+                else:
+                    cut_off = True
+
+            for next_state, next_tick, move_tick, next_chasing in successors:
+                f = next_tick if next_chasing is None else self.heuristic(next_state[0], next_tick)
+                if f - self.start_tick > self.max_ticks:
+                    cut_off = True
+                    continue
+                node = (next_state, next_tick)
+                if node not in parents:
+                    move = None if move_tick is None else (move_tick, next_state[0] - player)
+                    parents[node] = ((state, tick), move)
+                counter += 1
+                heapq.heappush(queue, (f, next_tick, counter, next_state, next_chasing))
+
+        return Solution(HORIZON if cut_off else UNSOLVABLE, expanded=expanded, exact=not approximate)
+
+    def solution(self, parents, state, tick, expanded, exact):
+        moves = []
+        node = (state, tick)
+        while parents[node] is not None:
+            node, move = parents[node]
+            if move is not None:
+                moves.append(move)
+        moves.reverse()
+        return Solution(SOLVED, tick, [(move_tick, self.action(offset)) for move_tick, offset in moves],
+                        expanded, exact)
+
+    def action(self, offset):
+        if offset == -1:
+            return Action.LEFT
+        if offset == 1:
+            return Action.RIGHT
+        return Action.UP if offset < 0 else Action.DOWN
+
+def solve(session, max_ticks=None, max_expansions=200000):
+    """求解当前局面（可以是刚开局，也可以是进行中的一局）；max_ticks 为None时按迷宫大小估计"""
+    return Solver(session, max_ticks, max_expansions).solve()
+
+# 进程池的工作函数：求解一个种子的关卡，check 时在真正的 GameSession 里重放解法确认能赢
+def _solve_seed(task):
+    seed, difficulty, max_ticks, max_expansions, check = task
+    level = build_level(seed)
+    if level is None:
+        return seed, None, None
+    session = GameSession().reset(difficulty=difficulty, level=level)
+    solution = solve(session, max_ticks, max_expansions)
+
+    verified = None
+    if check and solution:
+        session = GameSession().reset(difficulty=difficulty, level=build_level(seed))
+        run_session(session, solution.policy(), solution.ticks)
+        verified = session.state == GameState.VICTORY and session.tick == solution.ticks
+    return seed, solution, verified
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check which Maze Adventure levels are beatable")
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0, help="first seed; levels use seed..seed+count-1")
+    parser.add_argument("--difficulty", choices=[Difficulty.NORMAL, Difficulty.HARD], default=Difficulty.HARD)
+    parser.add_argument("--max-ticks", type=int, default=None,
+                        help="search horizon in ticks (default: from the goal distance and monster speed)")
+    parser.add_argument("--max-expansions", type=int, default=200000)
+    parser.add_argument("--check", action="store_true", help="replay every solution in a real session")
+    parser.add_argument("--workers", type=int, default=None, help="process count (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    tasks = [(seed, args.difficulty, args.max_ticks, args.max_expansions, args.check)
+             for seed in range(args.seed, args.seed + args.count)]
+    results = {SOLVED: 0, UNSOLVABLE: 0, HORIZON: 0, UNKNOWN: 0}
+    skipped = failed = approximate = 0
+    # 通关用时按是否精确分开统计：近似搜索的解不保证最短，不能算进"最优时间"
+    solution_ticks = {True: 0, False: 0}
+    solution_counts = {True: 0, False: 0}
+
+    start = time.perf_counter()
+    with Pool(args.workers) as pool:
+        for seed, solution, verified in pool.imap_unordered(_solve_seed, tasks, 16):
+            if solution is None:
+                skipped += 1
+                continue
+            results[solution.status] += 1
+            if not solution.exact:
+                approximate += 1
+            if solution:
+                solution_ticks[solution.exact] += solution.ticks
+                solution_counts[solution.exact] += 1
+            if verified is False:
+                failed += 1
+                print(f"seed {seed}: solution did not replay to a victory")
+    elapsed = time.perf_counter() - start
+
+    solved = results[SOLVED]
+    print(f"{solved} solved, {results[UNSOLVABLE]} unsolvable, {results[HORIZON]} hit the tick horizon, "
+          f"{results[UNKNOWN]} gave up, {skipped} unreachable seeds")
+    if solution_counts[True]:
+        print(f"average optimal time {solution_ticks[True] / solution_counts[True]:.0f} ticks "
+              f"over {solution_counts[True]} exact solutions")
+    if solution_counts[False]:
+        print(f"average solution time {solution_ticks[False] / solution_counts[False]:.0f} ticks "
+              f"over {solution_counts[False]} approximate solutions (not guaranteed shortest)")
+    if approximate:
+        print(f"{approximate} results used the approximate monster-chase search")
+    print(f"{args.count} levels in {elapsed:.2f}s ({args.count / elapsed * 60:.0f} levels/minute)")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,41 @@
+import random
+
+import pytest
+
+from game_core import Difficulty, GameSession, GameState
+from level_pack import build_level
+from replay import Recording, verify
+
+# 录像往返：两种开局方式（只给种子 / 传入预生成关卡）录下的随机对局都要能按录像重放出相同的终局
+
+def play_recorded(session, seed, max_ticks=1500):
+    recording = Recording.start(session)
+    rng = random.Random(seed)
+    action = 0
+    while session.state == GameState.PLAYING and session.tick < max_ticks:
+        if rng.random() < 0.05:
+            action = rng.randint(0, 4)
+        recording.step(session, action)
+    return Recording.decode(recording.finish(session).encode())
+
+@pytest.mark.parametrize("difficulty", [Difficulty.NORMAL, Difficulty.HARD, Difficulty.CROWD])
+@pytest.mark.parametrize("seed", [0, 5])
+def test_reset_with_seed_replays(difficulty, seed):
+    session = GameSession(width=41, height=41).reset(seed=seed, difficulty=difficulty)
+    assert verify(play_recorded(session, seed))
+
+@pytest.mark.parametrize("difficulty", [Difficulty.NORMAL, Difficulty.HARD])
+def test_reset_with_level_replays(difficulty):
+    session = GameSession().reset(difficulty=difficulty, level=build_level(7))
+    assert verify(play_recorded(session, 7))
+
+def test_seed_and_level_start_the_same_game():
+    by_seed = GameSession().reset(seed=3, difficulty=Difficulty.HARD)
+    by_level = GameSession().reset(difficulty=Difficulty.HARD, level=build_level(3))
+    assert by_seed.state_hash() == by_level.state_hash()
+
+def test_recording_rejects_unseeded_session():
+    session = GameSession().reset(seed=3)
+    session.seed = None
+    with pytest.raises(ValueError):
+        Recording.start(session)
@@ -0,0 +1,117 @@
+import random
+
+import pytest
+
+from game_core import Difficulty, GameSession, GameState, run_session
+from level_pack import build_level
+from snapshot import RewindBuffer, Snapshot
+from solver import SOLVED, solve
+
+# 模拟层的基本保证：同种子同输入结果相同、快照和倒带能精确还原、批量环境与 GameSession 一致、
+# 默认尺寸的关卡都能解出来（录像往返见 test_replay.py）
+
+def random_actions(seed, count):
+    """按住一个方向走一阵再换，比每tick随机更能走远"""
+    rng = random.Random(seed)
+    actions = []
+    action = 0
+    for _ in range(count):
+        if rng.random() < 0.05:
+            action = rng.randint(0, 4)
+        actions.append(action)
+    return actions
+
+def play(session, actions):
+    hashes = []
+    for action in actions:
+        if session.state != GameState.PLAYING:
+            break
+        session.step(action)
+        hashes.append(session.state_hash())
+    return hashes
+
+@pytest.mark.parametrize("difficulty", [Difficulty.NORMAL, Difficulty.HARD, Difficulty.CROWD])
+def test_same_seed_same_game(difficulty):
+    actions = random_actions(1, 1200)
+    first = GameSession().reset(seed=11, difficulty=difficulty)
+    second = GameSession().reset(seed=11, difficulty=difficulty)
+    assert first.state_hash() == second.state_hash()
+    assert play(first, actions) == play(second, actions)
+
+def test_different_seeds_differ():
+    assert GameSession().reset(seed=1).state_hash() != GameSession().reset(seed=2).state_hash()
+
+@pytest.mark.parametrize("difficulty", [Difficulty.NORMAL, Difficulty.HARD])
+def test_snapshot_restores_state_hash(difficulty):
+    session = GameSession().reset(seed=4, difficulty=difficulty)
+    play(session, random_actions(4, 300))
+    snapshot = Snapshot.capture(session)
+    expected = session.state_hash()
+
+    restored = GameSession()
+    Snapshot.decode(snapshot.encode()).restore(restored)
+    assert restored.state_hash() == expected
+
+    # 恢复后继续模拟也与原局一致
+    actions = random_actions(5, 300)
+    assert play(restored, actions) == play(session, actions)
+
+def test_rewind_restores_earlier_ticks():
+    session = GameSession().reset(seed=8, difficulty=Difficulty.HARD)
+    rewind = RewindBuffer(600)
+    hashes = {}
+    for action in random_actions(8, 400):
+        if session.state != GameState.PLAYING:
+            break
+        rewind.push(session)
+        hashes[session.tick] = session.state_hash()
+        session.step(action)
+
+    while len(rewind):
+        rewind.rewind(session)
+        assert session.state_hash() == hashes[session.tick]
+    assert session.tick == 0
+
+@pytest.mark.parametrize("difficulty", [Difficulty.NORMAL, Difficulty.HARD])
+def test_vec_env_matches_game_session(difficulty):
+    np = pytest.importorskip("numpy")
+    from vec_env import VecMazeEnv
+
+    count = 8
+    env = VecMazeEnv(count, seed=3, difficulty=difficulty)
+    env.reset()
+    sessions = [GameSession().reset(difficulty=difficulty, level=build_level(seed)) for seed in env.seeds]
+    rng = np.random.default_rng(0)
+    actions = rng.integers(0, 5, count)
+
+    for tick in range(400):
+        changed = rng.random(count) < 0.1
+        actions = np.where(changed, rng.integers(0, 5, count), actions)
+        for session, action in zip(sessions, actions):
+            session.step(int(action))
+        observations, _, done = env.step(actions)
+
+        for i, session in enumerate(sessions):
+            assert bool(done[i]) == (session.state != GameState.PLAYING), (i, tick)
+            if done[i]:
+                # 这一局结束后环境自动换了新关卡，跟着重新开始
+                sessions[i] = GameSession().reset(difficulty=difficulty, level=build_level(env.seeds[i]))
+                continue
+            monster = session.monster
+            monster_position = (monster.x, monster.y) if monster and monster.active else (-1, -1)
+            observation = observations[i]
+            assert tuple(observation[:4]) == (session.player_x, session.player_y) + monster_position, (i, tick)
+            assert bool(observation[5]) == (session.spikes.active_count > 0), (i, tick)
+
+@pytest.mark.parametrize("difficulty", [Difficulty.NORMAL, Difficulty.HARD])
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_solver_solves_default_levels(difficulty, seed):
+    level = build_level(seed)
+    solution = solve(GameSession().reset(difficulty=difficulty, level=level))
+    assert solution.status == SOLVED
+
+    # 解法在真正的 GameSession 里重放，正好在计划的tick通关
+    session = GameSession().reset(difficulty=difficulty, level=build_level(seed))
+    run_session(session, solution.policy(), solution.ticks)
+    assert session.state == GameState.VICTORY
+    assert session.tick == solution.ticks
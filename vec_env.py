@@ -0,0 +1,290 @@
+import random
+
+import numpy as np
+
+from game_core import (
+    ROWS, COLS, TICK_RATE, PLAYER_MOVE_INTERVAL, MONSTER_MOVE_INTERVAL, MONSTER_ACTIVATION_MOVES, DIRECTIONS,
+    Action, Difficulty, SpikeField,
+)
+from level_prefetch import LevelPrefetcher
+
+# 批量环境 - 把 N 局独立的游戏（迷宫、地刺、怪物、主角）叠成 NumPy 数组，
+# 一次 step(actions) 让所有局按相同的规则同步推进一个tick，供机器人和强化学习训练使用
+#
+# 规则与 GameSession.step 逐tick一致（同一个关卡和动作序列得到相同的结果）：
+#   1. 地刺：一批地刺的计时器同时从0开始、每次加同样的dt，所以整批共用一个计时器，
+#      阶段划分与 Spike.update 相同；整批从活跃变为隐藏时换下一批位置
+#   2. 怪物：主角移动 MONSTER_ACTIVATION_MOVES 格后在 (1, 1) 激活，每 MONSTER_MOVE_INTERVAL 秒沿最短路走一步，
+#      走到主角所在格即失败
+#   3. 主角：每隔 move_interval 个tick最多移动一格，到达 (width-2, height-2) 胜利，踩到活跃地刺失败
+# 只支持普通和困难模式；怪物群模式没有批量版本
+
+# 每局结果
+PLAYING = 0
+VICTORY = 1
+GAME_OVER = 2
+TRUNCATED = 3
+
+REWARD_VICTORY = 1.0
+REWARD_GAME_OVER = -1.0
+
+# 支持的难度
+SUPPORTED_DIFFICULTIES = (Difficulty.NORMAL, Difficulty.HARD)
+
+# observations 每一列的含义；怪物未激活时坐标为 -1
+OBSERVATION_FIELDS = ("player_x", "player_y", "monster_x", "monster_y", "monster_active",
+                      "spikes_active", "spike_cycle_time", "move_delay")
+
+# 动作 -> (dx, dy)，下标即 Action 的取值
+_ACTION_DX = np.array([0, 0, 0, -1, 1], dtype=np.int64)
+_ACTION_DY = np.array([0, -1, 1, 0, 0], dtype=np.int64)
+
+class VecMazeEnv:
+    def __init__(self, num_envs, seed=None, difficulty=Difficulty.HARD, width=COLS, height=ROWS,
+                 spike_count=30, algorithm="backtracker", tick_rate=TICK_RATE,
+                 max_episode_ticks=None, level_pack=None):
+        if difficulty not in SUPPORTED_DIFFICULTIES:
+            raise ValueError(f"VecMazeEnv does not support difficulty {difficulty!r}")
+        if level_pack is not None:
+            width, height = level_pack.width, level_pack.height
+            spike_count, algorithm = level_pack.spike_count, level_pack.algorithm
+        self.num_envs = n = num_envs
+        self.width = width
+        self.height = height
+        self.size = width * height
+        self.difficulty = difficulty
+        self.tick_dt = 1.0 / tick_rate
+        self.move_interval = max(1, round(PLAYER_MOVE_INTERVAL * tick_rate))
+        self.monster_activation_moves = MONSTER_ACTIVATION_MOVES
+        self.monster_move_interval = MONSTER_MOVE_INTERVAL
+        # 地刺阶段边界取自 SpikeField，与 GameSession 用同一套参数
+        spikes = SpikeField(0, 0)
+        self.spike_fall_end = spikes.fall_end
+        self.spike_cycle_length = spikes.cycle_length
+        self.max_episode_ticks = max_episode_ticks
+        self.goal = (height - 2) * width + width - 2
+
+        # 关卡来源与游戏前端相同（按种子生成并校验可达，或者从关卡包里取）
+        self.levels = LevelPrefetcher(level_pack=level_pack, seed=seed, width=width, height=height,
+                                      spike_count=spike_count, algorithm=algorithm)
+        self.spike_count = spike_count
+        self.seeds = [0] * n
+        self.rngs = [None] * n
+        self.free_cells = [None] * n
+
+        # 迷宫和地刺按一维下标 y * width + x 存放
+        self.open_cells = np.zeros((n, self.size), dtype=bool)
+        self.spike_cells = np.zeros((n, self.size), dtype=bool)
+        self.has_spikes = np.zeros(n, dtype=bool)
+        self.spike_timer = np.zeros(n)
+        self.spikes_active = np.zeros(n, dtype=bool)
+        self.need_respawn = np.zeros(n, dtype=bool)
+
+        self.player = np.zeros(n, dtype=np.int64)
+        self.move_delay = np.zeros(n, dtype=np.int64)
+        self.move_count = np.zeros(n, dtype=np.int64)
+
+        self.monster = np.zeros(n, dtype=np.int64)
+        self.monster_active = np.zeros(n, dtype=bool)
+        self.monster_timer = np.zeros(n)
+
+        self.ticks = np.zeros(n, dtype=np.int64)
+        self.outcomes = np.zeros(n, dtype=np.int8)
+        self.episodes = 0
+
+        # 格子是否在最左/最右列，BFS向左右扩展时不能跨行
+        columns = np.arange(self.size) % width
+        self.not_first_column = columns != 0
+        self.not_last_column = columns != width - 1
+
+    def reset(self):
+        """所有局重新开始，返回初始观测"""
+        for i in range(self.num_envs):
+            self.reset_env(i)
+        return self.observations()
+
+    def reset_env(self, i):
+        level = self.levels.make_level()
+        maze = level.maze
+        self.seeds[i] = level.seed
+        # 与 GameSession.reset(level=...) 一样，用关卡种子重新开始这一局的随机数序列
+        self.rngs[i] = random.Random(level.seed)
+        self.free_cells[i] = level.free_cells
+
+        self.open_cells[i] = np.frombuffer(maze.cells, dtype=np.uint8) == 0
+        self.place_spikes(i, level.spikes)
+        self.need_respawn[i] = False
+
+        self.player[i] = self.width + 1
+        self.move_delay[i] = 0
+        self.move_count[i] = 0
+        self.monster[i] = self.width + 1
+        self.monster_active[i] = False
+        self.monster_timer[i] = 0.0
+        self.ticks[i] = 0
+        self.episodes += 1
+
+    def place_spikes(self, i, positions):
+        row = self.spike_cells[i]
+        row[:] = False
+        width = self.width
+        for x, y in positions:
+            row[y * width + x] = True
+        self.has_spikes[i] = len(positions) > 0
+        self.spike_timer[i] = 0.0
+        self.spikes_active[i] = False
+
+    def step(self, actions):
+        """所有局推进一个tick，返回 (observations, rewards, dones)；结束的局自动换新关卡"""
+        actions = np.asarray(actions, dtype=np.int64)
+        outcomes = self.outcomes
+        outcomes[:] = PLAYING
+        self.ticks += 1
+
+        self.update_spikes()
+        if self.difficulty == Difficulty.HARD:
+            self.update_monsters()
+        self.move_players(actions)
+
+        if self.max_episode_ticks is not None:
+            outcomes[(outcomes == PLAYING) & (self.ticks >= self.max_episode_ticks)] = TRUNCATED
+
+        rewards = np.where(outcomes == VICTORY, REWARD_VICTORY,
+                           np.where(outcomes == GAME_OVER, REWARD_GAME_OVER, 0.0)).astype(np.float32)
+        dones = outcomes != PLAYING
+        for i in np.flatnonzero(dones):
+            self.reset_env(i)
+        return self.observations(), rewards, dones
+
+    def update_spikes(self):
+        self.spike_timer += self.tick_dt
+        active = (np.remainder(self.spike_timer, self.spike_cycle_length) < self.spike_fall_end) & self.has_spikes
+        # 整批从活跃变为隐藏 = 完成一个周期
+        self.need_respawn |= self.spikes_active & ~active
+        self.spikes_active = active
+
+        # 在下一批地刺开始前重新生成位置
+        for i in np.flatnonzero(self.need_respawn & ~active):
+            x, y = self.player_xy(i)
+            self.place_spikes(i, self.free_cells[i].sample(x, y, self.spike_count, self.rngs[i]))
+            self.need_respawn[i] = False
+
+    def update_monsters(self):
+        activate = ~self.monster_active & (self.move_count >= self.monster_activation_moves)
+        self.monster[activate] = self.width + 1
+        self.monster_active |= activate
+
+        active = self.monster_active
+        self.monster_timer[active] += self.tick_dt
+        moving = np.flatnonzero(active & (self.monster_timer >= self.monster_move_interval))
+        if len(moving):
+            self.monster_timer[moving] = 0.0
+            self.move_monsters(moving)
+
+        caught = active & (self.monster == self.player)
+        self.outcomes[caught] = GAME_OVER
+
+    def move_monsters(self, envs):
+        """对需要移动的局批量做一次从主角出发的BFS（按层膨胀），沿距离减1的方向走一步"""
+        width, size = self.width, self.size
+        open_cells = self.open_cells[envs]
+        monsters = self.monster[envs]
+        rows = np.arange(len(envs))
+
+        distances = np.full((len(envs), size), -1, dtype=np.int32)
+        frontier = np.zeros((len(envs), size), dtype=bool)
+        frontier[rows, self.player[envs]] = True
+        distances[frontier] = 0
+        reached = frontier.copy()
+
+        # 一层层扩展，直到每个怪物所在格都有了距离（或者确定不可达）
+        distance = 0
+        while frontier.any() and not reached[rows, monsters].all():
+            distance += 1
+            grown = np.zeros_like(frontier)
+            grown[:, 1:] |= frontier[:, :-1] & self.not_first_column[1:]
+            grown[:, :-1] |= frontier[:, 1:] & self.not_last_column[:-1]
+            grown[:, width:] |= frontier[:, :-width]
+            grown[:, :-width] |= frontier[:, width:]
+            grown &= open_cells & ~reached
+            distances[grown] = distance
+            reached |= grown
+            frontier = grown
+
+        # 按 DIRECTIONS 的顺序找第一个距离减1的邻格，与 FlowField.next_step 相同
+        current = distances[rows, monsters]
+        xs, ys = monsters % width, monsters // width
+        steps = np.full(len(envs), -1, dtype=np.int64)
+        for k in range(len(DIRECTIONS) - 1, -1, -1):
+            dx, dy = DIRECTIONS[k]
+            nx, ny = xs + dx, ys + dy
+            inside = (nx >= 0) & (nx < width) & (ny >= 0) & (ny < self.height)
+            neighbor = np.where(inside, ny * width + nx, 0)
+            match = inside & (current > 0) & (distances[rows, neighbor] == current - 1)
+            steps = np.where(match, neighbor, steps)
+
+        found = steps >= 0
+        self.monster[envs[found]] = steps[found]
+        # 没有路径时随机走一步，使用这一局自己的随机数源
+        for i in envs[~found]:
+            self.random_monster_step(i)
+
+    def random_monster_step(self, i):
+        x, y = self.monster[i] % self.width, self.monster[i] // self.width
+        open_cells = self.open_cells[i]
+        valid_directions = [(dx, dy) for dx, dy in DIRECTIONS
+                            if 0 <= x + dx < self.width and 0 <= y + dy < self.height
+                            and open_cells[(y + dy) * self.width + x + dx]]
+        if valid_directions:
+            dx, dy = self.rngs[i].choice(valid_directions)
+            self.monster[i] = (y + dy) * self.width + x + dx
+
+    def move_players(self, actions):
+        width = self.width
+        playing = self.outcomes == PLAYING
+        self.move_delay[playing] += 1
+
+        player = self.player
+        xs, ys = player % width, player // width
+        nx, ny = xs + _ACTION_DX[actions], ys + _ACTION_DY[actions]
+        inside = (nx >= 0) & (nx < width) & (ny >= 0) & (ny < self.height)
+        target = np.where(inside, ny * width + nx, player)
+        rows = np.arange(self.num_envs)
+        moved = (playing & (self.move_delay >= self.move_interval) & (actions != Action.NONE) &
+                 inside & self.open_cells[rows, target])
+
+        player[moved] = target[moved]
+        self.move_delay[moved] = 0
+        self.move_count[moved] += 1
+
+        # 踩到活跃地刺优先于到达终点
+        self.outcomes[moved & (target == self.goal)] = VICTORY
+        self.outcomes[moved & self.spikes_active & self.spike_cells[rows, target]] = GAME_OVER
+
+    def player_xy(self, i):
+        return int(self.player[i] % self.width), int(self.player[i] // self.width)
+
+    def observations(self):
+        """每局一行，列的含义见 OBSERVATION_FIELDS"""
+        width = self.width
+        observations = np.empty((self.num_envs, len(OBSERVATION_FIELDS)), dtype=np.float32)
+        observations[:, 0] = self.player % width
+        observations[:, 1] = self.player // width
+        observations[:, 2] = np.where(self.monster_active, self.monster % width, -1)
+        observations[:, 3] = np.where(self.monster_active, self.monster // width, -1)
+        observations[:, 4] = self.monster_active
+        observations[:, 5] = self.spikes_active
+        observations[:, 6] = np.remainder(self.spike_timer, self.spike_cycle_length)
+        observations[:, 7] = self.move_delay
+        return observations
+
+    def grid_observations(self):
+        """图像形式的观测 (N, 4, height, width)：通道依次为 通道格、活跃地刺、主角、怪物"""
+        n, width = self.num_envs, self.width
+        grids = np.zeros((n, 4, self.size), dtype=np.uint8)
+        rows = np.arange(n)
+        grids[:, 0] = self.open_cells
+        grids[:, 1] = self.spike_cells & self.spikes_active[:, None]
+        grids[rows, 2, self.player] = 1
+        grids[rows[self.monster_active], 3, self.monster[self.monster_active]] = 1
+        return grids.reshape(n, 4, self.height, width)